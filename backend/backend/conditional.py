@@ -0,0 +1,65 @@
+"""
+Conditional GET for detail views.
+
+ConditionalRetrieveMixin reads a few validator columns for the requested
+object and answers If-None-Match / If-Modified-Since from them, so a client
+whose copy is current gets 304 Not Modified without the full object being
+loaded or serialized.
+"""
+import hashlib
+
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+class ConditionalRetrieveMixin:
+    """
+    validator_fields are read with values(), together with any aggregates in
+    validator_annotations (or get_validator_annotations(), for aggregates
+    that depend on the request or the time), and must change whenever the
+    response would; get_validator_row may add derived values to the row.
+    get_last_modified picks the Last-Modified timestamp. Responses must be
+    revalidated before reuse (Cache-Control: private, no-cache).
+    """
+    validator_fields = ('pk', 'updated_at')
+    validator_annotations = {}
+
+    def get_validator_annotations(self):
+        return self.validator_annotations
+
+    def get_validator_row(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return queryset.values(*self.validator_fields).annotate(**self.get_validator_annotations()).first()
+
+    def get_etag(self, row):
+        # Weak: equal validators mean an equivalent, not byte-identical, body
+        digest = hashlib.md5(repr(sorted(row.items())).encode())
+        return f'W/"{digest.hexdigest()}"'
+
+    def get_last_modified(self, row):
+        return row['updated_at']
+
+    def retrieve(self, request, *args, **kwargs):
+        row = self.get_validator_row()
+        if row is None:
+            raise Http404
+
+        self.etag = self.get_etag(row)
+        self.last_modified = int(self.get_last_modified(row).timestamp())
+        response = get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+        if response is None:
+            response = self.get_current_response(request, row, *args, **kwargs)
+
+        # get_current_response may answer with an older copy and its own validators
+        response.setdefault('ETag', self.etag)
+        response.setdefault('Last-Modified', http_date(self.last_modified))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_current_response(self, request, row, *args, **kwargs):
+        """Full response for a request whose validators did not match"""
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,183 @@
+"""
+Keyset pagination.
+
+PageNumberPagination counts the whole result set and skips OFFSET rows for
+every page, so deep pages get slower as tables grow. KeysetPagination
+instead remembers the ordering values of the last row it returned in an
+opaque cursor and asks for rows strictly after them, which an index on the
+ordering columns answers at the same cost on any page.
+
+Endpoints using OptInKeysetPagination keep their page-number responses
+unless the client asks for keyset pages with ``?pagination=cursor``, so
+clients can move over one endpoint at a time.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value):
+    # Keep full precision: DjangoJSONEncoder truncates datetimes to milliseconds
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over the queryset's own ordering, with the primary key
+    appended as a tie-breaker. Ordering fields must be non-null.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+
+        values, reverse = self.decode_cursor(request)
+        if values is not None:
+            try:
+                queryset = queryset.filter(self.after(values, reverse))
+            except (ValidationError, TypeError, ValueError):
+                # Tampered cursor values that do not fit the ordering fields
+                raise NotFound(self.invalid_cursor_message)
+
+        order_by = [
+            ('-' if descending != reverse else '') + field
+            for field, descending in self.ordering
+        ]
+        rows = list(queryset.order_by(*order_by)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Reaching a page backwards implies there is a page after it
+        has_next = has_more if not reverse else values is not None
+        has_previous = has_more if reverse else values is not None
+
+        self.next_cursor = self.encode_cursor(rows[-1], False) if rows and has_next else None
+        self.previous_cursor = self.encode_cursor(rows[0], True) if rows and has_previous else None
+        return rows
+
+    def get_ordering(self, queryset):
+        """Return [(field, descending)] for the queryset, ending with the primary key"""
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        fields = []
+        for field in ordering:
+            if not isinstance(field, str):
+                raise ImproperlyConfigured("KeysetPagination only supports ordering by field names")
+            descending = field.startswith('-')
+            fields.append((field.lstrip('-'), descending))
+
+        names = {name for name, _ in fields}
+        if not names & {'pk', 'id', queryset.model._meta.pk.name}:
+            fields.append(('pk', fields[-1][1] if fields else False))
+        return fields
+
+    def after(self, values, reverse):
+        """Rows that sort strictly after values, or before them when reverse"""
+        condition = Q()
+        equal = {}
+        for (field, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def row_values(self, row):
+        values = []
+        for field, _ in self.ordering:
+            value = row
+            for attr in field.split('__'):
+                value = getattr(value, attr)
+            values.append(_encode_value(value))
+        return values
+
+    def encode_cursor(self, row, reverse):
+        payload = json.dumps({'v': self.row_values(row), 'r': reverse}, separators=(',', ':'))
+        cursor = urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            values, reverse = payload['v'], bool(payload['r'])
+        except (BinasciiError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        if not all(isinstance(value, (str, int, float)) for value in values):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_cursor,
+            'previous': self.previous_cursor,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class OptInKeysetPagination(BasePagination):
+    """
+    Page-number pagination unless the request opts into keyset pages with
+    ``?pagination=cursor`` (links in keyset responses keep that parameter).
+    """
+    mode_query_param = 'pagination'
+    keyset_mode = 'cursor'
+    keyset_class = KeysetPagination
+    page_number_class = PageNumberPagination
+
+    def wants_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == self.keyset_mode or
+            self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.wants_keyset(request):
+            self.paginator = self.keyset_class()
+        else:
+            self.paginator = self.page_number_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view)
@@ -69,6 +69,16 @@ DATABASES = {
     )
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Take the write lock when a transaction begins so concurrent checkouts
+    # queue on the busy timeout instead of failing on a lock upgrade.
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 20,
+    })
+    # File-backed test database so tests can exercise real concurrent connections
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -149,4 +159,71 @@ CSRF_TRUSTED_ORIGINS = [
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 EMAIL_HOST = 'localhost'
 EMAIL_PORT = 1025
-DEFAULT_FROM_EMAIL = 'noreply@tickethub.com'
\ No newline at end of file
+DEFAULT_FROM_EMAIL = 'noreply@tickethub.com'
+
+# Cache
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) in production
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='tickethub'),
+    }
+}
+# Catalog responses are invalidated when their data changes; the timeout
+# only bounds how long an unused entry is kept
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+# Longest time one request may spend rebuilding an event detail payload
+# while other requests are served the previous copy
+EVENT_DETAIL_LOCK_TIMEOUT = 10
+
+# Events
+# Seconds between writes of buffered event view counts (0 disables the
+# background flusher), and the backlog that triggers an early write
+EVENT_VIEW_FLUSH_INTERVAL = config('EVENT_VIEW_FLUSH_INTERVAL', default=10, cast=int)
+EVENT_VIEW_FLUSH_MAX_PENDING = 1000
+
+# Tickets
+# Upper bound for the in-process cache of rendered QR images
+TICKET_QR_CACHE_BYTES = 32 * 1024 * 1024
+# Keys for signing QR payloads as comma separated "id:secret" pairs (ids may
+# not contain dots). New payloads are signed with TICKET_SIGNING_KEY_ID, or the
+# first key; the others still verify, so keys are rotated by adding a new one
+# first and dropping the old one later. A key derived from SECRET_KEY is used
+# when unset.
+TICKET_SIGNING_KEYS = dict(
+    pair.split(':', 1) for pair in config('TICKET_SIGNING_KEYS', default='').split(',') if pair
+)
+TICKET_SIGNING_KEY_ID = config('TICKET_SIGNING_KEY_ID', default='')
+# Admit unsigned QR codes issued before payloads were signed
+TICKET_QR_ACCEPT_UNSIGNED = config('TICKET_QR_ACCEPT_UNSIGNED', default=True, cast=bool)
+# Seconds check-in manifest deltas reach back before their base version, to
+# include changes from transactions that were still open at that time
+TICKET_MANIFEST_OVERLAP = 60
+
+# Orders
+ORDER_NUMBER_GENERATOR = 'orders.numbering.TimeOrderedGenerator'
+# Each process leases its own order number node id (0-1023) from the
+# database for this many seconds, renewing it while in use. Setting
+# ORDER_NUMBER_NODE_ID pins the id instead, which is only safe when a single
+# process creates orders.
+ORDER_NUMBER_NODE_LEASE = 600
+ORDER_NUMBER_NODE_ID = config('ORDER_NUMBER_NODE_ID', default=None)
+# Minutes an expired hold is kept while a payment started for its order is
+# still awaiting the gateway's callback
+HOLD_PAYMENT_GRACE_MINUTES = 10
+# 'sync' applies payment callbacks in the request; 'queued' appends them to
+# an inbox drained by the process_payment_inbox command
+PAYMENT_CALLBACK_MODE = config('PAYMENT_CALLBACK_MODE', default='sync')
+# Inbox entries that fail this many times are left for inspection
+PAYMENT_INBOX_MAX_ATTEMPTS = 5
+# Longest a payment status request may wait for a change (?wait=), and how
+# often a waiting request checks the cache for changes made by other
+# processes. A waiting request gives its database connection back but holds
+# a worker thread for up to PAYMENT_STATUS_MAX_WAIT seconds, so size the
+# threads for the clients expected to wait at once on top of normal traffic
+# (e.g. gunicorn --worker-class gthread --threads 100 for a few hundred
+# waiters per process); the database connection count is unaffected.
+PAYMENT_STATUS_MAX_WAIT = 30
+PAYMENT_STATUS_POLL_INTERVAL = 1
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Event, TicketType
+from .models import Category, Event, PlatformStats, TicketType
 
 
 @admin.register(Category)
@@ -43,7 +43,7 @@ class EventAdmin(admin.ModelAdmin):
             'fields': ('banner_image', 'thumbnail_image')
         }),
         ('Status', {
-            'fields': ('status', 'is_featured')
+            'fields': ('status', 'is_featured', 'hold_ttl_minutes')
         }),
         ('Statistics', {
             'fields': ('views_count', 'tickets_sold', 'total_capacity', 'created_at', 'updated_at'),
@@ -60,4 +60,19 @@ class TicketTypeAdmin(admin.ModelAdmin):
     )
     list_filter = ('event__category', 'event__status')
     search_fields = ('event__title', 'name')
-    readonly_fields = ('quantity_sold', 'tickets_remaining', 'is_available')
\ No newline at end of file
+    readonly_fields = ('quantity_sold', 'tickets_remaining', 'is_available')
+
+
+@admin.register(PlatformStats)
+class PlatformStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'total_events', 'upcoming_events', 'categories_count',
+        'tickets_sold', 'gross_revenue', 'reconciled_at'
+    )
+    readonly_fields = list_display
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,159 @@
+"""
+Response cache for public catalog endpoints.
+
+Responses are cached as serialized data in RESPONSE_CACHE_ALIAS, keyed by
+the request path and query string, whether the request is authenticated,
+and a version token for each model the response depends on. Saving or
+deleting one of those models (see events.signals) or changing ticket stock
+(see events.inventory) replaces that model's token, so every response built
+from the old data stops matching at once without having to find its keys.
+
+Event detail payloads are cached per event alongside the validators they
+were built for (see cached_event_detail).
+"""
+import hashlib
+import math
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import Category
+from .singleflight import SingleFlight
+
+KEY_PREFIX = 'response'
+
+
+def get_response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _version_key(model):
+    return f'{KEY_PREFIX}:version:{model._meta.label_lower}'
+
+
+def model_versions(models):
+    """Current version token of each model, creating missing ones"""
+    cache = get_response_cache()
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Never restart from a known value: a response cached under an
+            # evicted token must not become valid again
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*models):
+    """
+    Drop every cached response built from models, now and again once the
+    current transaction commits, so a response cached from data read just
+    before the commit does not outlive it.
+    """
+    def bump():
+        get_response_cache().set_many(
+            {_version_key(model): uuid.uuid4().hex for model in models}, timeout=None
+        )
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def response_cache_key(request, models):
+    auth = 'user' if request.user and request.user.is_authenticated else 'anon'
+    versions = ':'.join(model_versions(models))
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'{KEY_PREFIX}:{auth}:{path}:{hashlib.md5(versions.encode()).hexdigest()}'
+
+
+def cached_response(request, models, get_response, anonymous_only=False):
+    """
+    Return get_response() for a GET request, serving its data from the cache
+    when an unchanged copy is stored. Only 200 responses are cached.
+    """
+    if request.method != 'GET' or (anonymous_only and request.user.is_authenticated):
+        return get_response()
+
+    cache = get_response_cache()
+    key = response_cache_key(request, models)
+    data = cache.get(key)
+    if data is not None:
+        return Response(data)
+
+    response = get_response()
+    if response.status_code == 200:
+        cache.set(key, response.data, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+    return response
+
+
+class CachedListMixin:
+    """
+    Serve a ListAPIView's list from the response cache.
+    cache_models names the models whose changes invalidate it.
+    """
+    cache_models = ()
+    cache_anonymous_only = False
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request,
+            self.cache_models,
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs),
+            self.cache_anonymous_only
+        )
+
+
+detail_flights = SingleFlight()
+
+
+def cached_event_detail(event_id, etag, last_modified, build, expires_at=None):
+    """
+    Return {'etag', 'last_modified', 'data'} for an event's detail payload.
+
+    expires_at is when the payload goes stale without any row changing (a
+    sales window opening or closing, the event ending); the stored copy is
+    not kept past it.
+
+    The stored copy is used while its etag matches the current one. On a
+    miss, concurrent requests in this process share one build() through
+    detail_flights, and across processes a short cache lock lets a single
+    request rebuild while the others keep serving the previous copy with
+    its own validators. Stale copies are therefore served for at most
+    EVENT_DETAIL_LOCK_TIMEOUT seconds.
+    """
+    cache = get_response_cache()
+    key = f'{KEY_PREFIX}:event:{event_id}:{model_versions([Category])[0]}'
+
+    entry = cache.get(key)
+    if entry is not None and entry['etag'] == etag:
+        return entry
+
+    def refresh():
+        # Another process may have finished the rebuild while we waited
+        entry = cache.get(key)
+        if entry is not None and entry['etag'] == etag:
+            return entry
+
+        lock_key = f'{key}:lock'
+        lock_timeout = getattr(settings, 'EVENT_DETAIL_LOCK_TIMEOUT', 10)
+        locked = cache.add(lock_key, 1, lock_timeout)
+        if not locked and entry is not None:
+            return entry
+
+        try:
+            entry = {'etag': etag, 'last_modified': last_modified, 'data': build()}
+            timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+            if expires_at is not None:
+                timeout = max(1, min(timeout, math.ceil((expires_at - timezone.now()).total_seconds())))
+            cache.set(key, entry, timeout)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        return entry
+
+    return detail_flights.do(key, refresh)
@@ -0,0 +1,87 @@
+"""
+Denormalized counters.
+
+Category.published_events_count and Event.tickets_sold_total /
+Event.capacity_total are kept in step with the rows they summarize so
+listing and detail endpoints read them straight off the row:
+
+* recount_categories / recount_events rebuild counters from the source rows
+  with one UPDATE each; signals call them when events or ticket types change
+  and the ``recount`` management command calls them for everything.
+* add_tickets_sold applies sales as relative increments, which stay correct
+  when many checkouts for the same event run concurrently.
+
+Both bump Event.inventory_version and inventory_updated_at, which the event
+detail validators are built from. Event.updated_at is left alone so that
+stock changes do not invalidate responses embedding the event's own fields,
+such as order details.
+"""
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, F
+from django.db.models.functions import Coalesce, Now
+
+from .cache import invalidate
+from .models import Category, Event, TicketType
+
+
+def _inventory_changed():
+    """Column updates that mark an event's ticket inventory as changed"""
+    return {
+        'inventory_version': F('inventory_version') + 1,
+        'inventory_updated_at': Now(),
+    }
+
+
+def recount_categories(category_ids=None):
+    """
+    Recompute published_events_count for the given categories (all if None)
+    and invalidate the cached category list.
+    """
+    published = Event.objects.filter(
+        category=OuterRef('pk'),
+        status='published'
+    ).order_by().values('category').annotate(count=Count('pk')).values('count')
+
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=category_ids)
+    updated = categories.update(
+        published_events_count=Coalesce(Subquery(published, output_field=IntegerField()), 0)
+    )
+    invalidate(Category)
+    return updated
+
+
+def recount_events(event_ids=None):
+    """Recompute tickets_sold_total and capacity_total for the given events (all if None)"""
+    def ticket_type_sum(field):
+        return Coalesce(
+            Subquery(
+                TicketType.objects.filter(event=OuterRef('pk'))
+                .order_by().values('event').annotate(total=Sum(field)).values('total'),
+                output_field=IntegerField()
+            ),
+            0
+        )
+
+    events = Event.objects.all()
+    if event_ids is not None:
+        events = events.filter(pk__in=event_ids)
+    return events.update(
+        tickets_sold_total=ticket_type_sum('quantity_sold'),
+        capacity_total=ticket_type_sum('quantity'),
+        **_inventory_changed()
+    )
+
+
+def add_tickets_sold(deltas):
+    """
+    Apply {event_id: change} to tickets_sold_total, e.g. +3 for a sale or -3
+    for released stock. Events are updated in primary key order.
+    """
+    for event_id in sorted(deltas):
+        delta = deltas[event_id]
+        if delta:
+            Event.objects.filter(pk=event_id).update(
+                tickets_sold_total=F('tickets_sold_total') + delta,
+                **_inventory_changed()
+            )
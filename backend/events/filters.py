@@ -0,0 +1,23 @@
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from .search import parse_terms, search_events
+
+
+class EventSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the full-text index in events.search: terms are
+    prefix matched and results are annotated with search_rank.
+    """
+    def filter_queryset(self, request, queryset, view):
+        return search_events(queryset, request.query_params.get(self.search_param, ''))
+
+
+class EventOrderingFilter(filters.OrderingFilter):
+    """Order search results by relevance unless an explicit ordering is requested"""
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param):
+            search = request.query_params.get(api_settings.SEARCH_PARAM, '')
+            if parse_terms(search):
+                return ['-search_rank', *(self.get_default_ordering(view) or [])]
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,124 @@
+"""
+Ticket stock reservation.
+
+Every change to ``TicketType.quantity_sold`` goes through this module so that
+it is applied by the database as a single conditional UPDATE instead of a
+read-modify-write in Python. The event's tickets_sold_total counter is
+adjusted in the same transaction.
+
+Cached catalog lists only show whether tickets are left (the cheapest
+available price and tickets_available), so they are invalidated only when a
+ticket type sells out or becomes available again, not on every sale. Event
+detail responses follow the stock through Event.inventory_version.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from .cache import invalidate
+from .counters import add_tickets_sold
+from .models import TicketType
+
+
+class InsufficientInventory(Exception):
+    """
+    Raised when a ticket type cannot cover the requested quantity.
+    """
+    def __init__(self, ticket_type, requested):
+        self.ticket_type = ticket_type
+        self.requested = requested
+        super().__init__(
+            f"Only {ticket_type.tickets_remaining} tickets available for {ticket_type.name}"
+        )
+
+
+def _group_by_ticket_type(items):
+    """Collapse (ticket_type, quantity) pairs into {ticket_type_id: [ticket_type, quantity]}"""
+    grouped = {}
+    for ticket_type, quantity in items:
+        if ticket_type.pk in grouped:
+            grouped[ticket_type.pk][1] += quantity
+        else:
+            grouped[ticket_type.pk] = [ticket_type, quantity]
+    return grouped
+
+
+def _invalidate_if_any(conditions):
+    """Invalidate cached catalog lists if a ticket type matches one of conditions"""
+    if conditions and TicketType.objects.filter(reduce(or_, conditions)).exists():
+        invalidate(TicketType)
+
+
+def reserve_tickets(items):
+    """
+    Reserve stock for a list of (ticket_type, quantity) pairs.
+
+    Each ticket type is claimed with one
+    ``UPDATE ... SET quantity_sold = quantity_sold + n WHERE quantity_sold <= quantity - n``
+    so only the rows being bought are locked, and only until the surrounding
+    transaction ends. Rows are claimed in primary key order so checkouts that
+    span the same ticket types cannot deadlock each other.
+
+    Raises InsufficientInventory if any ticket type cannot be covered, in which
+    case nothing is reserved.
+    """
+    grouped = _group_by_ticket_type(items)
+    sold = {}
+
+    with transaction.atomic():
+        for ticket_type_id in sorted(grouped):
+            ticket_type, quantity = grouped[ticket_type_id]
+            claimed = TicketType.objects.filter(
+                pk=ticket_type_id,
+                quantity_sold__lte=F('quantity') - quantity
+            ).update(quantity_sold=F('quantity_sold') + quantity)
+
+            if not claimed:
+                ticket_type.refresh_from_db(fields=['quantity', 'quantity_sold'])
+                raise InsufficientInventory(ticket_type, quantity)
+            sold[ticket_type.event_id] = sold.get(ticket_type.event_id, 0) + quantity
+
+        # Event rows are shared by all of an event's ticket types, so touch
+        # them last to keep their locks as short as possible
+        add_tickets_sold(sold)
+        # Sold out by this reservation
+        _invalidate_if_any([
+            Q(pk=ticket_type_id, quantity_sold__gte=F('quantity')) for ticket_type_id in grouped
+        ])
+
+
+def release_tickets(items):
+    """
+    Return stock reserved by reserve_tickets to the pool.
+
+    Takes (ticket_type_id, quantity) pairs so callers releasing in bulk don't
+    need to load the ticket types. Never drives ``quantity_sold`` below zero,
+    even if the same items are released twice.
+    """
+    grouped = {}
+    for ticket_type_id, quantity in items:
+        grouped[ticket_type_id] = grouped.get(ticket_type_id, 0) + quantity
+
+    event_ids = dict(
+        TicketType.objects.filter(pk__in=grouped).values_list('pk', 'event_id')
+    )
+    released = {}
+    sold_out_before = []
+
+    with transaction.atomic():
+        for ticket_type_id in sorted(grouped):
+            quantity = grouped[ticket_type_id]
+            if TicketType.objects.filter(
+                pk=ticket_type_id,
+                quantity_sold__gte=quantity
+            ).update(quantity_sold=F('quantity_sold') - quantity):
+                event_id = event_ids[ticket_type_id]
+                released[event_id] = released.get(event_id, 0) - quantity
+                sold_out_before.append(
+                    Q(pk=ticket_type_id, quantity_sold__gte=F('quantity') - quantity)
+                )
+
+        add_tickets_sold(released)
+        _invalidate_if_any(sold_out_before)
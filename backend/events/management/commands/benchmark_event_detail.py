@@ -0,0 +1,111 @@
+import threading
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from backend.conditional import ConditionalRetrieveMixin
+from events.models import Event, TicketType
+from events.viewcounts import view_counts
+from events.views import EventDetailView
+from users.models import User
+
+
+class UncoalescedEventDetailView(EventDetailView):
+    """EventDetailView building every response itself, as before coalescing"""
+    def get_current_response(self, request, row, *args, **kwargs):
+        return ConditionalRetrieveMixin.get_current_response(self, request, row, *args, **kwargs)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire N identical event detail requests at once against a cold cache "
+        "and count the database queries they run, with and without request "
+        "coalescing. Benchmark data is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            default='1,10,50,100',
+            help="Comma separated numbers of simultaneous requests"
+        )
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['concurrency'].split(',')]
+
+        # Unique names, so leftovers of an interrupted run don't collide
+        name = f'bench-organizer-{uuid.uuid4().hex[:8]}'
+        organizer = User.objects.create_user(
+            email=f'{name}@example.com',
+            username=name,
+            password='unused',
+            user_type='organizer'
+        )
+        try:
+            with override_settings(EVENT_VIEW_FLUSH_INTERVAL=0):
+                self.run(organizer, levels)
+                view_counts.flush()
+        finally:
+            # Cascades to the event and its ticket types
+            organizer.delete()
+
+    def run(self, organizer, levels):
+        start = timezone.now() + timedelta(days=30)
+        event = Event.objects.create(
+            title='Detail benchmark',
+            slug=f'detail-benchmark-{organizer.pk}',
+            description='Benchmark event',
+            organizer=organizer,
+            start_date=start,
+            end_date=start + timedelta(hours=4),
+            venue_name='Bench',
+            venue_address='Bench',
+            city='Nairobi',
+            status='published'
+        )
+        for name in ('Early Bird', 'Regular', 'VIP'):
+            TicketType.objects.create(event=event, name=name, price=100, quantity=1000)
+
+        self.stdout.write("Database queries for N simultaneous requests on a cold cache")
+        self.stdout.write(f"{'requests':>8} {'uncoalesced':>12} {'coalesced':>10} {'freshness checks':>17}")
+        for level in levels:
+            uncoalesced = self.measure(UncoalescedEventDetailView.as_view(), event.slug, level)
+            coalesced = self.measure(EventDetailView.as_view(), event.slug, level)
+            # Every request runs one validator query; the rest build the payload
+            self.stdout.write(f"{level:>8} {uncoalesced:>12} {coalesced:>10} {level:>17}")
+
+    def measure(self, view, slug, level):
+        cache.clear()
+        factory = APIRequestFactory()
+        barrier = threading.Barrier(level)
+        counts = []
+        errors = []
+
+        def request():
+            try:
+                barrier.wait()
+                with CaptureQueriesContext(connection) as queries:
+                    response = view(factory.get(f'/api/events/{slug}/'), slug=slug)
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+                counts.append(len(queries))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=request) for _ in range(level)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise RuntimeError(f"Benchmark requests failed: {errors[:3]}")
+        return sum(counts)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from events.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the event full-text search index from the events table"
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            get_search_backend().install(cursor)
+        self.stdout.write(f"Rebuilt the {connection.vendor} event search index")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from events.counters import recount_categories, recount_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the denormalized category and event counters from the source "
+        "rows, e.g. after a bulk import or to repair drift"
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            categories = recount_categories()
+            events = recount_events()
+        self.stdout.write(f"Recounted {categories} categories and {events} events")
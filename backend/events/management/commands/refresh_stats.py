@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the platform stats snapshot from the source tables. Run it "
+        "periodically: upcoming event counts drift as events start."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help="Keep running, reconciling every N seconds (default: reconcile once and exit)"
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            stats = reconcile()
+            self.stdout.write(
+                f"{stats.total_events} published events, {stats.upcoming_events} upcoming, "
+                f"{stats.categories_count} categories, {stats.tickets_sold} tickets sold, "
+                f"{stats.gross_revenue} gross revenue"
+            )
+
+            if not interval:
+                break
+            time.sleep(interval)
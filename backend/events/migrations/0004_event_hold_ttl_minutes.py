@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_alter_event_organizer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='hold_ttl_minutes',
+            field=models.PositiveIntegerField(default=15, help_text='Minutes an unpaid order keeps its tickets before they are released'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:05
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Category = apps.get_model('events', 'Category')
+    Event = apps.get_model('events', 'Event')
+    TicketType = apps.get_model('events', 'TicketType')
+
+    published = Event.objects.filter(
+        category=OuterRef('pk'), status='published'
+    ).order_by().values('category').annotate(count=Count('pk')).values('count')
+    Category.objects.update(
+        published_events_count=Coalesce(Subquery(published, output_field=IntegerField()), 0)
+    )
+
+    def ticket_type_sum(field):
+        totals = TicketType.objects.filter(
+            event=OuterRef('pk')
+        ).order_by().values('event').annotate(total=Sum(field)).values('total')
+        return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+    Event.objects.update(
+        tickets_sold_total=ticket_type_sum('quantity_sold'),
+        capacity_total=ticket_type_sum('quantity')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_event_hold_ttl_minutes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_events_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='capacity_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='tickets_sold_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
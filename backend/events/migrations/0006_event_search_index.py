@@ -0,0 +1,61 @@
+from django.db import migrations
+
+
+# The full-text index as of this migration; events.search maintains it
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS events_event_fts USING fts5("
+    "title, description, venue_name, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "DELETE FROM events_event_fts",
+    "INSERT INTO events_event_fts (rowid, title, description, venue_name) "
+    "SELECT id, title, description, venue_name FROM events_event",
+]
+SQLITE_UNINSTALL = [
+    "DROP TABLE IF EXISTS events_event_fts",
+]
+
+POSTGRES_INSTALL = [
+    "ALTER TABLE events_event ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(venue_name, '')), 'B')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS events_event_search_idx "
+    "ON events_event USING GIN (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS events_event_search_idx",
+    "ALTER TABLE events_event DROP COLUMN IF EXISTS search_vector",
+]
+
+STATEMENTS = {
+    'sqlite': (SQLITE_INSTALL, SQLITE_UNINSTALL),
+    'postgresql': (POSTGRES_INSTALL, POSTGRES_UNINSTALL),
+}
+
+
+def run_statements(schema_editor, index):
+    statements = STATEMENTS.get(schema_editor.connection.vendor, ([], []))[index]
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install_search_index(apps, schema_editor):
+    run_statements(schema_editor, 0)
+
+
+def uninstall_search_index(apps, schema_editor):
+    run_statements(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_counter_caches'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
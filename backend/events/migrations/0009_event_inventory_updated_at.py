@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_platformstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='inventory_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
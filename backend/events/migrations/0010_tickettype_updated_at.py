@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_event_inventory_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tickettype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_tickettype_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSearchEntry',
+            fields=[
+                ('event', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='events.event')),
+                ('document', models.TextField(db_column='events_event_fts')),
+            ],
+            options={
+                'db_table': 'events_event_fts',
+                'managed': False,
+            },
+        ),
+    ]
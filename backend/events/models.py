@@ -11,6 +11,10 @@ class Category(models.Model):
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     description = models.TextField(blank=True)
     icon = models.CharField(max_length=50, blank=True, help_text="Icon class name")
+    
+    # Maintained by events.counters
+    published_events_count = models.PositiveIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -26,6 +30,30 @@ class Category(models.Model):
         return self.name
 
 
+class EventQuerySet(models.QuerySet):
+    """
+    Reusable query building blocks for events.
+    """
+    def published(self):
+        return self.filter(status='published')
+    
+    def for_listing(self):
+        """
+        Join the category and organizer and annotate min_available_price,
+        so EventListSerializer needs no per-row queries.
+        """
+        from django.db.models import F, OuterRef, Subquery
+        
+        cheapest_available = TicketType.objects.filter(
+            event=OuterRef('pk'),
+            quantity_sold__lt=F('quantity')
+        ).order_by('price').values('price')[:1]
+        
+        return self.select_related('category', 'organizer').annotate(
+            min_available_price=Subquery(cheapest_available)
+        )
+
+
 class Event(models.Model):
     """
     Main Event model representing events that can be ticketed.
@@ -74,11 +102,27 @@ class Event(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     is_featured = models.BooleanField(default=False)
     
+    # Checkout
+    hold_ttl_minutes = models.PositiveIntegerField(
+        default=15,
+        help_text="Minutes an unpaid order keeps its tickets before they are released"
+    )
+    
     # Metadata
     views_count = models.PositiveIntegerField(default=0)
+    
+    # Totals across ticket types, maintained by events.counters
+    tickets_sold_total = models.PositiveIntegerField(default=0, editable=False)
+    capacity_total = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped whenever ticket type stock, prices or capacity change
+    inventory_version = models.PositiveIntegerField(default=0, editable=False)
+    inventory_updated_at = models.DateTimeField(blank=True, null=True, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = EventQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-start_date']
         indexes = [
@@ -86,6 +130,13 @@ class Event(models.Model):
             models.Index(fields=['category', 'status']),
         ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so signal handlers can tell what a save changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
@@ -103,12 +154,12 @@ class Event(models.Model):
     @property
     def tickets_sold(self):
         """Total number of tickets sold for this event"""
-        return sum(ticket.tickets_sold for ticket in self.ticket_types.all())
+        return self.tickets_sold_total
     
     @property
     def total_capacity(self):
         """Total capacity across all ticket types"""
-        return sum(ticket.quantity for ticket in self.ticket_types.all())
+        return self.capacity_total
 
 
 class TicketType(models.Model):
@@ -135,6 +186,8 @@ class TicketType(models.Model):
     max_purchase = models.PositiveIntegerField(default=10)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    # Not touched by stock changes, which are set-based UPDATEs
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['price']
@@ -169,4 +222,48 @@ class TicketType(models.Model):
     @property
     def tickets_sold(self):
         """Alias for quantity_sold"""
-        return self.quantity_sold
\ No newline at end of file
+        return self.quantity_sold
+
+
+class PlatformStats(models.Model):
+    """
+    Single-row snapshot of platform-wide totals, maintained by events.stats.
+    """
+    total_events = models.PositiveIntegerField(default=0)
+    upcoming_events = models.PositiveIntegerField(default=0)
+    categories_count = models.PositiveIntegerField(default=0)
+    
+    # Admin totals, refreshed by reconciliation only
+    tickets_sold = models.PositiveIntegerField(default=0)
+    gross_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    reconciled_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        verbose_name_plural = 'platform stats'
+    
+    def __str__(self):
+        return "Platform stats"
+
+
+class EventSearchEntry(models.Model):
+    """
+    Row of the SQLite FTS5 index maintained by events.search, so searches
+    can join it through the ORM. Not managed: the table only exists on
+    SQLite and is created by a migration.
+    """
+    event = models.OneToOneField(
+        Event,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_entry'
+    )
+    # FTS5's hidden column named after the table: the left-hand side of
+    # MATCH and the first argument of bm25()
+    document = models.TextField(db_column='events_event_fts')
+    
+    class Meta:
+        managed = False
+        db_table = 'events_event_fts'
@@ -0,0 +1,181 @@
+"""
+Full-text search over event titles, descriptions and venues.
+
+The backend follows the database vendor:
+
+* SQLite keeps an FTS5 table (events_event_fts) keyed by event id, written
+  from the Event post_save/post_delete signals.
+* PostgreSQL keeps a generated, GIN-indexed tsvector column
+  (events_event.search_vector) that the database updates on every save.
+* Other databases fall back to icontains matching without ranking.
+
+Every search term is matched as a prefix and all terms must match.
+``search`` annotates ``search_rank``, where higher is more relevant.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Func, Lookup, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_FIELDS = ('title', 'description', 'venue_name')
+
+# Relative weight of a match in each of SEARCH_FIELDS
+SQLITE_WEIGHTS = (10.0, 1.0, 5.0)
+POSTGRES_WEIGHTS = ('A', 'C', 'B')
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def parse_terms(query):
+    """Split a user query into lowercase word terms, dropping operators and punctuation"""
+    return [term.lower() for term in TERM_RE.findall(query or '')]
+
+
+class Match(Lookup):
+    """FTS5 full-text match of an index's table column against a query"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+class SearchBackend:
+    """Interface shared by the backends; index maintenance defaults to no-ops"""
+    def install(self, cursor):
+        """Create and populate the index (see the rebuild_search_index command)"""
+
+    def uninstall(self, cursor):
+        """Drop the index"""
+
+    def index(self, event):
+        """Write event to the index after it is saved"""
+
+    def remove(self, event_id):
+        """Drop a deleted event from the index"""
+
+    def search(self, queryset, terms):
+        raise NotImplementedError
+
+
+class SQLiteSearchBackend(SearchBackend):
+    table = 'events_event_fts'
+
+    def install(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+            "title, description, venue_name, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute(f"DELETE FROM {self.table}")
+        cursor.execute(
+            f"INSERT INTO {self.table} (rowid, title, description, venue_name) "
+            "SELECT id, title, description, venue_name FROM events_event"
+        )
+
+    def uninstall(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def index(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [event.pk])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, description, venue_name) "
+                "VALUES (%s, %s, %s, %s)",
+                [event.pk, event.title, event.description, event.venue_name]
+            )
+
+    def remove(self, event_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [event_id])
+
+    def match_expression(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, terms):
+        # The index is joined once (EventSearchEntry), so the MATCH runs a
+        # single time and bm25() is read off the joined row; it is lower for
+        # better matches, so negate it
+        document = F('search_entry__document')
+        rank = Func(
+            document, *(Value(weight) for weight in SQLITE_WEIGHTS),
+            function='bm25', output_field=FloatField()
+        )
+        # FTS5 can only run the MATCH from an inner join
+        return queryset.filter(
+            Match(document, Value(self.match_expression(terms))),
+            search_entry__isnull=False
+        ).annotate(search_rank=-rank)
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    search_vector is a stored generated column, so PostgreSQL keeps it in
+    sync with every save and index/remove have nothing to do.
+    """
+    def install(self, cursor):
+        vector = ' || '.join(
+            f"setweight(to_tsvector('english', coalesce({field}, '')), '{weight}')"
+            for field, weight in zip(SEARCH_FIELDS, POSTGRES_WEIGHTS)
+        )
+        cursor.execute(
+            "ALTER TABLE events_event ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({vector}) STORED"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS events_event_search_idx "
+            "ON events_event USING GIN (search_vector)"
+        )
+
+    def uninstall(self, cursor):
+        cursor.execute("DROP INDEX IF EXISTS events_event_search_idx")
+        cursor.execute("ALTER TABLE events_event DROP COLUMN IF EXISTS search_vector")
+
+    def tsquery(self, terms):
+        # Terms are plain words, so quoting them keeps tsquery syntax out
+        return ' & '.join("'%s':*" % term.replace("'", "''") for term in terms)
+
+    def search(self, queryset, terms):
+        query = self.tsquery(terms)
+        rank = RawSQL(
+            "ts_rank(events_event.search_vector, to_tsquery('english', %s))",
+            [query],
+            output_field=FloatField()
+        )
+        matches = RawSQL(
+            "events_event.search_vector @@ to_tsquery('english', %s)",
+            [query],
+            output_field=BooleanField()
+        )
+        return queryset.filter(matches).annotate(search_rank=rank)
+
+
+class BasicSearchBackend(SearchBackend):
+    """icontains over SEARCH_FIELDS; every result ranks the same"""
+    def search(self, queryset, terms):
+        for term in terms:
+            condition = Q()
+            for field in SEARCH_FIELDS:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset.annotate(search_rank=Value(0.0))
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend(vendor=None):
+    return BACKENDS.get(vendor or connection.vendor, BasicSearchBackend)()
+
+
+def search_events(queryset, query):
+    """Filter queryset to events matching every term of query, annotated with search_rank"""
+    terms = parse_terms(query)
+    if not terms:
+        return queryset
+    return get_search_backend().search(queryset, terms)
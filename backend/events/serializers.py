@@ -7,14 +7,11 @@ class CategorySerializer(serializers.ModelSerializer):
     """
     Serializer for event categories.
     """
-    events_count = serializers.SerializerMethodField()
+    events_count = serializers.IntegerField(source='published_events_count', read_only=True)
     
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description', 'icon', 'events_count']
-    
-    def get_events_count(self, obj):
-        return obj.events.filter(status='published').count()
 
 
 class TicketTypeSerializer(serializers.ModelSerializer):
@@ -65,17 +62,17 @@ class EventListSerializer(serializers.ModelSerializer):
         ]
     
     def get_min_price(self, obj):
+        # Querysets built with Event.objects.for_listing() carry the values
+        if hasattr(obj, 'min_available_price'):
+            return obj.min_available_price
+        
         ticket_types = obj.ticket_types.filter(quantity_sold__lt=models.F('quantity'))
         if ticket_types.exists():
             return ticket_types.order_by('price').first().price
         return None
     
     def get_tickets_available(self, obj):
-        total_remaining = sum(
-            ticket.tickets_remaining 
-            for ticket in obj.ticket_types.all()
-        )
-        return total_remaining > 0
+        return obj.capacity_total > obj.tickets_sold_total
 
 
 class EventDetailSerializer(serializers.ModelSerializer):
@@ -118,7 +115,7 @@ class EventCreateUpdateSerializer(serializers.ModelSerializer):
             'title', 'description', 'category_id', 'start_date',
             'end_date', 'venue_name', 'venue_address', 'city',
             'country', 'banner_image', 'thumbnail_image',
-            'status', 'ticket_types'
+            'status', 'hold_ttl_minutes', 'ticket_types'
         ]
     
     def create(self, validated_data):
@@ -0,0 +1,91 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate
+from .counters import recount_categories, recount_events
+from .models import Category, Event, TicketType
+from .search import SEARCH_FIELDS, get_search_backend
+from . import stats
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, created, **kwargs):
+    """
+    Recount categories when an event is published, unpublished or moved,
+    reindex it when its searchable text changes and adjust the platform
+    stats when its status or start date changes.
+    """
+    loaded = getattr(instance, '_loaded_values', {})
+    # Fields left out by .only()/.defer() were neither loaded nor saved
+    deferred = instance.get_deferred_fields()
+
+    def changed(attname):
+        return created or (attname not in deferred and loaded.get(attname) != getattr(instance, attname))
+
+    if changed('status') or changed('category_id'):
+        recount_categories({instance.category_id, loaded.get('category_id')} - {None})
+
+    if any(changed(field) for field in SEARCH_FIELDS):
+        get_search_backend().index(instance)
+
+    if changed('status') or changed('start_date'):
+        if created:
+            before = (0, 0)
+        elif 'status' in loaded and 'start_date' in loaded:
+            before = stats.event_counts(loaded['status'], loaded['start_date'])
+        else:
+            before = None
+
+        if before is None:
+            # Loaded without its previous values; recount instead of guessing
+            stats.reconcile(['total_events', 'upcoming_events'])
+        else:
+            after = stats.event_counts(instance.status, instance.start_date)
+            stats.adjust(
+                total_events=after[0] - before[0],
+                upcoming_events=after[1] - before[1]
+            )
+
+    tracked = ('status', 'category_id', 'start_date', *SEARCH_FIELDS)
+    instance._loaded_values = {
+        **loaded,
+        **{attname: getattr(instance, attname) for attname in tracked if attname not in deferred},
+    }
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance, **kwargs):
+    if instance.category_id:
+        recount_categories([instance.category_id])
+    get_search_backend().remove(instance.pk)
+
+    total, upcoming = stats.event_counts(instance.status, instance.start_date)
+    stats.adjust(total_events=-total, upcoming_events=-upcoming)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.adjust(categories_count=1)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    stats.adjust(categories_count=-1)
+
+
+@receiver(post_save, sender=TicketType)
+@receiver(post_delete, sender=TicketType)
+def ticket_type_changed(sender, instance, **kwargs):
+    """Keep the event's capacity and sold totals in step with its ticket types"""
+    recount_events([instance.event_id])
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=TicketType)
+@receiver(post_delete, sender=TicketType)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_cached_responses(sender, **kwargs):
+    invalidate(sender)
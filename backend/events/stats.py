@@ -0,0 +1,78 @@
+"""
+Materialized platform statistics.
+
+PlatformStats is a single row read by primary key. Event and category
+signals keep total_events, upcoming_events and categories_count current by
+applying +1/-1 adjustments; reconcile() recomputes every registered metric
+from the source tables. Reconciliation runs periodically from the
+``refresh_stats`` command because events stop being upcoming as time passes.
+
+Other apps add metrics with register(); metrics without incremental
+adjustments (tickets_sold, gross_revenue) are only as fresh as the last
+reconciliation, which keeps checkouts from contending on the stats row.
+"""
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Category, Event, PlatformStats
+
+STATS_PK = 1
+
+_metrics = {}
+
+
+def register(field, compute):
+    """Compute PlatformStats.<field> from scratch with compute() on reconciliation"""
+    _metrics[field] = compute
+
+
+def get_stats():
+    """The stats row, built by a full reconciliation the first time it is needed"""
+    stats = PlatformStats.objects.filter(pk=STATS_PK).first()
+    return stats if stats is not None else reconcile()
+
+
+def reconcile(fields=None):
+    """Recompute fields (all registered metrics if None) and store them"""
+    values = {field: _metrics[field]() for field in (fields or _metrics)}
+    if fields is None:
+        values['reconciled_at'] = timezone.now()
+    stats, _ = PlatformStats.objects.update_or_create(pk=STATS_PK, defaults=values)
+    return stats
+
+
+def adjust(**deltas):
+    """Apply relative changes, e.g. adjust(total_events=1)"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        updated = PlatformStats.objects.filter(pk=STATS_PK).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+        if not updated:
+            # No snapshot yet: build one, which already includes this change
+            reconcile()
+
+
+def event_counts(status, start_date, now=None):
+    """The (total_events, upcoming_events) contribution of one event"""
+    if status != 'published':
+        return 0, 0
+    upcoming = start_date is not None and start_date >= (now or timezone.now())
+    return 1, int(upcoming)
+
+
+def _published():
+    return Event.objects.filter(status='published')
+
+
+register('total_events', lambda: _published().count())
+register('upcoming_events', lambda: _published().filter(start_date__gte=timezone.now()).count())
+register('categories_count', lambda: Category.objects.count())
+register(
+    'tickets_sold',
+    lambda: Event.objects.aggregate(total=Sum('tickets_sold_total'))['total'] or 0
+)
@@ -1,3 +1,745 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from unittest import mock, skipUnless
+from base64 import urlsafe_b64encode
+from datetime import timedelta
 
-# Create your tests here.
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backend.pagination import KeysetPagination
+from users.models import User
+from .inventory import reserve_tickets, release_tickets, InsufficientInventory
+from .models import Category, Event, PlatformStats, TicketType
+from .cache import cached_event_detail, get_response_cache, model_versions
+from .singleflight import SingleFlight
+from .viewcounts import ViewCountBuffer, view_counts
+
+
+def make_event(organizer, category=None, **kwargs):
+    """Create a published event starting next week"""
+    start = timezone.now() + timedelta(days=7)
+    defaults = {
+        'title': 'Test Event',
+        'description': 'Description',
+        'category': category,
+        'organizer': organizer,
+        'start_date': start,
+        'end_date': start + timedelta(hours=4),
+        'venue_name': 'KICC',
+        'venue_address': 'Harambee Avenue',
+        'city': 'Nairobi',
+        'status': 'published',
+    }
+    defaults.update(kwargs)
+    return Event.objects.create(**defaults)
+
+
+def make_organizer(email='organizer@example.com'):
+    return User.objects.create_user(
+        email=email,
+        username=email.split('@')[0],
+        password='pass12345',
+        user_type='organizer',
+    )
+
+
+class ReserveTicketsTests(TestCase):
+    def setUp(self):
+        self.event = make_event(make_organizer())
+        self.regular = TicketType.objects.create(
+            event=self.event, name='Regular', price=1000, quantity=10
+        )
+        self.vip = TicketType.objects.create(
+            event=self.event, name='VIP', price=5000, quantity=2
+        )
+
+    def test_reserve_increments_quantity_sold(self):
+        reserve_tickets([(self.regular, 3), (self.vip, 2)])
+
+        self.regular.refresh_from_db()
+        self.vip.refresh_from_db()
+        self.assertEqual(self.regular.quantity_sold, 3)
+        self.assertEqual(self.vip.quantity_sold, 2)
+
+    def test_reserve_is_all_or_nothing(self):
+        with self.assertRaises(InsufficientInventory) as ctx:
+            reserve_tickets([(self.regular, 3), (self.vip, 3)])
+
+        self.assertEqual(ctx.exception.ticket_type, self.vip)
+        self.regular.refresh_from_db()
+        self.assertEqual(self.regular.quantity_sold, 0)
+
+    def test_duplicate_lines_are_combined(self):
+        with self.assertRaises(InsufficientInventory):
+            reserve_tickets([(self.vip, 1), (self.vip, 2)])
+
+    def test_release_never_goes_negative(self):
+        reserve_tickets([(self.regular, 2)])
+        release_tickets([(self.regular.pk, 2)])
+        release_tickets([(self.regular.pk, 2)])
+
+        self.regular.refresh_from_db()
+        self.assertEqual(self.regular.quantity_sold, 0)
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    """
+    Hammer a single ticket type from many threads, each with its own
+    database connection, and make sure it is never oversold.
+    """
+    threads = 16
+    attempts_per_thread = 10
+
+    def test_ticket_type_is_never_oversold(self):
+        event = make_event(make_organizer())
+        ticket_type = TicketType.objects.create(
+            event=event, name='Flash Sale', price=500, quantity=50
+        )
+        reserved = []
+        rejected = []
+        errors = []
+        start = threading.Barrier(self.threads)
+
+        def buyer():
+            try:
+                start.wait()
+                for _ in range(self.attempts_per_thread):
+                    try:
+                        reserve_tickets([(TicketType.objects.get(pk=ticket_type.pk), 1)])
+                        reserved.append(1)
+                    except InsufficientInventory:
+                        rejected.append(1)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=buyer) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        ticket_type.refresh_from_db()
+        self.assertEqual(ticket_type.quantity_sold, ticket_type.quantity)
+        self.assertEqual(len(reserved), ticket_type.quantity)
+        self.assertEqual(len(rejected), self.threads * self.attempts_per_thread - ticket_type.quantity)
+
+
+class EventListingQueryTests(TestCase):
+    """
+    Listing endpoints must serve a page in a constant number of queries,
+    however many events, categories and ticket types are on it.
+    """
+    def setUp(self):
+        cache.clear()
+        self.organizer = make_organizer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def add_events(self, count):
+        for i in range(count):
+            category = Category.objects.create(name=f'Category {Category.objects.count()}')
+            event = make_event(
+                self.organizer, category, title=f'Event {Event.objects.count()}', is_featured=True
+            )
+            TicketType.objects.create(event=event, name='Regular', price=1000, quantity=10)
+            TicketType.objects.create(event=event, name='VIP', price=3000, quantity=5, quantity_sold=5)
+
+    def assertConstantQueries(self, url):
+        self.add_events(1)
+        with CaptureQueriesContext(connection) as one_event:
+            self.client.get(url)
+
+        self.add_events(5)
+        with CaptureQueriesContext(connection) as six_events:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(len(six_events), len(one_event))
+        self.assertLessEqual(len(six_events), 2)
+
+    def test_event_list(self):
+        self.assertConstantQueries('/api/events/')
+
+    def test_featured_events(self):
+        self.assertConstantQueries('/api/events/featured/')
+
+    def test_my_events(self):
+        self.assertConstantQueries('/api/events/my/events/')
+
+    def test_annotations_match_ticket_types(self):
+        self.add_events(1)
+        sold_out = make_event(self.organizer, title='Sold out')
+        TicketType.objects.create(event=sold_out, name='Regular', price=100, quantity=1, quantity_sold=1)
+
+        results = {row['title']: row for row in self.client.get('/api/events/').data['results']}
+
+        self.assertEqual(results['Event 0']['min_price'], 1000)
+        self.assertTrue(results['Event 0']['tickets_available'])
+        self.assertEqual(results['Event 0']['category']['events_count'], 1)
+        self.assertIsNone(results['Sold out']['min_price'])
+        self.assertFalse(results['Sold out']['tickets_available'])
+
+
+class CounterTests(TestCase):
+    """Denormalized counters follow publishing, ticket type edits and sales"""
+    def setUp(self):
+        self.organizer = make_organizer()
+        self.music = Category.objects.create(name='Music')
+        self.sports = Category.objects.create(name='Sports')
+        self.event = make_event(self.organizer, self.music)
+        self.regular = TicketType.objects.create(event=self.event, name='Regular', price=100, quantity=10)
+
+    def test_category_count_follows_status_and_category(self):
+        self.music.refresh_from_db()
+        self.assertEqual(self.music.published_events_count, 1)
+
+        self.event.status = 'draft'
+        self.event.save()
+        self.music.refresh_from_db()
+        self.assertEqual(self.music.published_events_count, 0)
+
+        self.event.status = 'published'
+        self.event.category = self.sports
+        self.event.save()
+        self.music.refresh_from_db()
+        self.sports.refresh_from_db()
+        self.assertEqual(self.music.published_events_count, 0)
+        self.assertEqual(self.sports.published_events_count, 1)
+
+        self.event.delete()
+        self.sports.refresh_from_db()
+        self.assertEqual(self.sports.published_events_count, 0)
+
+    def test_saving_unchanged_event_does_not_recount(self):
+        event = Event.objects.get(pk=self.event.pk)
+        event.views_count += 1
+        with self.assertNumQueries(1):
+            event.save()
+
+    def test_event_totals_follow_ticket_types(self):
+        vip = TicketType.objects.create(event=self.event, name='VIP', price=500, quantity=5, quantity_sold=2)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.capacity_total, self.event.tickets_sold_total), (15, 2))
+
+        vip.quantity = 8
+        vip.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.capacity_total, 18)
+
+        vip.delete()
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.capacity_total, self.event.tickets_sold_total), (10, 0))
+
+    def test_sales_and_releases_adjust_tickets_sold(self):
+        reserve_tickets([(self.regular, 4)])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold_total, 4)
+
+        release_tickets([(self.regular.pk, 3)])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold_total, 1)
+
+    def test_recount_command_repairs_drift(self):
+        reserve_tickets([(self.regular, 2)])
+        Event.objects.filter(pk=self.event.pk).update(tickets_sold_total=99, capacity_total=0)
+        Category.objects.update(published_events_count=7)
+
+        call_command('recount', stdout=StringIO())
+
+        self.event.refresh_from_db()
+        self.music.refresh_from_db()
+        self.sports.refresh_from_db()
+        self.assertEqual((self.event.capacity_total, self.event.tickets_sold_total), (10, 2))
+        self.assertEqual(self.music.published_events_count, 1)
+        self.assertEqual(self.sports.published_events_count, 0)
+
+    def test_category_list_reads_only_categories(self):
+        client = APIClient()
+        # Page count and page rows, no join or aggregate over events
+        with self.assertNumQueries(2):
+            response = client.get('/api/events/categories/')
+        counts = {row['name']: row['events_count'] for row in response.data['results']}
+        self.assertEqual(counts, {'Music': 1, 'Sports': 0})
+
+
+@override_settings(EVENT_VIEW_FLUSH_INTERVAL=0)
+class ViewCountTests(TestCase):
+    def setUp(self):
+        self.event = make_event(make_organizer(), slug='test-event')
+        self.client = APIClient()
+        self.addCleanup(view_counts.flush)
+
+    def test_detail_does_not_write(self):
+        self.client.get('/api/events/test-event/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/events/test-event/')
+
+        self.assertEqual(response.data['views_count'], 2)
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE')])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.views_count, 0)
+
+    def test_flush_coalesces_views_per_event(self):
+        other = make_event(self.event.organizer, slug='other-event')
+        buffer = ViewCountBuffer()
+        for _ in range(5):
+            buffer.record(self.event.pk)
+        buffer.record(other.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "events_event"')]), 2)
+        self.assertEqual(buffer.flush(), 0)
+
+        self.event.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.event.views_count, other.views_count), (5, 1))
+
+    def test_failed_flush_keeps_views(self):
+        buffer = ViewCountBuffer()
+        buffer.record(self.event.pk, count=3)
+
+        with mock.patch.object(Event.objects, 'filter', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                buffer.flush()
+        self.assertEqual(buffer.pending(self.event.pk), 3)
+
+        buffer.flush()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.views_count, 3)
+
+
+class EventSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        organizer = make_organizer()
+        self.title_match = make_event(
+            organizer, title='Nairobi Jazz Festival', slug='jazz-festival', description='Live music'
+        )
+        self.venue_match = make_event(
+            organizer, title='Sunday Session', slug='sunday-session',
+            description='An afternoon of jazz standards', venue_name='Jazzville Lounge'
+        )
+        self.other = make_event(organizer, title='Rock Night', slug='rock-night', description='Guitars')
+        self.client = APIClient()
+
+    def search(self, query, **params):
+        response = self.client.get('/api/events/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['slug'] for row in response.data['results']]
+
+    def test_prefix_match_ranked_by_relevance(self):
+        self.assertEqual(self.search('jaz'), ['jazz-festival', 'sunday-session'])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('jazz nairobi'), ['jazz-festival'])
+        self.assertEqual(self.search('jazz guitars'), [])
+
+    def test_explicit_ordering_wins(self):
+        Event.objects.filter(pk=self.venue_match.pk).update(start_date=self.title_match.start_date + timedelta(days=1))
+        self.assertEqual(self.search('jazz', ordering='-start_date'), ['sunday-session', 'jazz-festival'])
+
+    def test_query_syntax_is_treated_as_text(self):
+        self.assertEqual(self.search('"jazz*" ('), ['jazz-festival', 'sunday-session'])
+        self.assertEqual(len(self.search('')), 3)
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 index')
+    def test_index_is_matched_once_per_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search('jazz')
+        self.assertTrue(queries)
+        for query in queries:
+            self.assertLessEqual(query['sql'].count('MATCH'), 1)
+
+    @mock.patch.object(KeysetPagination, 'page_size', 1)
+    def test_keyset_pages_follow_relevance(self):
+        response = self.client.get('/api/events/', {'search': 'jazz', 'pagination': 'cursor'})
+        self.assertEqual([row['slug'] for row in response.data['results']], ['jazz-festival'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['slug'] for row in response.data['results']], ['sunday-session'])
+        self.assertIsNone(response.data['next'])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.other.title = 'Jazz on the Rocks'
+        self.other.save()
+        self.assertIn('rock-night', self.search('jazz'))
+
+        self.title_match.delete()
+        self.assertNotIn('jazz-festival', self.search('jazz'))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        organizer = make_organizer()
+        start = timezone.now() + timedelta(days=7)
+        # Pairs of events share a start date, so pages must break ties on id
+        for i in range(30):
+            make_event(organizer, title=f'Event {i}', slug=f'event-{i}', start_date=start + timedelta(hours=i // 2))
+        self.expected = list(Event.objects.order_by('start_date', 'id').values_list('slug', flat=True))
+        self.client = APIClient()
+
+    def walk(self, url):
+        slugs, pages = [], []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            pages.append(response.data)
+            slugs += [row['slug'] for row in response.data['results']]
+            self.assertFalse([q for q in queries if 'COUNT(' in q['sql']])
+            url = response.data['next']
+        return slugs, pages
+
+    def test_cursor_pages_cover_every_event_once(self):
+        slugs, pages = self.walk('/api/events/?pagination=cursor')
+        self.assertEqual(slugs, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_returns_preceding_page(self):
+        _, pages = self.walk('/api/events/?pagination=cursor')
+        previous = self.client.get(pages[2]['previous']).data
+        self.assertEqual(previous['results'], pages[1]['results'])
+        self.assertIsNotNone(previous['next'])
+
+    def test_descending_ordering(self):
+        slugs, _ = self.walk('/api/events/?pagination=cursor&ordering=-start_date')
+        expected = list(Event.objects.order_by('-start_date', '-id').values_list('slug', flat=True))
+        self.assertEqual(slugs, expected)
+
+    def test_page_numbers_remain_the_default(self):
+        response = self.client.get('/api/events/?page=2')
+        self.assertEqual(response.data['count'], 30)
+        self.assertEqual([row['slug'] for row in response.data['results']], self.expected[12:24])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/events/?cursor=not-a-cursor').status_code, 404)
+
+    def test_tampered_cursor_values(self):
+        for values in [['notadate', 1], [{'a': 1}, 1], [[2026], 1], [None, 1], ['2026-10-01T00:00:00+00:00', 'x']]:
+            with self.subTest(values=values):
+                cursor = urlsafe_b64encode(json.dumps({'v': values, 'r': False}).encode()).decode()
+                self.assertEqual(self.client.get('/api/events/', {'cursor': cursor}).status_code, 404)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organizer = make_organizer()
+        self.category = Category.objects.create(name='Music')
+        self.event = make_event(self.organizer, self.category, slug='concert', is_featured=True)
+        self.ticket_type = TicketType.objects.create(event=self.event, name='Regular', price=100, quantity=2)
+        self.client = APIClient()
+
+    def assertCached(self, url):
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.data, first.data)
+
+    def test_catalog_endpoints_are_cached(self):
+        for url in ['/api/events/categories/', '/api/events/featured/', '/api/events/']:
+            with self.subTest(url=url):
+                self.assertCached(url)
+
+    def test_query_string_is_part_of_the_key(self):
+        self.client.get('/api/events/')
+        self.assertEqual(self.client.get('/api/events/?city=Mombasa').data['count'], 0)
+
+    def test_authenticated_event_list_is_not_cached(self):
+        self.client.force_authenticate(self.organizer)
+        self.client.get('/api/events/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/events/')
+        self.assertTrue(queries)
+
+    def test_model_changes_invalidate(self):
+        self.client.get('/api/events/categories/')
+        Category.objects.create(name='Sports')
+        self.assertEqual(self.client.get('/api/events/categories/').data['count'], 2)
+
+        self.client.get('/api/events/stats/')
+        make_event(self.organizer, self.category, slug='second')
+        self.assertEqual(self.client.get('/api/events/stats/').data['total_events'], 2)
+
+        self.client.get('/api/events/featured/')
+        self.ticket_type.price = 50
+        self.ticket_type.save()
+        featured = self.client.get('/api/events/featured/').data['results']
+        self.assertEqual(featured[0]['min_price'], 50)
+
+    def test_sales_invalidate_availability(self):
+        self.assertTrue(self.client.get('/api/events/').data['results'][0]['tickets_available'])
+        reserve_tickets([(self.ticket_type, 2)])
+        self.assertFalse(self.client.get('/api/events/').data['results'][0]['tickets_available'])
+
+        release_tickets([(self.ticket_type.pk, 1)])
+        self.assertTrue(self.client.get('/api/events/').data['results'][0]['tickets_available'])
+
+    def test_sales_keep_entries_until_availability_changes(self):
+        self.ticket_type.quantity = 3
+        self.ticket_type.save()
+        for url in ['/api/events/categories/', '/api/events/featured/', '/api/events/']:
+            self.client.get(url)
+
+        reserve_tickets([(self.ticket_type, 1)])
+        release_tickets([(self.ticket_type.pk, 1)])
+        for url in ['/api/events/categories/', '/api/events/featured/', '/api/events/']:
+            with self.subTest(url=url), self.assertNumQueries(0):
+                self.client.get(url)
+
+    def test_publishing_updates_category_counts(self):
+        self.assertEqual(self.client.get('/api/events/categories/').data['results'][0]['events_count'], 1)
+        make_event(self.organizer, self.category, slug='second')
+        self.assertEqual(self.client.get('/api/events/categories/').data['results'][0]['events_count'], 2)
+
+    def test_unrelated_model_changes_keep_entries(self):
+        self.client.get('/api/events/categories/')
+        self.ticket_type.price = 50
+        self.ticket_type.save()
+        with self.assertNumQueries(0):
+            self.client.get('/api/events/categories/')
+
+
+@override_settings(EVENT_VIEW_FLUSH_INTERVAL=0)
+class ConditionalEventDetailTests(TestCase):
+    def setUp(self):
+        self.event = make_event(make_organizer(), slug='concert')
+        self.ticket_type = TicketType.objects.create(event=self.event, name='Regular', price=100, quantity=10)
+        self.client = APIClient()
+        self.addCleanup(view_counts.flush)
+
+    def test_matching_etag_is_not_modified_without_serializing(self):
+        response = self.client.get('/api/events/concert/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            repeat = self.client.get('/api/events/concert/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat['ETag'], response['ETag'])
+
+    def test_inventory_changes_the_etag(self):
+        etag = self.client.get('/api/events/concert/')['ETag']
+
+        reserve_tickets([(self.ticket_type, 1)])
+        response = self.client.get('/api/events/concert/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tickets_sold'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.ticket_type.price = 80
+        self.ticket_type.save()
+        self.assertEqual(self.client.get('/api/events/concert/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_sales_window_changes_the_etag(self):
+        cache.clear()
+        opens = timezone.now() + timedelta(hours=1)
+        self.ticket_type.sales_start = opens
+        self.ticket_type.save()
+        response = self.client.get('/api/events/concert/')
+        self.assertFalse(response.data['ticket_types'][0]['is_available'])
+
+        with mock.patch('django.utils.timezone.now', return_value=opens + timedelta(seconds=1)):
+            response = self.client.get('/api/events/concert/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['ticket_types'][0]['is_available'])
+
+    def test_category_and_organizer_edits_change_the_etag(self):
+        self.event.category = Category.objects.create(name='Music', slug='music')
+        self.event.save()
+        etag = self.client.get('/api/events/concert/')['ETag']
+
+        Category.objects.filter(pk=self.event.category_id).update(icon='guitar')
+        response = self.client.get('/api/events/concert/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        self.event.organizer.first_name = 'Renamed'
+        self.event.organizer.save()
+        response = self.client.get('/api/events/concert/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['organizer']['first_name'], 'Renamed')
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/api/events/concert/')['Last-Modified']
+        response = self.client.get('/api/events/concert/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_still_counts_a_view(self):
+        etag = self.client.get('/api/events/concert/')['ETag']
+        self.client.get('/api/events/concert/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(view_counts.pending(self.event.pk), 2)
+
+    def test_unknown_event(self):
+        self.assertEqual(self.client.get('/api/events/missing/').status_code, 404)
+
+
+class SingleFlightTests(TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flights = SingleFlight()
+        barrier = threading.Barrier(8)
+        calls = []
+        results = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.2)
+            return object()
+
+        def caller():
+            barrier.wait()
+            results.append(flights.do('key', build))
+
+        threads = [threading.Thread(target=caller) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(map(id, results))), 1)
+
+    def test_errors_reach_every_caller_and_are_not_kept(self):
+        flights = SingleFlight()
+        with self.assertRaises(ValueError):
+            flights.do('key', lambda: int('x'))
+        self.assertEqual(flights.do('key', lambda: 1), 1)
+
+
+@override_settings(EVENT_VIEW_FLUSH_INTERVAL=0)
+class EventDetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.event = make_event(make_organizer(), slug='concert')
+        self.ticket_type = TicketType.objects.create(event=self.event, name='Regular', price=100, quantity=10)
+        self.client = APIClient()
+        self.addCleanup(view_counts.flush)
+
+    def test_repeat_reads_only_check_validators(self):
+        self.client.get('/api/events/concert/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/events/concert/')
+        self.assertEqual(response.data['ticket_types'][0]['name'], 'Regular')
+
+    def test_stale_copy_served_while_another_request_rebuilds(self):
+        cached_event_detail(self.event.pk, '"old"', 0, lambda: {'title': 'Old'})
+        key = f"response:event:{self.event.pk}:{model_versions([Category])[0]}"
+        cache.add(f'{key}:lock', 1)
+
+        entry = cached_event_detail(self.event.pk, '"new"', 1, lambda: self.fail("rebuilt while locked"))
+        self.assertEqual((entry['etag'], entry['data']), ('"old"', {'title': 'Old'}))
+
+        cache.delete(f'{key}:lock')
+        entry = cached_event_detail(self.event.pk, '"new"', 1, lambda: {'title': 'New'})
+        self.assertEqual(entry['data'], {'title': 'New'})
+
+    def test_entries_expire_when_sales_open(self):
+        opens = timezone.now() + timedelta(seconds=30)
+        TicketType.objects.filter(pk=self.ticket_type.pk).update(sales_start=opens)
+
+        response_cache = get_response_cache()
+        with mock.patch.object(response_cache, 'set', wraps=response_cache.set) as cache_set:
+            self.client.get('/api/events/concert/')
+        timeouts = [call.args[2] for call in cache_set.call_args_list if ':event:' in call.args[0]]
+        self.assertEqual(len(timeouts), 1)
+        self.assertLessEqual(timeouts[0], 30)
+
+    def test_sale_rebuilds_payload(self):
+        self.client.get('/api/events/concert/')
+        reserve_tickets([(self.ticket_type, 3)])
+        response = self.client.get('/api/events/concert/')
+        self.assertEqual(response.data['tickets_sold'], 3)
+
+
+class EventDetailBenchmarkTests(TransactionTestCase):
+    def test_coalesced_queries_stay_flat(self):
+        out = StringIO()
+        call_command('benchmark_event_detail', concurrency='1,8', stdout=out)
+
+        rows = [line.split() for line in out.getvalue().splitlines()[2:]]
+        (_, single_plain, single, _), (_, many_plain, many, _) = rows
+        # Beyond the one validator query per request, the payload is built once
+        self.assertEqual(int(many) - 8, int(single) - 1)
+        self.assertGreater(int(many_plain), int(many))
+        self.assertFalse(User.objects.exists())
+
+
+class PlatformStatsTests(TestCase):
+    def setUp(self):
+        self.organizer = make_organizer()
+        self.category = Category.objects.create(name='Music')
+        self.client = APIClient()
+
+    def stats(self):
+        return PlatformStats.objects.get()
+
+    def test_endpoint_is_one_primary_key_read(self):
+        make_event(self.organizer, self.category)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/events/stats/')
+        self.assertEqual(response.data, {'total_events': 1, 'upcoming_events': 1, 'categories_count': 1})
+
+    def test_status_and_date_changes_adjust_counts(self):
+        event = make_event(self.organizer, status='draft')
+        self.assertEqual((self.stats().total_events, self.stats().upcoming_events), (0, 0))
+
+        event.status = 'published'
+        event.save()
+        self.assertEqual((self.stats().total_events, self.stats().upcoming_events), (1, 1))
+
+        event = Event.objects.get(pk=event.pk)
+        event.start_date = timezone.now() - timedelta(days=1)
+        event.save()
+        self.assertEqual((self.stats().total_events, self.stats().upcoming_events), (1, 0))
+
+        event.delete()
+        Category.objects.create(name='Sports')
+        self.assertEqual(
+            (self.stats().total_events, self.stats().upcoming_events, self.stats().categories_count),
+            (0, 0, 2)
+        )
+
+    def test_partially_loaded_events(self):
+        event = make_event(self.organizer, self.category, status='draft')
+
+        partial = Event.objects.only('id', 'status').get(pk=event.pk)
+        partial.status = 'published'
+        partial.save()
+        self.assertEqual((self.stats().total_events, self.stats().upcoming_events), (1, 1))
+
+        partial = Event.objects.defer('status').get(pk=event.pk)
+        partial.title = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            partial.save()
+        # The deferred status is neither loaded nor taken as changed
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT')])
+        self.assertEqual(self.stats().total_events, 1)
+
+    def test_refresh_stats_reconciles_drift(self):
+        event = make_event(self.organizer, self.category)
+        TicketType.objects.create(event=event, name='Regular', price=100, quantity=10, quantity_sold=4)
+        # An event starting in the past is no longer upcoming
+        Event.objects.filter(pk=event.pk).update(start_date=timezone.now() - timedelta(hours=1))
+
+        call_command('refresh_stats', stdout=StringIO())
+
+        stats = self.stats()
+        self.assertEqual((stats.total_events, stats.upcoming_events, stats.tickets_sold), (1, 0, 4))
+        self.assertIsNotNone(stats.reconciled_at)
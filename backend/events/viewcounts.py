@@ -0,0 +1,129 @@
+"""
+Write-behind event view counter.
+
+Event detail requests record a view in an in-process buffer instead of
+writing to the event row. A background thread drains the buffer every
+EVENT_VIEW_FLUSH_INTERVAL seconds (sooner once EVENT_VIEW_FLUSH_MAX_PENDING
+views are waiting), issuing one ``views_count = views_count + n`` UPDATE per
+event. Pending views are also flushed at interpreter exit, so a crash loses
+at most one interval's worth of views from that process. Receivers of
+views_flushed (the sales rollups) get each flush's counts in its
+transaction.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+# Sent with counts ({event id: views}) and flushed_at
+views_flushed = Signal()
+
+
+class ViewCountBuffer:
+    """Thread-safe per-event view counts waiting to be written"""
+    def __init__(self):
+        self._pending = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'EVENT_VIEW_FLUSH_INTERVAL', 10)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'EVENT_VIEW_FLUSH_MAX_PENDING', 1000)
+
+    def record(self, event_id, count=1):
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker starts empty: the parent still owns and
+                # flushes whatever it had buffered
+                self._pid = os.getpid()
+                self._pending = {}
+                self._total = 0
+                self._thread = None
+
+            self._pending[event_id] = self._pending.get(event_id, 0) + count
+            self._total += count
+            full = self._total >= self.max_pending
+
+        if self.interval:
+            self._ensure_flusher()
+            if full:
+                self._wake.set()
+
+    def pending(self, event_id):
+        """Views recorded for event_id that have not been written yet"""
+        with self._lock:
+            return self._pending.get(event_id, 0)
+
+    def flush(self):
+        """Write buffered views to the database; returns the number of events updated"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._total = 0
+        if not pending:
+            return 0
+
+        try:
+            with transaction.atomic():
+                written = {}
+                for event_id in sorted(pending):
+                    if Event.objects.filter(pk=event_id).update(
+                        views_count=F('views_count') + pending[event_id]
+                    ):
+                        written[event_id] = pending[event_id]
+                views_flushed.send(sender=self.__class__, counts=written, flushed_at=timezone.now())
+        except Exception:
+            # Put the views back so the next flush retries them
+            with self._lock:
+                for event_id, count in pending.items():
+                    self._pending[event_id] = self._pending.get(event_id, 0) + count
+                    self._total += count
+            raise
+        return len(pending)
+
+    def _ensure_flusher(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name='event-view-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval or None)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush event view counts")
+            finally:
+                connection.close()
+
+
+view_counts = ViewCountBuffer()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        view_counts.flush()
+    except Exception:
+        logger.exception("Failed to flush event view counts at exit")
@@ -1,10 +1,14 @@
-from rest_framework import generics, filters, status
+from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny 
 from rest_framework.decorators import api_view, permission_classes
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Count, Min, Q
 from django.utils import timezone
+from django.utils.http import http_date
+from backend.conditional import ConditionalRetrieveMixin
+from backend.pagination import OptInKeysetPagination
 from .models import Event, Category, TicketType
 from .serializers import (
     EventListSerializer,
@@ -13,34 +17,44 @@ from .serializers import (
     CategorySerializer,
     TicketTypeSerializer
 )
+from .cache import CachedListMixin, cached_event_detail
+from .filters import EventOrderingFilter, EventSearchFilter
 from .permissions import IsOrganizerOrReadOnly
+from .stats import get_stats
+from .viewcounts import view_counts
 
 
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(CachedListMixin, generics.ListAPIView):
     """
     API endpoint to list all event categories.
     """
+    cache_models = (Category,)
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
 
 
-class EventListView(generics.ListAPIView):
+class EventListView(CachedListMixin, generics.ListAPIView):
     """
     API endpoint to list all published events.
     Supports filtering by category, city, and date range.
-    Supports search by title, description, venue.
+    Supports full-text search by title, description, venue; search results
+    are ordered by relevance unless an ordering is given.
+    Anonymous responses are cached.
     """
+    cache_models = (Event, TicketType, Category)
+    cache_anonymous_only = True
     serializer_class = EventListSerializer
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, EventSearchFilter, EventOrderingFilter]
+    pagination_class = OptInKeysetPagination
     filterset_fields = ['category', 'city', 'is_featured']
     search_fields = ['title', 'description', 'venue_name']
     ordering_fields = ['start_date', 'created_at', 'views_count']
     ordering = ['start_date']
     
     def get_queryset(self):
-        queryset = Event.objects.filter(status='published')
+        queryset = Event.objects.published().for_listing()
         
         # Filter by date range
         start_date = self.request.query_params.get('start_date', None)
@@ -59,25 +73,63 @@ class EventListView(generics.ListAPIView):
         return queryset
 
 
-class EventDetailView(generics.RetrieveAPIView):
+class EventDetailView(ConditionalRetrieveMixin, generics.RetrieveAPIView):
     """
     API endpoint to retrieve a single event by slug.
-    Increments view count on each retrieval.
+    Each retrieval is counted through the write-behind view buffer, so the
+    request itself does not write to the event row.
+    Supports conditional GET; views_count alone does not change the ETag,
+    while edits to the nested category and organizer do, and so does a
+    ticket type's sales window opening or closing.
+    Payloads are cached per event and concurrent misses are coalesced into
+    one build (see events.cache.cached_event_detail).
     """
     queryset = Event.objects.filter(status='published')
     serializer_class = EventDetailSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
+    validator_fields = (
+        'pk', 'updated_at', 'inventory_version', 'inventory_updated_at', 'end_date',
+        'organizer__updated_at', 'category__name', 'category__slug', 'category__description',
+        'category__icon', 'category__published_events_count',
+    )
     
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        
-        # Increment view count
-        instance.views_count += 1
-        instance.save(update_fields=['views_count'])
+    def get_validator_annotations(self):
+        # Ticket types' is_available follows the clock: count the sales
+        # window boundaries already passed, which only grows as time goes on
+        now = timezone.now()
+        return {
+            'sales_started': Count('ticket_types', filter=Q(ticket_types__sales_start__lte=now)),
+            'sales_ended': Count('ticket_types', filter=Q(ticket_types__sales_end__lt=now)),
+            'next_sales_start': Min('ticket_types__sales_start', filter=Q(ticket_types__sales_start__gt=now)),
+            'next_sales_end': Min('ticket_types__sales_end', filter=Q(ticket_types__sales_end__gte=now)),
+        }
+    
+    def get_last_modified(self, row):
+        return max(filter(None, [row['updated_at'], row['inventory_updated_at'], row['organizer__updated_at']]))
+    
+    def get_validator_row(self):
+        row = super().get_validator_row()
+        if row is not None:
+            view_counts.record(row['pk'])
+            row['is_active'] = row['end_date'] > timezone.now()
+        return row
+    
+    def get_current_response(self, request, row, *args, **kwargs):
+        # The payload changes with the clock at the next of these
+        changes = [row['next_sales_start'], row['next_sales_end'], row['end_date'] if row['is_active'] else None]
+        entry = cached_event_detail(
+            row['pk'], self.etag, self.last_modified,
+            lambda: self.get_serializer(self.get_object()).data,
+            expires_at=min(filter(None, changes), default=None)
+        )
+        data = dict(entry['data'])
+        data['views_count'] += view_counts.pending(row['pk'])
         
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        response = Response(data)
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        return response
 
 
 class EventCreateView(generics.CreateAPIView):
@@ -130,14 +182,15 @@ class MyEventsView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Event.objects.filter(organizer=self.request.user)
+        return Event.objects.filter(organizer=self.request.user).for_listing()
 
 
-class FeaturedEventsView(generics.ListAPIView):
+class FeaturedEventsView(CachedListMixin, generics.ListAPIView):
     """
     API endpoint to get featured events.
     """
-    queryset = Event.objects.filter(status='published', is_featured=True)[:6]
+    cache_models = (Event, TicketType, Category)
+    queryset = Event.objects.published().filter(is_featured=True).for_listing()[:6]
     serializer_class = EventListSerializer
     permission_classes = [AllowAny]
 
@@ -147,18 +200,14 @@ class FeaturedEventsView(generics.ListAPIView):
 def event_stats(request):
     """
     API endpoint to get general event statistics.
+    Served from the materialized PlatformStats row (see events.stats).
     """
-    total_events = Event.objects.filter(status='published').count()
-    upcoming_events = Event.objects.filter(
-        status='published',
-        start_date__gte=timezone.now()
-    ).count()
-    categories_count = Category.objects.count()
+    stats = get_stats()
     
     return Response({
-        'total_events': total_events,
-        'upcoming_events': upcoming_events,
-        'categories_count': categories_count
+        'total_events': stats.total_events,
+        'upcoming_events': stats.upcoming_events,
+        'categories_count': stats.categories_count
     })
 
 
@@ -1,6 +1,6 @@
-from django.contrib import admin
-from django.utils import timezone
-from .models import Order, OrderItem, Ticket, Payment, PaymentProof
+from django.contrib import admin, messages
+from .models import Order, OrderItem, Ticket, TicketHold, Payment, PaymentCallback, PaymentInboxEntry, PaymentProof
+from .proofs import approve_proofs, reject_proofs
 
 
 class OrderItemInline(admin.TabularInline):
@@ -85,6 +85,14 @@ class TicketAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(TicketHold)
+class TicketHoldAdmin(admin.ModelAdmin):
+    list_display = ('order', 'ticket_type', 'quantity', 'status', 'expires_at', 'released_at')
+    list_filter = ('status', 'ticket_type__event')
+    search_fields = ('order__order_number', 'ticket_type__name')
+    readonly_fields = ('order', 'ticket_type', 'quantity', 'created_at', 'released_at')
+
+
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = (
@@ -112,6 +120,28 @@ class PaymentAdmin(admin.ModelAdmin):
         }),
     )
 
+@admin.register(PaymentCallback)
+class PaymentCallbackAdmin(admin.ModelAdmin):
+    list_display = ('transaction_id', 'status', 'order', 'outcome', 'received_at')
+    list_filter = ('outcome', 'status', 'received_at')
+    search_fields = ('transaction_id', 'order__order_number')
+    readonly_fields = ('transaction_id', 'status', 'order', 'outcome', 'payload', 'received_at')
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(PaymentInboxEntry)
+class PaymentInboxEntryAdmin(admin.ModelAdmin):
+    list_display = ('transaction_id', 'order_number', 'status', 'received_at', 'processed_at', 'outcome', 'attempts')
+    list_filter = ('outcome', 'status')
+    search_fields = ('transaction_id', 'order_number')
+    readonly_fields = ('transaction_id', 'order_number', 'status', 'payload', 'received_at', 'processed_at', 'outcome')
+    
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(PaymentProof)
 class PaymentProofAdmin(admin.ModelAdmin):
     list_display = ['transaction_code', 'order', 'amount', 'status', 'created_at']
@@ -134,22 +164,21 @@ class PaymentProofAdmin(admin.ModelAdmin):
     )
     
     def approve_payments(self, request, queryset):
-        for proof in queryset.filter(status='pending'):
-            proof.status = 'approved'
-            proof.verified_by = request.user
-            proof.verified_at = timezone.now()
-            proof.save()
-            
-            # Update order
-            proof.order.status = 'paid'
-            proof.order.transaction_id = proof.transaction_code
-            proof.order.paid_at = timezone.now()
-            proof.order.save()
-        
-        self.message_user(request, f"{queryset.count()} payments approved")
+        counts = approve_proofs(queryset.values_list('pk', flat=True), verified_by=request.user)
+        self.message_user(
+            request,
+            f"{counts['approved']} payments approved, {counts['orders_paid']} orders marked paid, "
+            f"{counts['skipped']} skipped (not pending)"
+        )
+        if counts['paid_after_cancel']:
+            self.message_user(
+                request,
+                f"{counts['paid_after_cancel']} approved payments belong to cancelled orders and need a refund",
+                messages.WARNING
+            )
     approve_payments.short_description = "✅ Approve selected payments"
     
     def reject_payments(self, request, queryset):
-        queryset.update(status='rejected', verified_by=request.user, verified_at=timezone.now())
-        self.message_user(request, f"{queryset.count()} payments rejected")
-    reject_payments.short_description = "❌ Reject selected payments"
\ No newline at end of file
+        counts = reject_proofs(queryset.values_list('pk', flat=True), verified_by=request.user)
+        self.message_user(request, f"{counts['rejected']} payments rejected, {counts['skipped']} skipped (not pending)")
+    reject_payments.short_description = "❌ Reject selected payments"
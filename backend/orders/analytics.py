@@ -0,0 +1,201 @@
+"""
+Organizer sales analytics.
+
+Sales are rolled up per ticket type (SalesRollup) and per event
+(EventRollup) into hourly and daily buckets of the time each order was
+placed. Whenever orders change status their buckets are adjusted by the
+difference, moving tickets, revenue and orders between the pending and paid
+columns (cancelled and refunded orders leave both), so a dashboard reads a
+few rollup rows however many orders the event has. Event page views are
+added to EventRollup each time the view counter flushes.
+
+Changes made outside the model and orders.transitions (orders deleted,
+rows edited in the database) are repaired with rebuild_rollups(), run by
+the rebuild_sales_rollups command.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import EventRollup, Order, OrderItem, SalesRollup
+
+COUNTED = ('pending', 'paid')
+SALES_FIELDS = ('pending_tickets', 'pending_revenue', 'paid_tickets', 'paid_revenue')
+EVENT_FIELDS = ('views', 'pending_orders', 'paid_orders')
+
+SALES_KEY = ('event_id', 'ticket_type_id', 'period', 'start')
+EVENT_KEY = ('event_id', 'period', 'start')
+
+REBUILD_CHUNK_SIZE = 2000
+
+
+def buckets(moment):
+    """(period, start) of the hour and the local day containing moment"""
+    hour = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    return ((SalesRollup.HOUR, hour), (SalesRollup.DAY, hour.replace(hour=0)))
+
+
+def _add(model, key_fields, deltas):
+    """
+    Add deltas ({key: {field: amount}}, keys holding the values of
+    key_fields) to the model's rollup rows, creating missing rows first.
+    Takes three queries however many rows change.
+    """
+    deltas = {key: changes for key, changes in deltas.items() if any(changes.values())}
+    if not deltas:
+        return
+
+    model.objects.bulk_create(
+        [model(**dict(zip(key_fields, key))) for key in deltas], ignore_conflicts=True
+    )
+    lookups = {
+        f'{field}__in': {key[position] for key in deltas}
+        for position, field in enumerate(key_fields)
+    }
+    rows = []
+    for row in model.objects.select_for_update().filter(**lookups).order_by('pk'):
+        changes = deltas.get(tuple(getattr(row, field) for field in key_fields))
+        if changes:
+            for field, amount in changes.items():
+                setattr(row, field, getattr(row, field) + amount)
+            rows.append(row)
+    model.objects.bulk_update(rows, sorted({field for changes in deltas.values() for field in changes}))
+
+
+def _apply(moves):
+    """Adjust the rollups for moves, {order id: (old status, new status)}"""
+    moves = {
+        order_id: (old, new) for order_id, (old, new) in moves.items()
+        if old != new and (old in COUNTED or new in COUNTED)
+    }
+    if not moves:
+        return
+
+    sales = defaultdict(lambda: defaultdict(int))
+    events = defaultdict(lambda: defaultdict(int))
+    orders = {}
+    items = OrderItem.objects.filter(order_id__in=moves).values_list(
+        'order_id', 'order__event_id', 'order__created_at', 'ticket_type_id', 'quantity', 'subtotal'
+    )
+    for order_id, event_id, created_at, ticket_type_id, quantity, subtotal in items:
+        orders[order_id] = (event_id, created_at)
+        for period, start in buckets(created_at):
+            row = sales[event_id, ticket_type_id, period, start]
+            for sign, status in zip((-1, 1), moves[order_id]):
+                if status in COUNTED:
+                    row[f'{status}_tickets'] += sign * quantity
+                    row[f'{status}_revenue'] += sign * subtotal
+
+    for order_id, (event_id, created_at) in orders.items():
+        for period, start in buckets(created_at):
+            row = events[event_id, period, start]
+            for sign, status in zip((-1, 1), moves[order_id]):
+                if status in COUNTED:
+                    row[f'{status}_orders'] += sign
+
+    with transaction.atomic():
+        _add(SalesRollup, SALES_KEY, sales)
+        _add(EventRollup, EVENT_KEY, events)
+
+
+def record_transitions(changes, status):
+    """
+    Adjust the rollups for orders that moved to status; changes maps each
+    order id to the status it had before (None for a new order).
+    """
+    _apply({order_id: (old, status) for order_id, old in changes.items()})
+
+
+def record_views(counts, at=None):
+    """Add event page views ({event id: views}) to the buckets containing at"""
+    at = at or timezone.now()
+    _add(EventRollup, EVENT_KEY, {
+        (event_id, period, start): {'views': views}
+        for event_id, views in counts.items()
+        for period, start in buckets(at)
+    })
+
+
+def rebuild_rollups(events=None):
+    """
+    Recompute the order columns of the rollups of events (every event when
+    None) from the orders; recorded views are kept. Returns the number of
+    orders counted.
+    """
+    orders = Order.objects.filter(status__in=COUNTED).order_by('pk')
+    sales = SalesRollup.objects.all()
+    event_rollups = EventRollup.objects.all()
+    if events is not None:
+        orders = orders.filter(event__in=events)
+        sales = sales.filter(event__in=events)
+        event_rollups = event_rollups.filter(event__in=events)
+
+    counted = 0
+    with transaction.atomic():
+        sales.delete()
+        event_rollups.update(pending_orders=0, paid_orders=0)
+        chunk = {}
+        for order_id, status in orders.values_list('pk', 'status').iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            chunk[order_id] = (None, status)
+            if len(chunk) >= REBUILD_CHUNK_SIZE:
+                _apply(chunk)
+                counted += len(chunk)
+                chunk = {}
+        _apply(chunk)
+        counted += len(chunk)
+    return counted
+
+
+def _sums(queryset, group_by, fields):
+    """Rows of queryset grouped by group_by with fields summed (0 when empty)"""
+    rows = queryset.order_by().values(*group_by).annotate(**{f'sum_{field}': Sum(field) for field in fields})
+    for row in rows:
+        yield {
+            **{field: row[field] for field in group_by},
+            **{field: row[f'sum_{field}'] or 0 for field in fields},
+        }
+
+
+def _conversion(row):
+    return round(row['paid_orders'] / row['views'], 4) if row['views'] else None
+
+
+def sales_report(event, period=SalesRollup.DAY, since=None, until=None):
+    """
+    Sales of event from its rollups: totals, totals per ticket type and a
+    series of period buckets, limited to buckets starting in [since, until)
+    when given. Conversion is paid orders per page view.
+    """
+    buckets_filter = Q(event=event, period=period)
+    if since:
+        buckets_filter &= Q(start__gte=since)
+    if until:
+        buckets_filter &= Q(start__lt=until)
+    sales = SalesRollup.objects.filter(buckets_filter)
+
+    empty = dict.fromkeys(SALES_FIELDS + EVENT_FIELDS, 0)
+    series = defaultdict(lambda: dict(empty))
+    for row in _sums(sales, ['start'], SALES_FIELDS):
+        series[row['start']].update(row)
+    for row in EventRollup.objects.filter(buckets_filter).values('start', *EVENT_FIELDS):
+        series[row['start']].update(row)
+
+    totals = dict(empty)
+    for row in series.values():
+        row['conversion_rate'] = _conversion(row)
+        for field in empty:
+            totals[field] += row[field]
+    totals['conversion_rate'] = _conversion(totals)
+
+    ticket_types = [
+        {'id': row.pop('ticket_type_id'), 'name': row.pop('ticket_type__name'), **row}
+        for row in _sums(sales, ['ticket_type_id', 'ticket_type__name'], SALES_FIELDS)
+    ]
+    return {
+        'period': period,
+        'totals': totals,
+        'ticket_types': sorted(ticket_types, key=lambda row: row['id']),
+        'series': [{'start': start, **series[start]} for start in sorted(series)],
+    }
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class OrdersConfig(AppConfig):
     name = 'orders'
+    
+    def ready(self):
+        from . import signals, stats  # noqa: F401
@@ -0,0 +1,137 @@
+"""
+Payment gateway callback processing.
+
+Gateways retry callbacks until they see a 2xx, often many times. Each
+(transaction_id, status) pair is recorded once in PaymentCallback; a retry
+finds its record through the unique index and is answered from it without
+any writes. New callbacks move orders and payments forward only (see
+orders.transitions), so a late "failed" for a transaction that was
+superseded cannot undo a payment. A successful payment for an order that
+was already cancelled (by a failed callback or hold expiry) still completes
+the Payment, since the money was taken, and is recorded as paid_after_cancel
+for staff to refund.
+
+process_callbacks() applies a whole batch with a fixed number of queries:
+the orders and payments involved are locked, the transitions are decided in
+arrival order in memory, and the results are written in bulk.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, Payment, PaymentCallback
+from .transitions import ORDER_TRANSITIONS, PAYMENT_TRANSITIONS, allowed, cancel_orders, mark_orders_paid
+
+SUCCESS = 'success'
+
+Callback = namedtuple('Callback', ['transaction_id', 'order_number', 'status', 'payload'])
+
+
+def _recorded(callbacks):
+    """{(transaction_id, status): outcome} of callbacks seen before"""
+    records = PaymentCallback.objects.filter(
+        transaction_id__in={callback.transaction_id for callback in callbacks}
+    ).values_list('transaction_id', 'status', 'outcome')
+    return {(transaction_id, status): outcome for transaction_id, status, outcome in records}
+
+
+def process_callback(transaction_id, order_number, status, payload=None):
+    """Apply one callback; returns (outcome, duplicate)"""
+    return process_callbacks([Callback(transaction_id, order_number, status, payload)])[0]
+
+
+def process_callbacks(callbacks):
+    """
+    Apply Callbacks in arrival order. Returns (outcome, duplicate) per
+    callback, where outcome is what its first delivery did: applied, ignored
+    (the order had already moved on), paid_after_cancel (money was taken for
+    a cancelled order) or unknown_order.
+    """
+    outcomes = _recorded(callbacks)
+    if all((callback.transaction_id, callback.status) in outcomes for callback in callbacks):
+        # Retries only: answered from the records without a transaction
+        return [(outcomes[callback.transaction_id, callback.status], True) for callback in callbacks]
+
+    with transaction.atomic():
+        return _apply(callbacks, outcomes)
+
+
+def _apply(callbacks, outcomes):
+    now = timezone.now()
+    orders = {
+        order.order_number: order
+        for order in Order.objects.select_for_update().filter(
+            order_number__in={callback.order_number for callback in callbacks}
+        ).only('id', 'order_number', 'status', 'payment_method', 'total_amount')
+    }
+    payments = {
+        payment.order_id: payment
+        for payment in Payment.objects.select_for_update().filter(order__in=orders.values())
+    }
+    missing = [
+        Payment(order=order, payment_method=order.payment_method, amount=order.total_amount)
+        for order in orders.values() if order.pk not in payments
+    ]
+    for payment in Payment.objects.bulk_create(missing):
+        payments[payment.order_id] = payment
+
+    results = []
+    records = []
+    paid = {}
+    cancelled = []
+    changed_payments = {}
+    for callback in callbacks:
+        key = (callback.transaction_id, callback.status)
+        if key in outcomes:
+            results.append((outcomes[key], True))
+            continue
+
+        order = orders.get(callback.order_number)
+        if order is None:
+            outcome = PaymentCallback.UNKNOWN_ORDER
+        else:
+            success = callback.status == SUCCESS
+            payment = payments[order.pk]
+            payment_target = 'completed' if success else 'failed'
+            if allowed(PAYMENT_TRANSITIONS, payment.status, payment_target):
+                payment.status = payment_target
+                payment.transaction_id = callback.transaction_id
+                payment.raw_response = callback.payload
+                payment.updated_at = now
+                if success:
+                    payment.completed_at = now
+                changed_payments[payment.pk] = payment
+
+            order_target = 'paid' if success else 'cancelled'
+            if allowed(ORDER_TRANSITIONS, order.status, order_target):
+                order.status = order_target
+                if success:
+                    paid[order.pk] = callback.transaction_id
+                else:
+                    cancelled.append(order.pk)
+                outcome = PaymentCallback.APPLIED
+            elif success and order.status == 'cancelled':
+                outcome = PaymentCallback.PAID_AFTER_CANCEL
+            else:
+                outcome = PaymentCallback.IGNORED
+
+        outcomes[key] = outcome
+        results.append((outcome, False))
+        records.append(PaymentCallback(
+            transaction_id=callback.transaction_id,
+            status=callback.status,
+            order=order,
+            payload=callback.payload,
+            outcome=outcome
+        ))
+
+    Payment.objects.bulk_update(
+        changed_payments.values(), ['status', 'transaction_id', 'raw_response', 'completed_at', 'updated_at']
+    )
+    mark_orders_paid(paid, now)
+    cancel_orders(cancelled, now)
+    # A concurrent delivery of the same callback may have been recorded
+    # meanwhile; it was decided against the same locked rows
+    PaymentCallback.objects.bulk_create(records, ignore_conflicts=True)
+    return results
@@ -0,0 +1,185 @@
+"""
+Ticket check-in at the gate.
+
+A scan admits a ticket by moving it from valid to used with one
+conditional UPDATE, so two lanes scanning the same ticket at once cannot
+both admit it. Scans that do not admit are classified with one extra read.
+
+Scanners send the QR payload they read. Its signature and event are checked
+before any query, so forged codes and tickets for other events are turned
+away without touching the database.
+
+Scanners that were offline upload their queued scans with check_in_batch.
+Conflicts are resolved the same way whatever order scans arrive in: the
+earliest scan of a ticket (by scanned_at, then device id) is the admission
+and its time becomes checked_in_at, even if a later scan was synced first.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.utils import timezone
+
+from .models import Ticket
+from .signing import InvalidTicketSignature, parse_legacy_payload, verify_ticket
+
+ADMITTED = 'admitted'
+DUPLICATE = 'duplicate'
+NOT_FOUND = 'not_found'
+NOT_PAID = 'not_paid'
+CANCELLED = 'cancelled'
+INVALID_SIGNATURE = 'invalid_signature'
+
+BATCH_CHUNK_SIZE = 200
+
+
+def _ticket_rows(event, ticket_numbers, lock=False):
+    """{ticket_number: row} for the given numbers, read in chunks"""
+    queryset = Ticket.objects.all()
+    if lock:
+        queryset = queryset.select_for_update(of=('self',))
+
+    rows = {}
+    for start in range(0, len(ticket_numbers), BATCH_CHUNK_SIZE):
+        chunk = ticket_numbers[start:start + BATCH_CHUNK_SIZE]
+        for row in queryset.filter(ticket_number__in=chunk).values(
+            'id', 'ticket_number', 'status', 'checked_in_at',
+            event_id=F('order_item__order__event_id'),
+            order_status=F('order_item__order__status'),
+        ):
+            rows[row['ticket_number']] = row
+    return rows
+
+
+def _rejection(row, event):
+    """Result for a ticket that cannot be admitted, or None if it is valid"""
+    # Tickets for other events are reported as unknown to this gate
+    if row is None or row['event_id'] != event.pk:
+        return NOT_FOUND
+    if row['status'] == 'cancelled':
+        return CANCELLED
+    if row['order_status'] != 'paid':
+        return NOT_PAID
+    return None
+
+
+def resolve_scan(event, scan):
+    """
+    (ticket_number, rejection) for a scan carrying a payload or a ticket
+    number; rejection is None when the ticket still has to be looked up.
+    """
+    payload = scan.get('payload')
+    if not payload:
+        return scan['ticket_number'], None
+
+    try:
+        claims = verify_ticket(payload)
+    except InvalidTicketSignature:
+        legacy_number = parse_legacy_payload(payload)
+        if legacy_number and getattr(settings, 'TICKET_QR_ACCEPT_UNSIGNED', False):
+            return legacy_number, None
+        return None, INVALID_SIGNATURE
+
+    if claims.event_id != event.pk:
+        return claims.ticket_number, NOT_FOUND
+    return claims.ticket_number, None
+
+
+def _result(ticket_number, result, checked_in_at=None):
+    return {'ticket_number': ticket_number, 'result': result, 'checked_in_at': checked_in_at}
+
+
+def check_in(event, scan):
+    """Admit one scanned ticket now; returns a result dict"""
+    ticket_number, rejection = resolve_scan(event, scan)
+    if rejection:
+        return _result(ticket_number, rejection)
+
+    now = timezone.now()
+    admitted = Ticket.objects.filter(
+        ticket_number=ticket_number,
+        status='valid',
+        order_item__order__event=event,
+        order_item__order__status='paid',
+    ).update(status='used', checked_in=True, checked_in_at=now, updated_at=now)
+    if admitted:
+        return _result(ticket_number, ADMITTED, now)
+
+    row = _ticket_rows(event, [ticket_number]).get(ticket_number)
+    rejection = _rejection(row, event)
+    if rejection:
+        return _result(ticket_number, rejection)
+    return _result(ticket_number, DUPLICATE, row['checked_in_at'])
+
+
+def check_in_batch(event, scans):
+    """
+    Apply queued scans, each a dict with payload or ticket_number and
+    optional scanned_at and device_id. Returns one result per scan, in input
+    order. Scan times in the future are clamped to now.
+    """
+    now = timezone.now()
+    scans = [
+        {
+            'index': index,
+            'ticket_number': ticket_number,
+            'rejection': rejection,
+            'scanned_at': min(scan.get('scanned_at') or now, now),
+            'device_id': scan.get('device_id') or '',
+        }
+        for index, scan in enumerate(scans)
+        for ticket_number, rejection in [resolve_scan(event, scan)]
+    ]
+
+    # The first scan of each ticket in (time, device, position) order wins
+    winners = {}
+    for scan in sorted(scans, key=lambda scan: (scan['scanned_at'], scan['device_id'], scan['index'])):
+        if not scan['rejection']:
+            winners.setdefault(scan['ticket_number'], scan)
+
+    with transaction.atomic():
+        rows = _ticket_rows(event, list(winners), lock=True)
+
+        admit = {}
+        backdate = {}
+        for ticket_number, scan in winners.items():
+            row = rows.get(ticket_number)
+            if _rejection(row, event):
+                continue
+            if row['status'] == 'valid':
+                admit[row['id']] = scan['scanned_at']
+            elif row['checked_in_at'] is None or scan['scanned_at'] < row['checked_in_at']:
+                backdate[row['id']] = scan['scanned_at']
+            else:
+                continue
+            row['checked_in_at'] = scan['scanned_at']
+            scan['admitted'] = True
+
+        _set_checked_in(admit, status='used', checked_in=True, updated_at=now)
+        _set_checked_in(backdate, updated_at=now)
+
+    results = []
+    for scan in scans:
+        ticket_number = scan['ticket_number']
+        row = rows.get(ticket_number)
+        rejection = scan['rejection'] or _rejection(row, event)
+        if rejection:
+            results.append(_result(ticket_number, rejection))
+        elif winners[ticket_number] is scan and scan.get('admitted'):
+            results.append(_result(ticket_number, ADMITTED, scan['scanned_at']))
+        else:
+            results.append(_result(ticket_number, DUPLICATE, row['checked_in_at']))
+    return results
+
+
+def _set_checked_in(times, **fields):
+    """Set checked_in_at per ticket id, one UPDATE per chunk"""
+    ids = sorted(times)
+    for start in range(0, len(ids), BATCH_CHUNK_SIZE):
+        chunk = ids[start:start + BATCH_CHUNK_SIZE]
+        Ticket.objects.filter(pk__in=chunk).update(
+            checked_in_at=Case(
+                *[When(pk=ticket_id, then=Value(times[ticket_id])) for ticket_id in chunk],
+                output_field=DateTimeField()
+            ),
+            **fields
+        )
@@ -0,0 +1,200 @@
+"""
+Attendee exports for organizers.
+
+One row per ticket of an event with its ticket type, attendee, check-in
+state and order. Rows come from a single flat values_list() query over
+Ticket -> OrderItem -> Order read with iterator(), and are encoded and
+yielded a chunk at a time, so memory use does not grow with the size of the
+event and the first bytes go out before the query has been read through.
+
+XLSX files are written as a zip stream (zipfile writes entries of unknown
+size to unseekable output with data descriptors) holding one sheet of
+inline strings. Spreadsheet libraries assemble the archive only when the
+workbook is closed, which would hold back the whole response.
+"""
+import csv
+import re
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .models import Ticket
+
+CHUNK_SIZE = 2000
+
+COLUMNS = (
+    ('Ticket number', 'ticket_number'),
+    ('Ticket type', 'order_item__ticket_type__name'),
+    ('Attendee name', 'attendee_name'),
+    ('Attendee email', 'attendee_email'),
+    ('Ticket status', 'status'),
+    ('Checked in', 'checked_in'),
+    ('Checked in at', 'checked_in_at'),
+    ('Order number', 'order_item__order__order_number'),
+    ('Order status', 'order_item__order__status'),
+    ('Buyer email', 'order_item__order__email'),
+    ('Buyer phone', 'order_item__order__phone_number'),
+    ('Price', 'order_item__price'),
+    ('Ordered at', 'order_item__order__created_at'),
+)
+
+# Content type of each export format
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Spreadsheet apps evaluate text starting with these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+PHONE_NUMBER = re.compile(r'^\+?[\d ]+$')
+XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def attendee_rows(event, order_status=None):
+    """Value tuples in COLUMNS order for the event's tickets, by ticket id"""
+    tickets = Ticket.objects.filter(order_item__order__event=event)
+    if order_status:
+        tickets = tickets.filter(order_item__order__status=order_status)
+    return tickets.order_by('pk').values_list(*[field for _, field in COLUMNS])
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+    value = str(value)
+    if value.startswith(FORMULA_PREFIXES) and not PHONE_NUMBER.match(value):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """File-like object returning what is written, for csv.writer"""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([title for title, _ in COLUMNS])
+
+    buffer = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        buffer.append(writer.writerow([value if isinstance(value, Decimal) else _text(value) for value in row]))
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+class _Pipe:
+    """Unseekable output collecting what zipfile writes until drained"""
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Attendees" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_END = '</sheetData></worksheet>'
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, Decimal):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            text = escape(XML_INVALID.sub('', _text(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row>{"".join(cells)}</row>'
+
+
+def stream_xlsx(rows, chunk_size=CHUNK_SIZE):
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield pipe.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write((SHEET_START + _xlsx_row([title for title, _ in COLUMNS])).encode())
+            buffer = []
+            for row in rows.iterator(chunk_size=chunk_size):
+                buffer.append(_xlsx_row(row))
+                if len(buffer) >= chunk_size:
+                    sheet.write(''.join(buffer).encode())
+                    buffer = []
+                    # The compressor holds back output until it has enough
+                    data = pipe.drain()
+                    if data:
+                        yield data
+            sheet.write((''.join(buffer) + SHEET_END).encode())
+    yield pipe.drain()
+
+
+STREAMS = {
+    'csv': stream_csv,
+    'xlsx': stream_xlsx,
+}
+
+
+def stream_attendees(event, fmt, order_status=None, chunk_size=CHUNK_SIZE):
+    """Iterator of the encoded export of event's attendees in fmt ('csv' or 'xlsx')"""
+    return STREAMS[fmt](attendee_rows(event, order_status), chunk_size=chunk_size)
@@ -0,0 +1,89 @@
+"""
+Ticket holds for unpaid orders.
+
+Creating an order reserves stock and records one TicketHold per order item.
+expire_holds() is run periodically (see the expire_holds management command)
+to hand stock from abandoned or cancelled orders back to the ticket types.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from events.inventory import release_tickets
+from .models import Payment, PaymentProof, TicketHold
+from .transitions import cancel_orders
+
+
+def create_holds(order, order_items):
+    """Record holds for freshly reserved order items, expiring per the event's TTL"""
+    expires_at = timezone.now() + timedelta(minutes=order.event.hold_ttl_minutes)
+    return TicketHold.objects.bulk_create([
+        TicketHold(
+            order=order,
+            ticket_type_id=item.ticket_type_id,
+            quantity=item.quantity,
+            expires_at=expires_at
+        )
+        for item in order_items
+    ])
+
+
+def expire_holds(now=None, batch_size=500):
+    """
+    Release stock held by orders that were cancelled or left unpaid past their
+    hold expiry, and cancel those orders.
+
+    Works in set-based batches: one SELECT picks the holds, then a handful of
+    UPDATEs cancel the orders, release stock per ticket type and close the
+    holds, all in the same transaction. Orders with a payment proof awaiting
+    verification, a completed payment, or a payment started less than
+    HOLD_PAYMENT_GRACE_MINUTES ago are left alone, so buyers are not charged
+    for orders cancelled under them; a payment completing later is still
+    recorded as paid_after_cancel (see orders.callbacks).
+
+    Returns a dict with the number of orders cancelled and tickets released.
+    """
+    now = now or timezone.now()
+    totals = {'orders': 0, 'tickets': 0}
+
+    # Holds of paid orders no longer reserve anything
+    TicketHold.objects.filter(status='active', order__status='paid').update(status='converted')
+
+    awaiting_verification = PaymentProof.objects.filter(
+        order_id=OuterRef('order_id'),
+        status='pending'
+    )
+    grace = timedelta(minutes=getattr(settings, 'HOLD_PAYMENT_GRACE_MINUTES', 10))
+    payment_in_progress = Payment.objects.filter(order_id=OuterRef('order_id')).filter(
+        Q(status='completed') |
+        Q(status__in=['pending', 'processing'], updated_at__gt=now - grace)
+    )
+    releasable = TicketHold.objects.filter(status='active').filter(
+        Q(order__status='cancelled') |
+        Q(order__status='pending', expires_at__lte=now)
+    ).exclude(Exists(awaiting_verification)).exclude(
+        Q(order__status='pending') & Exists(payment_in_progress)
+    )
+
+    while True:
+        with transaction.atomic():
+            holds = list(
+                releasable.select_for_update(skip_locked=True, of=('self', 'order'))
+                .values_list('id', 'order_id', 'ticket_type_id', 'quantity')[:batch_size]
+            )
+            if not holds:
+                break
+
+            hold_ids = [hold[0] for hold in holds]
+            order_ids = {hold[1] for hold in holds}
+
+            totals['orders'] += cancel_orders(order_ids, now)
+            release_tickets((hold[2], hold[3]) for hold in holds)
+            TicketHold.objects.filter(pk__in=hold_ids).update(status='released', released_at=now)
+
+        totals['tickets'] += sum(hold[3] for hold in holds)
+
+    return totals
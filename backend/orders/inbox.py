@@ -0,0 +1,118 @@
+"""
+Queued payment callback ingestion.
+
+In queued mode the callback view only appends the raw callback to
+PaymentInboxEntry and answers 202, so gateway bursts cost one INSERT per
+request. Workers (the process_payment_inbox command; several may run)
+claim pending entries in batches with SKIP LOCKED and apply each batch with
+process_callbacks(). If a batch fails, its entries are retried one at a
+time so a single bad callback cannot block the rest; entries that keep
+failing are left after PAYMENT_INBOX_MAX_ATTEMPTS for inspection.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .callbacks import Callback, process_callbacks
+from .models import PaymentInboxEntry
+
+
+def enqueue_callback(transaction_id, order_number, status, payload=None):
+    return PaymentInboxEntry.objects.create(
+        transaction_id=transaction_id,
+        order_number=order_number,
+        status=status,
+        payload=payload
+    )
+
+
+def _max_attempts():
+    return getattr(settings, 'PAYMENT_INBOX_MAX_ATTEMPTS', 5)
+
+
+def _pending():
+    return PaymentInboxEntry.objects.filter(processed_at__isnull=True, attempts__lt=_max_attempts())
+
+
+def _callback(entry):
+    return Callback(entry.transaction_id, entry.order_number, entry.status, entry.payload)
+
+
+def process_batch(batch_size=200, exclude=()):
+    """
+    Claim and apply up to batch_size pending entries, oldest first, skipping
+    ids in exclude. Returns the entries handled (processed or failed); empty
+    when idle.
+    """
+    with transaction.atomic():
+        entries = list(
+            _pending().exclude(pk__in=exclude).select_for_update(skip_locked=True).order_by('id')[:batch_size]
+        )
+        if not entries:
+            return []
+
+        try:
+            with transaction.atomic():
+                results = process_callbacks([_callback(entry) for entry in entries])
+        except Exception:
+            results = [_process_one(entry) for entry in entries]
+
+        now = timezone.now()
+        for entry, result in zip(entries, results):
+            if isinstance(result, Exception):
+                entry.attempts += 1
+                entry.last_error = f"{type(result).__name__}: {result}"
+            else:
+                entry.processed_at = now
+                entry.outcome = result[0]
+        PaymentInboxEntry.objects.bulk_update(entries, ['processed_at', 'outcome', 'attempts', 'last_error'])
+    return entries
+
+
+def _process_one(entry):
+    try:
+        with transaction.atomic():
+            return process_callbacks([_callback(entry)])[0]
+    except Exception as error:
+        return error
+
+
+def drain(batch_size=200):
+    """
+    Process batches until the inbox is empty; returns processing totals.
+    Entries that fail are retried on the next call, not within this one.
+    """
+    totals = {'processed': 0, 'failed': 0, 'max_lag': 0.0}
+    failed = set()
+    while True:
+        entries = process_batch(batch_size, exclude=failed)
+        if not entries:
+            return totals
+        for entry in entries:
+            if entry.processed_at:
+                totals['processed'] += 1
+                lag = (entry.processed_at - entry.received_at).total_seconds()
+                totals['max_lag'] = max(totals['max_lag'], lag)
+            else:
+                failed.add(entry.pk)
+        totals['failed'] = len(failed)
+
+
+def inbox_metrics(now=None):
+    """
+    Inbox depth (entries waiting), lag (age of the oldest waiting entry in
+    seconds) and entries given up on after repeated failures.
+    """
+    now = now or timezone.now()
+    unprocessed = PaymentInboxEntry.objects.filter(processed_at__isnull=True).aggregate(
+        depth=Count('id', filter=Q(attempts__lt=_max_attempts())),
+        oldest=Min('received_at', filter=Q(attempts__lt=_max_attempts())),
+        failed=Count('id', filter=Q(attempts__gte=_max_attempts())),
+    )
+    oldest = unprocessed['oldest']
+    return {
+        'depth': unprocessed['depth'],
+        'lag_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'failed': unprocessed['failed'],
+    }
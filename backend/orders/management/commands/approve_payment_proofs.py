@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import PaymentProof
+from orders.proofs import approve_proofs
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Approve payment proofs and mark their orders paid, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help="Payment proof ids")
+        parser.add_argument('--all-pending', action='store_true', help="Approve every pending proof")
+        parser.add_argument('--verified-by', help="Email of the staff member recorded as verifier")
+
+    def handle(self, *args, **options):
+        if options['all_pending']:
+            ids = list(PaymentProof.objects.filter(status='pending').values_list('pk', flat=True))
+        elif options['ids']:
+            ids = options['ids']
+        else:
+            raise CommandError("Give proof ids or --all-pending")
+
+        verified_by = None
+        if options['verified_by']:
+            try:
+                verified_by = User.objects.get(email=options['verified_by'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['verified_by']}' does not exist")
+
+        counts = approve_proofs(ids, verified_by=verified_by)
+        self.stdout.write(
+            f"Approved {counts['approved']} payment proofs, marked {counts['orders_paid']} orders paid, "
+            f"skipped {counts['skipped']}"
+        )
+        if counts['paid_after_cancel']:
+            self.stderr.write(
+                f"{counts['paid_after_cancel']} approved payment proofs belong to cancelled orders and need a refund"
+            )
@@ -0,0 +1,114 @@
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from events.models import Event, TicketType
+from orders.models import Order, OrderItem, Ticket
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the original per-ticket save() issuance, which rendered a QR "
+        "image for every ticket, with the bulk issuance path. Benchmark data is "
+        "deleted afterwards and QR images go to a temporary media root, so "
+        "nothing is left behind."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='1,10,100',
+            help="Comma separated ticket counts per order"
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help="Orders issued per size and strategy; the median is reported"
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+
+        # Unique names, so leftovers of an interrupted run don't collide
+        name = f'bench-organizer-{uuid.uuid4().hex[:8]}'
+        organizer = User.objects.create_user(
+            email=f'{name}@example.com',
+            username=name,
+            password='unused',
+            user_type='organizer'
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+                self.run(organizer, sizes, options['repeat'])
+        finally:
+            # Cascades to the event, orders and tickets
+            organizer.delete()
+
+    def run(self, organizer, sizes, repeat):
+        start = timezone.now() + timedelta(days=30)
+        event = Event.objects.create(
+            title='Issuance benchmark',
+            slug=f'issuance-benchmark-{organizer.pk}',
+            description='Benchmark event',
+            organizer=organizer,
+            start_date=start,
+            end_date=start + timedelta(hours=4),
+            venue_name='Bench',
+            venue_address='Bench',
+            city='Nairobi'
+        )
+        ticket_type = TicketType.objects.create(
+            event=event, name='Bench', price=100, quantity=10 ** 6
+        )
+
+        self.stdout.write("Median milliseconds per order")
+        self.stdout.write(f"{'tickets':>8} {'per-ticket save':>16} {'bulk issue':>11} {'speedup':>8}")
+        for size in sizes:
+            legacy = self.measure(repeat, lambda: self.issue_one_by_one(organizer, event, ticket_type, size))
+            bulk = self.measure(repeat, lambda: self.issue_in_bulk(organizer, event, ticket_type, size))
+            self.stdout.write(f"{size:>8} {legacy:>16.1f} {bulk:>11.1f} {legacy / bulk:>7.1f}x")
+
+    def measure(self, repeat, issue):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            with transaction.atomic():
+                issue()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def make_order_item(self, organizer, event, ticket_type, size):
+        order = Order.objects.create(
+            user=organizer,
+            event=event,
+            total_amount=ticket_type.price * size,
+            email=organizer.email,
+            phone_number='0700000000'
+        )
+        return OrderItem.objects.create(
+            order=order, ticket_type=ticket_type, quantity=size, price=ticket_type.price
+        )
+
+    def issue_one_by_one(self, organizer, event, ticket_type, size):
+        order_item = self.make_order_item(organizer, event, ticket_type, size)
+        for _ in range(size):
+            ticket = Ticket(
+                order_item=order_item,
+                ticket_number=Ticket.generate_ticket_number(),
+                attendee_email=organizer.email
+            )
+            ticket.generate_qr_code()
+            ticket.save()
+
+    def issue_in_bulk(self, organizer, event, ticket_type, size):
+        order_item = self.make_order_item(organizer, event, ticket_type, size)
+        order_item.issue_tickets(attendee_email=organizer.email)
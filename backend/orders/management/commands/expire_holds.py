@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.holds import expire_holds
+
+
+class Command(BaseCommand):
+    help = "Cancel unpaid orders whose ticket holds have expired and release their stock"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help="Keep running, sweeping every N seconds (default: sweep once and exit)"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Number of holds released per transaction"
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            totals = expire_holds(batch_size=options['batch_size'])
+            if totals['orders'] or totals['tickets'] or not interval:
+                self.stdout.write(
+                    f"Cancelled {totals['orders']} orders, released {totals['tickets']} tickets"
+                )
+
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from events.models import Event
+from orders.manifest import stream_manifest
+
+
+class Command(BaseCommand):
+    help = (
+        "Write an event's check-in manifest (see orders.manifest) for door "
+        "devices to preload. With --since, only the changes after that "
+        "manifest version are written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', required=True, help="Slug of the event")
+        parser.add_argument('--since', type=int, help="Version of the manifest to build a delta against")
+        parser.add_argument('--output', help="File to write (default: standard output)")
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(slug=options['event'])
+        except Event.DoesNotExist:
+            raise CommandError(f"Event '{options['event']}' does not exist")
+
+        version, chunks = stream_manifest(event, options['since'])
+        if not options['output']:
+            # The version is in the header; keep the binary stream clean
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            return
+
+        size = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+                size += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Wrote manifest version {version} for {event.title} ({size} bytes)"))
@@ -0,0 +1,138 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from events.models import Event, TicketType
+from orders.models import Order, OrderItem, Ticket
+from orders.qr import qr_payload
+from orders.views import CheckInBatchView, CheckInView
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure sustained check-in throughput: lanes scanning tickets one at "
+        "a time in parallel, rescans of used tickets, and offline batch "
+        "uploads. Benchmark data is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=2000, help="Tickets issued for the event")
+        parser.add_argument('--lanes', type=int, default=8, help="Scanners scanning concurrently")
+        parser.add_argument('--batch-size', type=int, default=500, help="Scans per offline upload")
+
+    def handle(self, *args, **options):
+        # Unique names, so leftovers of an interrupted run don't collide
+        name = f'checkin-bench-{uuid.uuid4().hex[:8]}'
+        organizer = User.objects.create_user(
+            email=f'{name}@example.com',
+            username=name,
+            password='unused',
+            user_type='organizer'
+        )
+        try:
+            self.run(organizer, options['tickets'], options['lanes'], options['batch_size'])
+        finally:
+            # Cascades to the event, orders and tickets
+            organizer.delete()
+
+    def run(self, organizer, ticket_count, lanes, batch_size):
+        start = timezone.now() + timedelta(days=1)
+        event = Event.objects.create(
+            title='Check-in load test',
+            slug=f'checkin-load-test-{organizer.pk}',
+            description='Benchmark event',
+            organizer=organizer,
+            start_date=start,
+            end_date=start + timedelta(hours=4),
+            venue_name='Bench',
+            venue_address='Bench',
+            city='Nairobi',
+            status='published'
+        )
+        ticket_type = TicketType.objects.create(event=event, name='Bench', price=100, quantity=ticket_count)
+        order = Order.objects.create(
+            user=organizer, event=event, status='paid',
+            total_amount=100 * ticket_count, email=organizer.email, phone_number='0700000000'
+        )
+        item = OrderItem.objects.create(order=order, ticket_type=ticket_type, quantity=ticket_count, price=100)
+        # Scanners send the signed payload read from each QR code
+        payloads = [qr_payload(ticket.ticket_number, event.pk, ticket_type.pk) for ticket in item.issue_tickets()]
+
+        self.organizer = organizer
+        self.factory = APIRequestFactory()
+        self.stdout.write(f"{ticket_count} tickets, {lanes} lanes")
+
+        rate, results = self.scan_in_lanes(event, payloads, lanes)
+        self.stdout.write(f"single scans:   {rate:>8.0f} scans/s  {self.summary(results)}")
+
+        rate, results = self.scan_in_lanes(event, payloads, lanes)
+        self.stdout.write(f"rescans:        {rate:>8.0f} scans/s  {self.summary(results)}")
+
+        Ticket.objects.filter(order_item=item).update(status='valid', checked_in=False, checked_in_at=None)
+        rate, results = self.upload_batches(event, payloads, batch_size)
+        self.stdout.write(f"batch uploads:  {rate:>8.0f} scans/s  {self.summary(results)}")
+
+    def summary(self, results):
+        counts = {}
+        for result in results:
+            counts[result] = counts.get(result, 0) + 1
+        return ', '.join(f"{count} {result}" for result, count in sorted(counts.items()))
+
+    def scan_in_lanes(self, event, payloads, lanes):
+        view = CheckInView.as_view()
+        barrier = threading.Barrier(lanes)
+        results = []
+        errors = []
+
+        def lane(lane_payloads):
+            try:
+                barrier.wait()
+                for payload in lane_payloads:
+                    request = self.factory.post(
+                        f'/api/orders/checkin/{event.slug}/', {'payload': payload}, format='json'
+                    )
+                    force_authenticate(request, user=self.organizer)
+                    results.append(view(request, event_slug=event.slug).data['result'])
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=lane, args=(payloads[i::lanes],)) for i in range(lanes)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            raise RuntimeError(f"Check-in requests failed: {errors[:3]}")
+        return len(payloads) / elapsed, results
+
+    def upload_batches(self, event, payloads, batch_size):
+        view = CheckInBatchView.as_view()
+        scanned_at = timezone.now().isoformat()
+        results = []
+
+        started = time.perf_counter()
+        for offset in range(0, len(payloads), batch_size):
+            scans = [
+                {'payload': payload, 'scanned_at': scanned_at, 'device_id': 'bench'}
+                for payload in payloads[offset:offset + batch_size]
+            ]
+            request = self.factory.post(
+                f'/api/orders/checkin/{event.slug}/batch/', {'scans': scans}, format='json'
+            )
+            force_authenticate(request, user=self.organizer)
+            results += [result['result'] for result in view(request, event_slug=event.slug).data['results']]
+        elapsed = time.perf_counter() - started
+
+        return len(payloads) / elapsed, results
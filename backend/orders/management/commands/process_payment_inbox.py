@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.inbox import drain, inbox_metrics
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply payment callbacks queued in the inbox, in batches. Several "
+        "workers can run at once; each claims its own entries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help="Keep running, polling every N seconds when idle (default: drain once and exit)"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help="Callbacks applied per transaction"
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            totals = drain(batch_size=options['batch_size'])
+            if totals['processed'] or totals['failed'] or not interval:
+                metrics = inbox_metrics()
+                self.stdout.write(
+                    f"Processed {totals['processed']} callbacks ({totals['failed']} failed, "
+                    f"max lag {totals['max_lag']:.1f}s); inbox depth {metrics['depth']}, "
+                    f"{metrics['failed']} given up"
+                )
+
+            if not interval:
+                break
+            time.sleep(interval)
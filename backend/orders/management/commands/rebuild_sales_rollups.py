@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events.models import Event
+from orders.analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the sales rollups from the orders, to backfill them or "
+        "repair changes made outside the application. Recorded page views "
+        "are kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', help="Slug of the event to rebuild (default: every event)")
+
+    def handle(self, *args, **options):
+        events = None
+        if options['event']:
+            events = Event.objects.filter(slug=options['event'])
+            if not events.exists():
+                raise CommandError(f"Event '{options['event']}' does not exist")
+
+        counted = rebuild_rollups(events)
+        self.stdout.write(f"Rolled up {counted} orders")
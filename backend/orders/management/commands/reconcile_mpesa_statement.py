@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.reconciliation import COLUMNS, reconcile_statement
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Match an M-Pesa statement CSV against pending payment proofs, approve "
+        "the matches and write mismatches to an exception report. The statement "
+        "is streamed, so any size can be reconciled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help="Path of the statement CSV")
+        parser.add_argument('--report', help="Path of the exception report CSV to write")
+        parser.add_argument('--verified-by', help="Email of the staff member recorded as verifier")
+        parser.add_argument('--dry-run', action='store_true', help="Match and report without approving")
+        parser.add_argument(
+            '--include-missing',
+            action='store_true',
+            help="Also report pending proofs that do not appear on the statement"
+        )
+        for key, column in COLUMNS.items():
+            parser.add_argument(f'--{key}-column', default=column, help=f"Statement column with the {key}")
+
+    def handle(self, *args, **options):
+        verified_by = None
+        if options['verified_by']:
+            try:
+                verified_by = User.objects.get(email=options['verified_by'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['verified_by']}' does not exist")
+
+        columns = {key: options[f'{key}_column'] for key in COLUMNS}
+        report = open(options['report'], 'w', newline='') if options['report'] else None
+        started = time.monotonic()
+        try:
+            # utf-8-sig drops the byte order mark statement exports start with
+            with open(options['statement'], newline='', encoding='utf-8-sig') as statement:
+                totals = reconcile_statement(
+                    statement,
+                    report=report,
+                    verified_by=verified_by,
+                    dry_run=options['dry_run'],
+                    include_missing=options['include_missing'],
+                    columns=columns
+                )
+        except FileNotFoundError as error:
+            raise CommandError(str(error))
+        finally:
+            if report:
+                report.close()
+
+        self.stdout.write(
+            f"Read {totals['rows']} statement rows in {time.monotonic() - started:.1f}s: "
+            f"{totals['matched']} proofs matched, {totals['approved']} approved, "
+            f"{totals['orders_paid']} orders marked paid, {totals['exceptions']} exceptions, "
+            f"{totals['missing']} pending proofs not on the statement"
+        )
+        if totals['paid_after_cancel']:
+            self.stderr.write(
+                f"{totals['paid_after_cancel']} approved payment proofs belong to cancelled orders and need a refund"
+            )
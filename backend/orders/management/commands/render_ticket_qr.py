@@ -0,0 +1,115 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from events.models import Event
+from orders.models import Ticket
+from orders.qr import qr_payload, render_png_batch
+from orders.signing import qr_access_token
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-render PNG QR codes for every ticket of an event across a process "
+        "pool and store them in the ticket's qr_code field. Tickets that already "
+        "have an image are skipped, so an interrupted run can simply be restarted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', required=True, help="Slug of the event")
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help="Number of rendering processes (default: all cores)"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help="Tickets rendered and saved per batch"
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Re-render tickets that already have an image"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(slug=options['event'])
+        except Event.DoesNotExist:
+            raise CommandError(f"Event '{options['event']}' does not exist")
+
+        tickets = Ticket.objects.filter(order_item__order__event=event).exclude(status='cancelled')
+        if not options['force']:
+            tickets = tickets.filter(Q(qr_code__isnull=True) | Q(qr_code=''))
+
+        total = tickets.count()
+        if not total:
+            self.stdout.write("Nothing to render")
+            return
+
+        self.stdout.write(f"Rendering {total} QR codes for {event.title} with {options['workers']} workers")
+        started = time.monotonic()
+        done = 0
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            pending = set()
+            for chunk in self.chunks(tickets, options['chunk_size']):
+                # Keep a bounded number of chunks in flight so memory stays flat
+                if len(pending) >= options['workers'] * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    done += self.store(finished)
+                    self.report(done, total, started)
+                pending.add(pool.submit(render_png_batch, chunk))
+
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                done += self.store(finished)
+                self.report(done, total, started)
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered {done} QR codes"))
+
+    def chunks(self, tickets, size):
+        """Yield ((id, ticket_number), payload) batches, paging by primary key"""
+        last_id = 0
+        while True:
+            rows = list(
+                tickets.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'ticket_number', 'order_item__order__event_id', 'order_item__ticket_type_id')[:size]
+            )
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [
+                ((ticket_id, number), qr_payload(number, event_id, ticket_type_id))
+                for ticket_id, number, event_id, ticket_type_id in rows
+            ]
+
+    def store(self, futures):
+        """Write rendered images to storage and record them, one UPDATE batch per chunk"""
+        qr_field = Ticket._meta.get_field('qr_code')
+        stored = 0
+
+        for future in futures:
+            tickets = []
+            for (ticket_id, ticket_number), png in future.result():
+                name = qr_field.generate_filename(
+                    None, f'ticket_{ticket_number}_{qr_access_token(ticket_number)}.png'
+                )
+                tickets.append(Ticket(id=ticket_id, qr_code=default_storage.save(name, ContentFile(png))))
+            Ticket.objects.bulk_update(tickets, ['qr_code'])
+            stored += len(tickets)
+
+        return stored
+
+    def report(self, done, total, started):
+        rate = done / max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f"  {done}/{total} ({rate:.0f}/s)")
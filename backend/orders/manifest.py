@@ -0,0 +1,126 @@
+"""
+Check-in manifests for door devices.
+
+A manifest lists the ticket numbers a scanner should recognise for one
+event: tickets of paid orders that have not been cancelled. Checked-in
+tickets stay in, so a repeat scan reads as a duplicate rather than a
+forgery. Scanners preload it and validate without a query per scan.
+
+Binary format, big-endian:
+
+    header   magic b'THM1', version (u64), base version (u64, 0 for a full
+             manifest), event id (u32), record width (u8)
+    records  op byte (b'+' add, b'-' remove) and the ticket number, NUL
+             padded to the record width, sorted by ticket number
+
+Fixed-width sorted records let devices binary search the file in place.
+A version is the export time in microseconds. A delta against a base
+version holds every ticket whose ticket or order row changed since then,
+reaching TICKET_MANIFEST_OVERLAP seconds further back to cover
+transactions that committed late; applying a record twice is harmless.
+Deleted tickets never show up in a delta, so devices should still fetch a
+full manifest now and then.
+
+Rows are streamed with iterator(), so memory use does not grow with the
+size of the event.
+"""
+import struct
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import BooleanField, Case, Max, Q, Value, When
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from .models import Ticket
+
+MAGIC = b'THM1'
+HEADER = struct.Struct('>4sQQIB')
+ADD = b'+'
+REMOVE = b'-'
+
+CHUNK_SIZE = 2000
+
+
+def to_version(moment):
+    return int(moment.timestamp() * 1_000_000)
+
+
+def from_version(version):
+    return datetime.fromtimestamp(version / 1_000_000, tz=dt_timezone.utc)
+
+
+def _event_tickets(event):
+    return Ticket.objects.filter(order_item__order__event=event)
+
+
+def record_width(event):
+    """Length of the event's longest ticket number"""
+    width = _event_tickets(event).aggregate(width=Max(Length('ticket_number')))['width']
+    return width or Ticket._meta.get_field('ticket_number').max_length
+
+
+def manifest_rows(event, since=None):
+    """
+    (ticket_number, admitted) pairs sorted by ticket number: admitted tickets
+    only for a full manifest, every ticket changed after since for a delta.
+    """
+    tickets = _event_tickets(event)
+    if since is None:
+        tickets = tickets.filter(status__in=['valid', 'used'], order_item__order__status='paid')
+        admitted = Value(True)
+    else:
+        tickets = tickets.filter(Q(updated_at__gt=since) | Q(order_item__order__updated_at__gt=since))
+        admitted = Case(
+            When(status__in=['valid', 'used'], order_item__order__status='paid', then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField()
+        )
+    return (
+        tickets.annotate(admitted=admitted)
+        .order_by('ticket_number')
+        .values_list('ticket_number', 'admitted')
+    )
+
+
+def stream_manifest(event, base_version=None, chunk_size=CHUNK_SIZE):
+    """
+    Return (version, chunks): the new version and an iterator of the encoded
+    manifest, a delta if base_version is given.
+    """
+    version = to_version(timezone.now())
+    since = None
+    if base_version:
+        overlap = timedelta(seconds=getattr(settings, 'TICKET_MANIFEST_OVERLAP', 60))
+        since = from_version(base_version) - overlap
+
+    def chunks():
+        width = record_width(event)
+        yield HEADER.pack(MAGIC, version, base_version or 0, event.pk, width)
+
+        buffer = []
+        rows = manifest_rows(event, since).iterator(chunk_size=chunk_size)
+        for ticket_number, admitted in rows:
+            buffer.append((ADD if admitted else REMOVE) + ticket_number.encode().ljust(width, b'\0'))
+            if len(buffer) >= chunk_size:
+                yield b''.join(buffer)
+                buffer = []
+        if buffer:
+            yield b''.join(buffer)
+
+    return version, chunks()
+
+
+def read_manifest(data):
+    """Decode a manifest into (header dict, [(op, ticket_number), ...])"""
+    magic, version, base_version, event_id, width = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a check-in manifest")
+
+    size = width + 1
+    records = [
+        (data[offset:offset + 1], data[offset + 1:offset + size].rstrip(b'\0').decode())
+        for offset in range(HEADER.size, len(data), size)
+    ]
+    header = {'version': version, 'base_version': base_version, 'event_id': event_id, 'width': width}
+    return header, records
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_tickethold'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticket',
+            name='qr_code',
+            field=models.ImageField(blank=True, help_text='Legacy pre-rendered QR image; QR codes are rendered on demand', null=True, upload_to='tickets/qrcodes/'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_ticket_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.CharField(max_length=255)),
+                ('status', models.CharField(max_length=50)),
+                ('outcome', models.CharField(choices=[('applied', 'Applied'), ('ignored', 'Ignored (order already moved on)'), ('unknown_order', 'Unknown order')], max_length=20)),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_callbacks', to='orders.order')),
+            ],
+            options={
+                'ordering': ['-received_at'],
+                'constraints': [models.UniqueConstraint(fields=('transaction_id', 'status'), name='orders_paymentcallback_unique_delivery')],
+            },
+        ),
+    ]
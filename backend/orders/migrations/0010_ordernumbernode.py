@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:19
+
+from django.db import migrations, models
+
+
+def create_nodes(apps, schema_editor):
+    OrderNumberNode = apps.get_model('orders', 'OrderNumberNode')
+    OrderNumberNode.objects.bulk_create([OrderNumberNode(node_id=node_id) for node_id in range(1024)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_id', models.PositiveSmallIntegerField(unique=True)),
+                ('owner', models.CharField(blank=True, max_length=255)),
+                ('leased_until', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['node_id'],
+            },
+        ),
+        migrations.RunPython(create_nodes, migrations.RunPython.noop),
+    ]
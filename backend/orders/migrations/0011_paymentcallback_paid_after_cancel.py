@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_ordernumbernode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentcallback',
+            name='outcome',
+            field=models.CharField(choices=[('applied', 'Applied'), ('ignored', 'Ignored (order already moved on)'), ('paid_after_cancel', 'Paid after the order was cancelled (refund needed)'), ('unknown_order', 'Unknown order')], max_length=20),
+        ),
+    ]
@@ -1,10 +1,11 @@
 from django.db import models
 from django.conf import settings
+from django.core.files.base import ContentFile
 from events.models import Event, TicketType
+from .numbering import get_order_number_generator
+from .qr import qr_payload, render_qr
+from .signing import qr_access_token
 import uuid
-import qrcode
-from io import BytesIO
-from django.core.files import File
 
 
 class Order(models.Model):
@@ -53,6 +54,7 @@ class Order(models.Model):
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['order_number']),
+            models.Index(fields=['user', '-created_at', '-id'], name='orders_order_user_recent_idx'),
         ]
     
     def save(self, *args, **kwargs):
@@ -61,13 +63,8 @@ class Order(models.Model):
         super().save(*args, **kwargs)
     
     def generate_order_number(self):
-        """Generate unique order number"""
-        import random
-        import string
-        while True:
-            order_num = 'TH' + ''.join(random.choices(string.digits, k=8))
-            if not Order.objects.filter(order_number=order_num).exists():
-                return order_num
+        """Generate unique order number using the configured generator"""
+        return get_order_number_generator()()
     
     def __str__(self):
         return f"Order {self.order_number} - {self.user.email}"
@@ -107,12 +104,18 @@ class OrderItem(models.Model):
     
     def __str__(self):
         return f"{self.quantity}x {self.ticket_type.name} - {self.order.order_number}"
+    
+    def issue_tickets(self, attendee_email=''):
+        """Issue one ticket per unit of this item in a single batch"""
+        return Ticket.issue_for_items([self], attendee_email=attendee_email)
 
 
 class Ticket(models.Model):
     """
     Individual ticket with unique QR code.
     Each OrderItem generates multiple Ticket instances based on quantity.
+    QR images are rendered on demand by TicketQRCodeView; qr_code only holds
+    legacy or pre-rendered files.
     """
     STATUS_CHOICES = (
         ('valid', 'Valid'),
@@ -129,7 +132,12 @@ class Ticket(models.Model):
     attendee_name = models.CharField(max_length=255, blank=True)
     attendee_email = models.EmailField(blank=True)
     
-    qr_code = models.ImageField(upload_to='tickets/qrcodes/', blank=True, null=True)
+    qr_code = models.ImageField(
+        upload_to='tickets/qrcodes/',
+        blank=True,
+        null=True,
+        help_text="Legacy pre-rendered QR image; QR codes are rendered on demand"
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='valid')
     
     # Check-in details
@@ -137,6 +145,7 @@ class Ticket(models.Model):
     checked_in_at = models.DateTimeField(blank=True, null=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['created_at']
@@ -145,35 +154,37 @@ class Ticket(models.Model):
         if not self.ticket_number:
             self.ticket_number = self.generate_ticket_number()
         
-        if not self.qr_code:
-            self.generate_qr_code()
-        
         super().save(*args, **kwargs)
     
-    def generate_ticket_number(self):
+    @staticmethod
+    def generate_ticket_number():
         """Generate unique ticket number"""
         return str(uuid.uuid4())[:12].upper()
     
+    @classmethod
+    def issue_for_items(cls, order_items, attendee_email=''):
+        """
+        Issue tickets for saved order items in bulk.
+        Ticket numbers are generated up front and all rows are inserted with
+        bulk_create, so no per-ticket save() runs.
+        """
+        tickets = [
+            cls(
+                order_item=item,
+                ticket_number=cls.generate_ticket_number(),
+                attendee_email=attendee_email
+            )
+            for item in order_items
+            for _ in range(item.quantity)
+        ]
+        return cls.objects.bulk_create(tickets, batch_size=500)
+    
     def generate_qr_code(self):
-        """Generate QR code for ticket"""
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        
-        qr_data = f"TICKETHUB-{self.ticket_number}"
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        
-        filename = f'ticket_{self.ticket_number}.png'
-        self.qr_code.save(filename, File(buffer), save=False)
+        """Render the QR code into the legacy qr_code file field (not saved)"""
+        # The file is served publicly, so its name carries the access token
+        filename = f'ticket_{self.ticket_number}_{qr_access_token(self.ticket_number)}.png'
+        payload = qr_payload(self.ticket_number, self.order_item.order.event_id, self.order_item.ticket_type_id)
+        self.qr_code.save(filename, ContentFile(render_qr(payload)), save=False)
     
     def __str__(self):
         return f"Ticket {self.ticket_number}"
@@ -187,6 +198,49 @@ class Ticket(models.Model):
         return self.order_item.ticket_type
 
 
+class TicketHold(models.Model):
+    """
+    Stock reserved by a pending order.
+    Holds are released back to the ticket type when the order is cancelled or
+    stays unpaid past expires_at, and converted once the order is paid.
+    """
+    STATUS_CHOICES = (
+        ('active', 'Active'),
+        ('released', 'Released'),
+        ('converted', 'Converted'),
+    )
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='holds'
+    )
+    ticket_type = models.ForeignKey(
+        TicketType,
+        on_delete=models.CASCADE,
+        related_name='holds'
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+
+    expires_at = models.DateTimeField()
+    released_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['expires_at']
+        indexes = [
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(status='active'),
+                name='orders_hold_active_expiry_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.ticket_type.name} held for {self.order.order_number}"
+
+
 class Payment(models.Model):
     """
     Payment transaction details.
@@ -234,6 +288,80 @@ class Payment(models.Model):
         return f"Payment for {self.order.order_number} - {self.status}"
 
 
+class PaymentCallback(models.Model):
+    """
+    Idempotency record of a payment gateway callback.
+    One row per (transaction_id, status); retries of a callback are answered
+    from it (see orders.callbacks).
+    """
+    APPLIED = 'applied'
+    IGNORED = 'ignored'
+    PAID_AFTER_CANCEL = 'paid_after_cancel'
+    UNKNOWN_ORDER = 'unknown_order'
+    OUTCOME_CHOICES = (
+        (APPLIED, 'Applied'),
+        (IGNORED, 'Ignored (order already moved on)'),
+        (PAID_AFTER_CANCEL, 'Paid after the order was cancelled (refund needed)'),
+        (UNKNOWN_ORDER, 'Unknown order'),
+    )
+    
+    transaction_id = models.CharField(max_length=255)
+    status = models.CharField(max_length=50)
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payment_callbacks'
+    )
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    payload = models.JSONField(blank=True, null=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-received_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['transaction_id', 'status'],
+                name='orders_paymentcallback_unique_delivery'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Callback {self.transaction_id} ({self.status}) - {self.outcome}"
+
+
+class PaymentInboxEntry(models.Model):
+    """
+    A payment callback received in queued mode, waiting to be applied by
+    the inbox worker (see orders.inbox).
+    """
+    transaction_id = models.CharField(max_length=255)
+    order_number = models.CharField(max_length=20)
+    status = models.CharField(max_length=50)
+    payload = models.JSONField(blank=True, null=True)
+    
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    outcome = models.CharField(max_length=20, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = 'payment inbox entries'
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(processed_at__isnull=True),
+                name='orders_inbox_pending_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Inbox {self.transaction_id} ({self.status})"
+
+
 class PaymentProof(models.Model):
     """
     Store manual payment proofs submitted by users
@@ -274,4 +402,96 @@ class PaymentProof(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.transaction_code} - {self.order.order_number}"
\ No newline at end of file
+        return f"{self.transaction_code} - {self.order.order_number}"
+
+class SalesRollup(models.Model):
+    """
+    Tickets and revenue of one ticket type from orders placed in one hour or
+    day, by order status. Maintained incrementally as orders change status
+    (see orders.analytics).
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = (
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    )
+    
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name='sales_rollups'
+    )
+    ticket_type = models.ForeignKey(
+        TicketType,
+        on_delete=models.CASCADE,
+        related_name='sales_rollups'
+    )
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateTimeField()
+    
+    pending_tickets = models.IntegerField(default=0)
+    pending_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_tickets = models.IntegerField(default=0)
+    paid_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        ordering = ['start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ticket_type', 'period', 'start'],
+                name='orders_salesrollup_unique_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['event', 'period', 'start'], name='orders_salesrollup_event_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ticket_type_id} {self.period} {self.start:%Y-%m-%d %H:%M}"
+
+
+class EventRollup(models.Model):
+    """
+    Orders placed for an event in one hour or day, by order status, and the
+    event page views recorded in that time (see orders.analytics).
+    """
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name='rollups'
+    )
+    period = models.CharField(max_length=4, choices=SalesRollup.PERIOD_CHOICES)
+    start = models.DateTimeField()
+    
+    views = models.IntegerField(default=0)
+    pending_orders = models.IntegerField(default=0)
+    paid_orders = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event', 'period', 'start'],
+                name='orders_eventrollup_unique_bucket'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_id} {self.period} {self.start:%Y-%m-%d %H:%M}"
+
+
+class OrderNumberNode(models.Model):
+    """
+    One of the node ids embedded in order numbers, leased by the process
+    currently generating numbers with it (see orders.numbering).
+    """
+    node_id = models.PositiveSmallIntegerField(unique=True)
+    owner = models.CharField(max_length=255, blank=True)
+    leased_until = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['node_id']
+    
+    def __str__(self):
+        return f"Node {self.node_id} ({self.owner or 'free'})"
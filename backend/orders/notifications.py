@@ -0,0 +1,108 @@
+"""
+Order status change notifications for long-polling clients.
+
+A request waiting for an order's payment status subscribes to the order and
+sleeps until the order or one of its payment proofs changes. Changes are
+published after their transaction commits, in two ways: waiters in the same
+process are woken at once through a condition variable, and a per-order
+version counter is bumped in the cache so waiters in other processes (with a
+shared cache backend) notice within PAYMENT_STATUS_POLL_INTERVAL seconds.
+While waiting, a request costs a sleeping thread and one cache read per poll
+interval; the database is only read again once something has changed.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CACHE_KEY = 'order-status:{}'
+# Versions only need to outlive the longest wait
+CACHE_TIMEOUT = 3600
+
+
+def _poll_interval():
+    return getattr(settings, 'PAYMENT_STATUS_POLL_INTERVAL', 1)
+
+
+def _cache_version(order_id):
+    return cache.get(CACHE_KEY.format(order_id), 0)
+
+
+class OrderStatusChannel:
+    def __init__(self):
+        self._condition = threading.Condition()
+        # order id -> [subscribers, local version], only while subscribed
+        self._orders = {}
+
+    @contextmanager
+    def subscribe(self, order_id):
+        """
+        Register interest in order_id; yields a token to pass to wait().
+        Subscribe before reading the order's status so a change made in
+        between is not missed.
+        """
+        with self._condition:
+            entry = self._orders.setdefault(order_id, [0, 0])
+            entry[0] += 1
+        try:
+            yield (entry[1], _cache_version(order_id))
+        finally:
+            with self._condition:
+                entry[0] -= 1
+                if not entry[0]:
+                    del self._orders[order_id]
+
+    def wait(self, order_id, token, timeout):
+        """
+        Block until order_id changes after token was taken, or timeout
+        seconds pass. Returns a new token when it changed, None otherwise.
+        """
+        if not math.isfinite(timeout):
+            raise ValueError(f"timeout must be a finite number of seconds, not {timeout}")
+        local, shared = token
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._condition:
+                entry = self._orders[order_id]
+                remaining = deadline - time.monotonic()
+                if entry[1] == local and remaining > 0:
+                    self._condition.wait(min(remaining, _poll_interval()))
+                current = entry[1]
+            version = _cache_version(order_id)
+            if current != local or version != shared:
+                return (current, version)
+            if time.monotonic() >= deadline:
+                return None
+
+    def publish(self, order_ids):
+        """Wake the waiters for order_ids, in this and other processes"""
+        order_ids = set(order_ids) - {None}
+        if not order_ids:
+            return
+        with self._condition:
+            for order_id in order_ids:
+                if order_id in self._orders:
+                    self._orders[order_id][1] += 1
+            self._condition.notify_all()
+        for order_id in order_ids:
+            key = CACHE_KEY.format(order_id)
+            cache.add(key, 0, CACHE_TIMEOUT)
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Expired in between
+                cache.set(key, 1, CACHE_TIMEOUT)
+
+
+order_status = OrderStatusChannel()
+
+
+def notify_status_changed(order_ids):
+    """Publish a status change of order_ids once the current transaction commits"""
+    order_ids = set(order_ids)
+    if order_ids:
+        transaction.on_commit(lambda: order_status.publish(order_ids))
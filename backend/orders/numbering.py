@@ -0,0 +1,273 @@
+"""
+Order number generation.
+
+The generator is chosen by the ORDER_NUMBER_GENERATOR setting (a dotted path
+to a zero-argument callable class). The default, TimeOrderedGenerator,
+produces numbers that are unique by construction and sort by creation time,
+so creating an order needs no existence query.
+
+Each process generating numbers leases a node id of its own from the
+OrderNumberNode table, renewing the lease as it goes, so two live processes
+never share one. Leases of processes that die without releasing them expire
+after ORDER_NUMBER_NODE_LEASE seconds. Checkout takes or renews the lease
+with prepare() before its own transaction opens, so the lease is committed
+on its own and a failed checkout cannot roll it back.
+"""
+import atexit
+import functools
+import os
+import random
+import socket
+import string
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Crockford's base32: no I, L, O or U, and ascending in ASCII so encoded
+# values of equal width sort the same way as the numbers they encode
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+EPOCH_MS = int(datetime(2024, 1, 1, tzinfo=dt_timezone.utc).timestamp() * 1000)
+TIMESTAMP_BITS = 41
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+BODY_LENGTH = 13  # ceil(63 bits / 5)
+
+
+def encode_base32(value, length):
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def check_character(body):
+    """Luhn mod 32 check character; catches single typos and adjacent swaps"""
+    total = 0
+    factor = 2
+    for char in reversed(body):
+        addend = factor * ALPHABET.index(char)
+        total += addend // 32 + addend % 32
+        factor = 1 if factor == 2 else 2
+    return ALPHABET[-total % 32]
+
+
+def is_valid_order_number(order_number):
+    """Check the checksum of a number produced by TimeOrderedGenerator"""
+    if not order_number.startswith('TH') or len(order_number) != BODY_LENGTH + 3:
+        return False
+    body, check = order_number[2:-1], order_number[-1]
+    if any(char not in ALPHABET for char in body):
+        return False
+    return check_character(body) == check
+
+
+class NodeIdsExhausted(RuntimeError):
+    pass
+
+
+class NodeLease:
+    """
+    A node id leased from the OrderNumberNode table for this process.
+
+    node_id and expires always describe a committed lease. Outside a
+    transaction the lease is taken or renewed in a transaction of its own.
+    Inside one, the change is only adopted when that transaction commits;
+    until then it is reused for as long as its commit callback is still
+    queued, i.e. until the transaction or savepoint that took it rolls back.
+    """
+    def __init__(self):
+        self.owner = None
+        self.node_id = None
+        self.expires = None
+        self._pending = None
+        self._pid = None
+
+    @property
+    def duration(self):
+        return timedelta(seconds=getattr(settings, 'ORDER_NUMBER_NODE_LEASE', 600))
+
+    def get(self):
+        """The leased node id, taking or renewing the lease when needed"""
+        from .models import OrderNumberNode
+
+        if self._pid != os.getpid():
+            # Forked workers must not inherit their parent's lease
+            self._pid = os.getpid()
+            self.owner = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+            self.node_id = None
+            self._pending = None
+
+        now = timezone.now()
+        if self.node_id is not None and now < self.expires - self.duration / 2:
+            return self.node_id
+        if self._pending is not None and self._is_queued(self._pending[1]):
+            return self._pending[0]
+
+        expires = now + self.duration
+        held = OrderNumberNode.objects.filter(node_id=self.node_id, owner=self.owner, leased_until__gt=now)
+        if self.node_id is not None and held.update(leased_until=expires):
+            node_id = self.node_id
+        else:
+            node_id = self._acquire(now, expires)
+
+        if not transaction.get_connection().in_atomic_block:
+            # Autocommit: the lease is already committed
+            self.node_id, self.expires, self._pending = node_id, expires, None
+        else:
+            confirm = functools.partial(self._confirm, node_id, expires)
+            self._pending = (node_id, confirm)
+            transaction.on_commit(confirm)
+        return node_id
+
+    @staticmethod
+    def _is_queued(callback):
+        # Rolling back a transaction or savepoint drops the commit callbacks
+        # registered in it
+        return any(func is callback for _, func, _ in transaction.get_connection().run_on_commit)
+
+    def _acquire(self, now, expires):
+        from .models import OrderNumberNode
+
+        with transaction.atomic():
+            node = (
+                OrderNumberNode.objects.select_for_update(skip_locked=True)
+                .filter(Q(leased_until__isnull=True) | Q(leased_until__lte=now))
+                .order_by(F('leased_until').asc(nulls_first=True), 'node_id')
+                .first()
+            )
+            if node is None:
+                raise NodeIdsExhausted("Every order number node id is leased")
+            OrderNumberNode.objects.filter(pk=node.pk).update(owner=self.owner, leased_until=expires)
+        return node.node_id
+
+    def _confirm(self, node_id, expires):
+        self.node_id, self.expires, self._pending = node_id, expires, None
+
+    def release(self):
+        from .models import OrderNumberNode
+
+        if self._pid != os.getpid():
+            return
+        node_ids = {self.node_id, self._pending and self._pending[0]} - {None}
+        if node_ids:
+            OrderNumberNode.objects.filter(node_id__in=node_ids, owner=self.owner).update(leased_until=None)
+        self.node_id = self._pending = None
+
+
+class TimeOrderedGenerator:
+    """
+    'TH' + 13 base32 characters + 1 check character, e.g. TH0A8NPQBTW0W00B.
+
+    The encoded 63-bit body is a millisecond timestamp (41 bits), a node id
+    (10 bits) and a per-millisecond sequence (12 bits), like a Snowflake id.
+    Numbers from one process never repeat, and processes with different node
+    ids can never collide. Node ids are leased per process (see NodeLease),
+    unless ORDER_NUMBER_NODE_ID pins one for a single generating process.
+    """
+    def __init__(self, node_id=None):
+        self._node_id = node_id
+        self._lock = threading.Lock()
+        self._lease = NodeLease()
+        self._last_ms = 0
+        self._sequence = 0
+
+    @property
+    def node_id(self):
+        if self._node_id is not None:
+            return self._node_id
+
+        configured = getattr(settings, 'ORDER_NUMBER_NODE_ID', None)
+        if configured not in (None, ''):
+            return int(configured) % (1 << NODE_BITS)
+
+        with self._lock:
+            return self._lease.get()
+
+    def prepare(self):
+        """
+        Take or renew the lease now, so numbers drawn in a transaction opened
+        afterwards need no lease queries of their own
+        """
+        self.node_id
+
+    def release(self):
+        """Give the leased node id back, e.g. when the process exits"""
+        with self._lock:
+            self._lease.release()
+
+    def _next_tick(self):
+        """Return (milliseconds, sequence), never repeating within this generator"""
+        with self._lock:
+            now_ms = int(time.time() * 1000) - EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                # Same millisecond or the clock stepped back: keep counting
+                # from the last timestamp so order is preserved
+                self._sequence += 1
+                if self._sequence >> SEQUENCE_BITS:
+                    self._last_ms += 1
+                    self._sequence = 0
+            return self._last_ms, self._sequence
+
+    def __call__(self):
+        # Lease first: the number must carry an id held when it was made
+        node_id = self.node_id
+        timestamp, sequence = self._next_tick()
+        value = (
+            (timestamp % (1 << TIMESTAMP_BITS)) << (NODE_BITS + SEQUENCE_BITS)
+            | node_id << SEQUENCE_BITS
+            | sequence
+        )
+        body = encode_base32(value, BODY_LENGTH)
+        return 'TH' + body + check_character(body)
+
+
+class RandomDigitsGenerator:
+    """
+    Original scheme: 'TH' + 8 random digits, probing the database until an
+    unused number is found.
+    """
+    def __call__(self):
+        from .models import Order
+
+        while True:
+            order_num = 'TH' + ''.join(random.choices(string.digits, k=8))
+            if not Order.objects.filter(order_number=order_num).exists():
+                return order_num
+
+
+_generator = None
+_generator_path = None
+
+
+def get_order_number_generator():
+    """Return the configured generator, instantiating it once per process"""
+    global _generator, _generator_path
+
+    path = getattr(settings, 'ORDER_NUMBER_GENERATOR', 'orders.numbering.TimeOrderedGenerator')
+    if _generator is None or _generator_path != path:
+        _generator = import_string(path)()
+        _generator_path = path
+    return _generator
+
+
+@atexit.register
+def _release_at_exit():
+    release = getattr(_generator, 'release', None)
+    if release is not None:
+        try:
+            release()
+        except Exception:
+            # The database may be gone already; the lease just expires
+            pass
@@ -0,0 +1,93 @@
+"""
+Verification of manually submitted payment proofs.
+
+Approving moves the selected pending proofs to approved and their orders to
+paid with a few set-based UPDATEs per batch of BATCH_SIZE proofs, each batch
+in its own transaction, so large selections neither hold locks for long nor
+exceed the database's query parameter limit. Used by the admin actions, the
+approve_payment_proofs command and the staff API.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, PaymentProof
+from .notifications import notify_status_changed
+from .transitions import mark_orders_paid
+
+BATCH_SIZE = 500
+
+
+def _batches(proof_ids, batch_size):
+    proof_ids = sorted(set(proof_ids))
+    for start in range(0, len(proof_ids), batch_size):
+        yield proof_ids[start:start + batch_size]
+
+
+def approve_proofs(proof_ids, verified_by=None, now=None, batch_size=BATCH_SIZE):
+    """
+    Approve the pending proofs among proof_ids and mark their orders paid.
+    Returns counts: approved proofs, orders_paid, skipped proofs (not
+    pending, or unknown) and paid_after_cancel, the approved proofs whose
+    order had already been cancelled. Those buyers paid for nothing and need
+    a refund. Orders that are no longer pending (paid by another proof,
+    cancelled) keep their status.
+    """
+    now = now or timezone.now()
+    totals = {'approved': 0, 'orders_paid': 0, 'skipped': 0, 'paid_after_cancel': 0}
+    for batch in _batches(proof_ids, batch_size):
+        for key, count in _approve_batch(batch, verified_by, now).items():
+            totals[key] += count
+    return totals
+
+
+def _approve_batch(proof_ids, verified_by, now):
+    with transaction.atomic():
+        proofs = list(
+            PaymentProof.objects.select_for_update()
+            .filter(pk__in=proof_ids, status='pending')
+            .order_by('id')
+            .values_list('id', 'order_id', 'transaction_code')
+        )
+        approved = PaymentProof.objects.filter(pk__in=[proof[0] for proof in proofs], status='pending').update(
+            status='approved', verified_by=verified_by, verified_at=now, updated_at=now
+        )
+
+        # An order with several approved proofs records the earliest one
+        transaction_ids = {}
+        for _, order_id, transaction_code in proofs:
+            transaction_ids.setdefault(order_id, transaction_code)
+        orders_paid = mark_orders_paid(transaction_ids, now)
+        cancelled = set()
+        if orders_paid < len(transaction_ids):
+            cancelled = set(
+                Order.objects.filter(pk__in=list(transaction_ids), status='cancelled').values_list('pk', flat=True)
+            )
+        # Orders already paid still show the proof's new status
+        notify_status_changed(transaction_ids)
+
+    return {
+        'approved': approved,
+        'orders_paid': orders_paid,
+        'skipped': len(proof_ids) - approved,
+        'paid_after_cancel': sum(1 for _, order_id, _ in proofs if order_id in cancelled),
+    }
+
+
+def reject_proofs(proof_ids, verified_by=None, reason='', now=None, batch_size=BATCH_SIZE):
+    """Reject the pending proofs among proof_ids; returns counts like approve_proofs"""
+    now = now or timezone.now()
+    totals = {'rejected': 0, 'skipped': 0}
+    for batch in _batches(proof_ids, batch_size):
+        with transaction.atomic():
+            rejected = PaymentProof.objects.filter(pk__in=batch, status='pending').update(
+                status='rejected', verified_by=verified_by, verified_at=now, rejection_reason=reason or None,
+                updated_at=now
+            )
+            if rejected:
+                notify_status_changed(
+                    PaymentProof.objects.filter(pk__in=batch, status='rejected', verified_at=now)
+                    .values_list('order_id', flat=True)
+                )
+        totals['rejected'] += rejected
+        totals['skipped'] += len(batch) - rejected
+    return totals
@@ -0,0 +1,111 @@
+"""
+On-demand QR code rendering for tickets.
+
+QR images are derived entirely from the ticket's signed payload, so instead
+of storing one file per ticket they are rendered when first requested and
+kept in a small in-process LRU cache bounded by total bytes.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+
+from .signing import sign_ticket
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def qr_payload(ticket_number, event_id, ticket_type_id):
+    """Data encoded in a ticket's QR code"""
+    return sign_ticket(ticket_number, event_id, ticket_type_id)
+
+
+def render_qr(payload, fmt='png'):
+    """Render payload as a QR image and return the encoded bytes"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    buffer = BytesIO()
+    if fmt == 'svg':
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class QRCodeCache:
+    """
+    Thread-safe LRU cache of rendered images, bounded by their total size.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+
+            self._entries[key] = data
+            self.size += len(data)
+
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+qr_cache = QRCodeCache(getattr(settings, 'TICKET_QR_CACHE_BYTES', 32 * 1024 * 1024))
+
+
+def qr_etag(payload, fmt):
+    """Strong validator for a rendered image; the image depends only on these inputs"""
+    return '"%s"' % hashlib.sha1(f"{fmt}:{payload}".encode()).hexdigest()
+
+
+def get_qr(payload, fmt='png'):
+    """Return the rendered image for payload, rendering it on a cache miss"""
+    key = (payload, fmt)
+    data = qr_cache.get(key)
+    if data is None:
+        data = render_qr(payload, fmt)
+        qr_cache.set(key, data)
+    return data
+
+
+def render_png_batch(items):
+    """
+    Render (key, payload) pairs to PNG and return (key, bytes) pairs.
+    Module level so it can be shipped to ProcessPoolExecutor workers.
+    """
+    return [(key, render_qr(payload, 'png')) for key, payload in items]
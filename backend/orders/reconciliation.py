@@ -0,0 +1,158 @@
+"""
+Reconciliation of M-Pesa statements against pending payment proofs.
+
+The statement CSV is read one row at a time and looked up in a hash index
+of pending proofs built with a single query, so memory depends on the
+number of pending proofs rather than the statement's length. A proof
+matches when its transaction code appears on a completed statement row
+with the same amount and, if the proof has one, the same phone number.
+Matches are approved in batches through approve_proofs(). A statement may
+list a code more than once (e.g. a failed attempt before the completed
+one), so a row that names a pending proof but does not match is only
+written to the exception report at the end, if no other row matched it.
+"""
+import csv
+import re
+from decimal import Decimal, InvalidOperation
+
+from .models import PaymentProof
+from .proofs import approve_proofs
+
+# Column names of the M-Pesa business statement export
+COLUMNS = {
+    'code': 'Receipt No.',
+    'amount': 'Paid In',
+    'phone': 'Other Party Info',
+    'status': 'Transaction Status',
+}
+COMPLETED = 'completed'
+
+APPROVE_BATCH_SIZE = 500
+
+AMOUNT_MISMATCH = 'amount_mismatch'
+PHONE_MISMATCH = 'phone_mismatch'
+NOT_COMPLETED = 'not_completed'
+INVALID_AMOUNT = 'invalid_amount'
+NOT_ON_STATEMENT = 'not_on_statement'
+
+REPORT_FIELDS = [
+    'reason', 'transaction_code', 'proof_id', 'order_number',
+    'proof_amount', 'statement_amount', 'proof_phone', 'statement_phone',
+]
+
+
+def normalize_phone(value):
+    """Last nine digits, so 0712..., 254712... and +254 712... compare equal"""
+    return re.sub(r'\D', '', value or '')[-9:]
+
+
+def parse_amount(value):
+    return Decimal((value or '').replace(',', '').strip() or '0')
+
+
+def pending_index():
+    """{transaction_code: proof values} of every pending proof, from one query"""
+    return {
+        proof['transaction_code'].strip().upper(): proof
+        for proof in PaymentProof.objects.filter(status='pending').values(
+            'id', 'transaction_code', 'amount', 'phone_number', 'order__order_number'
+        ).iterator()
+    }
+
+
+def _mismatch(proof, row, columns):
+    if (row.get(columns['status']) or COMPLETED).strip().lower() != COMPLETED:
+        return NOT_COMPLETED
+    try:
+        amount = parse_amount(row.get(columns['amount']))
+    except InvalidOperation:
+        return INVALID_AMOUNT
+    if amount != proof['amount']:
+        return AMOUNT_MISMATCH
+    proof_phone = normalize_phone(proof['phone_number'])
+    if proof_phone and proof_phone != normalize_phone(row.get(columns['phone'])):
+        return PHONE_MISMATCH
+    return None
+
+
+def _exception(reason, proof, row=None, columns=COLUMNS):
+    row = row or {}
+    return {
+        'reason': reason,
+        'transaction_code': proof['transaction_code'],
+        'proof_id': proof['id'],
+        'order_number': proof['order__order_number'],
+        'proof_amount': proof['amount'],
+        'statement_amount': row.get(columns['amount'], ''),
+        'proof_phone': proof['phone_number'],
+        'statement_phone': row.get(columns['phone'], ''),
+    }
+
+
+def reconcile_statement(lines, report=None, verified_by=None, dry_run=False,
+                        include_missing=False, columns=None):
+    """
+    Reconcile a statement given as an iterable of CSV lines (e.g. an open
+    file). Exceptions are written as CSV to report, if given, along with
+    pending proofs absent from the statement when include_missing is set.
+    Returns counts of rows read, proofs matched and approved, orders marked
+    paid, approved proofs of cancelled orders (paid_after_cancel, to be
+    refunded), exceptions, and pending proofs missing from the statement.
+    """
+    columns = {**COLUMNS, **(columns or {})}
+    index = pending_index()
+    writer = None
+    if report is not None:
+        writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+
+    totals = {
+        'rows': 0, 'matched': 0, 'approved': 0, 'orders_paid': 0, 'paid_after_cancel': 0,
+        'exceptions': 0, 'missing': 0,
+    }
+    matched = []
+    # code -> (reason, row) of the first row that named the proof
+    mismatched = {}
+
+    def approve():
+        if not dry_run:
+            counts = approve_proofs(matched, verified_by=verified_by)
+            totals['approved'] += counts['approved']
+            totals['orders_paid'] += counts['orders_paid']
+            totals['paid_after_cancel'] += counts['paid_after_cancel']
+        matched.clear()
+
+    for row in csv.DictReader(lines):
+        totals['rows'] += 1
+        code = (row.get(columns['code']) or '').strip().upper()
+        proof = index.get(code)
+        if proof is None:
+            # Not a pending proof (or already matched): most statement
+            # lines are other payments
+            continue
+
+        reason = _mismatch(proof, row, columns)
+        if reason:
+            mismatched.setdefault(code, (reason, row))
+            continue
+
+        del index[code]
+        mismatched.pop(code, None)
+        totals['matched'] += 1
+        matched.append(proof['id'])
+        if len(matched) >= APPROVE_BATCH_SIZE:
+            approve()
+
+    if matched:
+        approve()
+
+    totals['exceptions'] = len(mismatched)
+    totals['missing'] = len(index) - len(mismatched)
+    if writer:
+        for code, (reason, row) in mismatched.items():
+            writer.writerow(_exception(reason, index[code], row, columns))
+        if include_missing:
+            for code, proof in index.items():
+                if code not in mismatched:
+                    writer.writerow(_exception(NOT_ON_STATEMENT, proof))
+    return totals
@@ -1,6 +1,14 @@
+from django.db import transaction
+from django.urls import reverse
+from django.utils.http import urlencode
 from rest_framework import serializers
-from .models import Order, OrderItem, Ticket, Payment
+from .models import Order, OrderItem, Ticket, Payment, SalesRollup
+from .numbering import get_order_number_generator
+from .analytics import record_transitions
+from .holds import create_holds
+from .signing import qr_access_token
 from events.models import Event, TicketType
+from events.inventory import reserve_tickets, InsufficientInventory
 
 
 class TicketTypeSimpleSerializer(serializers.ModelSerializer):
@@ -50,6 +58,7 @@ class TicketSerializer(serializers.ModelSerializer):
     ticket_type_name = serializers.CharField(source='order_item.ticket_type.name', read_only=True)
     order_number = serializers.CharField(source='order_item.order.order_number', read_only=True)
     order_status = serializers.CharField(source='order_item.order.status', read_only=True)
+    qr_code = serializers.SerializerMethodField()
     
     class Meta:
         model = Ticket
@@ -60,6 +69,18 @@ class TicketSerializer(serializers.ModelSerializer):
             'checked_in', 'checked_in_at', 'created_at'
         ]
         read_only_fields = ['ticket_number', 'qr_code', 'status', 'checked_in', 'checked_in_at']
+    
+    def get_qr_code(self, obj):
+        # Prefer a pre-rendered file, otherwise point at the on-demand renderer,
+        # which only serves requests carrying the ticket's access token
+        if obj.qr_code:
+            url = obj.qr_code.url
+        else:
+            url = reverse('ticket_qr', kwargs={'ticket_number': obj.ticket_number, 'fmt': 'png'})
+            url += '?' + urlencode({'token': qr_access_token(obj.ticket_number)})
+        
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -100,6 +121,8 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             ticket_type = item['ticket_type']
             quantity = item['quantity']
             
+            # Early rejection only - the authoritative check happens when
+            # stock is reserved in create()
             if ticket_type.tickets_remaining < quantity:
                 raise serializers.ValidationError(
                     f"Only {ticket_type.tickets_remaining} tickets available for {ticket_type.name}"
@@ -124,32 +147,45 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             for item in items_data
         )
         
-        order = Order.objects.create(
-            total_amount=total_amount,
-            **validated_data
-        )
+        # Take or renew the order number lease in a transaction of its own,
+        # so rolling back the checkout below cannot roll it back
+        prepare = getattr(get_order_number_generator(), 'prepare', None)
+        if prepare is not None:
+            prepare()
         
-        for item_data in items_data:
-            ticket_type = item_data['ticket_type']
-            quantity = item_data['quantity']
-            price = ticket_type.price
+        with transaction.atomic():
+            # Claim stock first so a sold-out ticket type aborts the order
+            # before anything else is written
+            try:
+                reserve_tickets(
+                    (item['ticket_type'], item['quantity'])
+                    for item in items_data
+                )
+            except InsufficientInventory as e:
+                raise serializers.ValidationError({'items': [str(e)]})
             
-            order_item = OrderItem.objects.create(
-                order=order,
-                ticket_type=ticket_type,
-                quantity=quantity,
-                price=price
-            )
+            order = Order.objects.create(total_amount=total_amount, **validated_data)
             
-            for i in range(quantity):
-                Ticket.objects.create(
-                    order_item=order_item,
-                    attendee_email=order.email
+            order_items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    ticket_type=item_data['ticket_type'],
+                    quantity=item_data['quantity'],
+                    price=item_data['ticket_type'].price,
+                    subtotal=item_data['ticket_type'].price * item_data['quantity']
                 )
+                for item_data in items_data
+            ])
+            Ticket.issue_for_items(order_items, attendee_email=order.email)
             
-            ticket_type.quantity_sold += quantity
-            ticket_type.save()
+            # Stock stays reserved only until the hold expires unpaid
+            create_holds(order, order_items)
         
+        # Rollup deltas add up in any order, so the new order is counted
+        # after the commit instead of locking the event's hot rollup rows
+        # for the rest of the checkout; rebuild_rollups repairs a lost one
+        created, status = {order.pk: None}, order.status
+        transaction.on_commit(lambda: record_transitions(created, status), robust=True)
         return order
 
 
@@ -164,4 +200,48 @@ class PaymentSerializer(serializers.ModelSerializer):
             'transaction_id', 'status', 'mpesa_receipt_number',
             'phone_number', 'created_at', 'completed_at'
         ]
-        read_only_fields = ['transaction_id', 'status', 'completed_at']
\ No newline at end of file
+        read_only_fields = ['transaction_id', 'status', 'completed_at']
+
+
+class CheckInScanSerializer(serializers.Serializer):
+    """One scan from a door scanner: the QR payload or a typed ticket number"""
+    payload = serializers.CharField(max_length=200, required=False)
+    ticket_number = serializers.CharField(max_length=20, required=False)
+    scanned_at = serializers.DateTimeField(required=False)
+    device_id = serializers.CharField(max_length=64, required=False, allow_blank=True)
+    
+    def validate(self, data):
+        if not data.get('payload') and not data.get('ticket_number'):
+            raise serializers.ValidationError("Provide the scanned payload or a ticket number")
+        return data
+
+
+class TicketVerifySerializer(serializers.Serializer):
+    """A scanned QR payload, optionally checked against the event at the gate"""
+    payload = serializers.CharField(max_length=200)
+    event_id = serializers.IntegerField(required=False)
+
+
+class CheckInBatchSerializer(serializers.Serializer):
+    """Scans queued by a scanner while it was offline"""
+    scans = CheckInScanSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class PaymentCallbackSerializer(serializers.Serializer):
+    """Fields of a gateway callback the order is updated from"""
+    transaction_id = serializers.CharField(max_length=255)
+    order_number = serializers.CharField(max_length=20)
+    status = serializers.CharField(max_length=50)
+
+
+class SalesAnalyticsQuerySerializer(serializers.Serializer):
+    """Bucket size and time range of an organizer sales report"""
+    period = serializers.ChoiceField(choices=SalesRollup.PERIOD_CHOICES, default=SalesRollup.DAY)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+
+class PaymentProofReviewSerializer(serializers.Serializer):
+    """Payment proofs to approve or reject in one go"""
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=2000)
+    reason = serializers.CharField(required=False, allow_blank=True)
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from events.viewcounts import views_flushed
+from .analytics import record_transitions, record_views
+from .models import Order, PaymentProof
+from .notifications import notify_status_changed
+
+
+@receiver(pre_save, sender=Order)
+def order_saving(sender, instance, **kwargs):
+    """Remember the stored status, which the instance may not reflect"""
+    if instance.pk:
+        instance._saved_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    """
+    Wake payment status requests waiting on the order and move its sales
+    between rollup columns when its status was changed (e.g. in the admin).
+    New orders are rolled up once their items exist.
+    """
+    if created:
+        return
+    notify_status_changed([instance.pk])
+    previous = getattr(instance, '_saved_status', None)
+    if previous and previous != instance.status:
+        record_transitions({instance.pk: previous}, instance.status)
+
+
+@receiver(post_save, sender=PaymentProof)
+def payment_proof_saved(sender, instance, **kwargs):
+    notify_status_changed([instance.order_id])
+
+
+@receiver(views_flushed)
+def event_views_flushed(sender, counts, flushed_at, **kwargs):
+    record_views(counts, flushed_at)
@@ -0,0 +1,105 @@
+"""
+Signed ticket QR payloads.
+
+A payload carries the ticket number, event id and ticket type id with an
+HMAC-SHA256 signature, so a scanner holding the keys can tell a genuine
+ticket from a forged one without asking the database:
+
+    TH1.<key id>.<ticket number>.<event id>.<ticket type id>.<signature>
+
+Keys come from TICKET_SIGNING_KEYS ({key id: secret}); new payloads are
+signed with TICKET_SIGNING_KEY_ID and any configured key verifies. HMAC is
+symmetric, so only trusted scanners should hold the keys; others can call
+the verify endpoint, which also needs no database access.
+
+QR images are fetched through URLs carrying a per-ticket access token from
+the same keys, since the image itself is now a credential.
+"""
+import base64
+import hashlib
+import hmac
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+
+VERSION = 'TH1'
+LEGACY_PREFIX = 'TICKETHUB-'
+SIGNATURE_BYTES = 16
+
+TicketClaims = namedtuple('TicketClaims', ['ticket_number', 'event_id', 'ticket_type_id', 'key_id'])
+
+
+class InvalidTicketSignature(ValueError):
+    pass
+
+
+def signing_keys():
+    keys = getattr(settings, 'TICKET_SIGNING_KEYS', None)
+    if not keys:
+        # Derive a default from SECRET_KEY so development works unconfigured
+        keys = {'k1': hashlib.sha256(f'ticket-signing:{settings.SECRET_KEY}'.encode()).hexdigest()}
+    return keys
+
+
+def current_key_id():
+    return getattr(settings, 'TICKET_SIGNING_KEY_ID', None) or next(iter(signing_keys()))
+
+
+def _signature(key_id, message):
+    try:
+        secret = signing_keys()[key_id]
+    except KeyError:
+        raise InvalidTicketSignature(f"Unknown signing key '{key_id}'")
+    digest = hmac.new(secret.encode(), message.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).decode().rstrip('=')
+
+
+def sign_ticket(ticket_number, event_id, ticket_type_id, key_id=None):
+    """Return the signed QR payload for a ticket"""
+    key_id = key_id or current_key_id()
+    message = f'{VERSION}.{key_id}.{ticket_number}.{event_id}.{ticket_type_id}'
+    return f'{message}.{_signature(key_id, message)}'
+
+
+def verify_ticket(payload):
+    """
+    Check a payload's signature and return its TicketClaims.
+    Raises InvalidTicketSignature for anything that was not signed by one
+    of the configured keys. Touches no database.
+    """
+    parts = payload.strip().split('.')
+    if len(parts) != 6 or parts[0] != VERSION:
+        raise InvalidTicketSignature("Not a signed ticket payload")
+
+    _, key_id, ticket_number, event_id, ticket_type_id, signature = parts
+    message = '.'.join(parts[:5])
+    if not constant_time_compare(signature, _signature(key_id, message)):
+        raise InvalidTicketSignature("Signature does not match")
+
+    try:
+        return TicketClaims(ticket_number, int(event_id), int(ticket_type_id), key_id)
+    except ValueError:
+        raise InvalidTicketSignature("Malformed ticket payload")
+
+
+def parse_legacy_payload(payload):
+    """Ticket number from an unsigned 'TICKETHUB-<number>' payload, or None"""
+    payload = payload.strip()
+    if payload.startswith(LEGACY_PREFIX):
+        return payload[len(LEGACY_PREFIX):]
+    return None
+
+
+def qr_access_token(ticket_number, key_id=None):
+    """Token authorizing a download of the ticket's QR image"""
+    key_id = key_id or current_key_id()
+    return f'{key_id}.{_signature(key_id, f"qr.{ticket_number}")}'
+
+
+def check_qr_access_token(ticket_number, token):
+    key_id, _, _ = (token or '').partition('.')
+    try:
+        return constant_time_compare(token, qr_access_token(ticket_number, key_id))
+    except InvalidTicketSignature:
+        return False
@@ -0,0 +1,12 @@
+"""Order totals for the platform stats snapshot (see events.stats)"""
+from django.db.models import Sum
+
+from events import stats
+from .models import Order
+
+
+def gross_revenue():
+    return Order.objects.filter(status='paid').aggregate(total=Sum('total_amount'))['total'] or 0
+
+
+stats.register('gross_revenue', gross_revenue)
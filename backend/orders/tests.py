@@ -1,3 +1,1569 @@
-from django.test import TestCase
+import csv
+import math
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from events.inventory import InsufficientInventory, reserve_tickets
+from events.models import PlatformStats, TicketType
+from events.tests import make_event, make_organizer
+from events.viewcounts import ViewCountBuffer
+from users.models import User
+from .analytics import rebuild_rollups, sales_report
+from .callbacks import process_callbacks
+from .exports import COLUMNS, stream_attendees
+from .holds import expire_holds
+from .inbox import drain, enqueue_callback, inbox_metrics, process_batch
+from .manifest import read_manifest, stream_manifest
+from .models import (
+    EventRollup,
+    Order,
+    OrderItem,
+    OrderNumberNode,
+    Payment,
+    PaymentCallback,
+    PaymentInboxEntry,
+    PaymentProof,
+    SalesRollup,
+    Ticket,
+)
+from .notifications import CACHE_KEY, order_status
+from .numbering import NodeIdsExhausted, NodeLease, TimeOrderedGenerator, get_order_number_generator, is_valid_order_number
+from .proofs import approve_proofs, reject_proofs
+from .reconciliation import reconcile_statement
+from .qr import QRCodeCache, qr_cache, qr_payload
+from .signing import (
+    InvalidTicketSignature,
+    check_qr_access_token,
+    qr_access_token,
+    sign_ticket,
+    verify_ticket,
+)
+from .transitions import cancel_orders, mark_orders_paid
+
+TEST_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+
+def make_customer(email='customer@example.com'):
+    return User.objects.create_user(
+        email=email,
+        username=email.split('@')[0],
+        password='pass12345',
+    )
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class OrderCreateTests(TestCase):
+    def setUp(self):
+        self.event = make_event(make_organizer())
+        self.ticket_type = TicketType.objects.create(
+            event=self.event, name='Regular', price=1000, quantity=3
+        )
+        self.customer = make_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def order_payload(self, quantity):
+        return {
+            'event_id': self.event.id,
+            'email': self.customer.email,
+            'phone_number': '0712345678',
+            'payment_method': 'mpesa',
+            'items': [{'ticket_type_id': self.ticket_type.id, 'quantity': quantity}],
+        }
+
+    def test_create_order_reserves_stock_and_issues_tickets(self):
+        response = self.client.post('/api/orders/create/', self.order_payload(2), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.ticket_type.refresh_from_db()
+        self.assertEqual(self.ticket_type.quantity_sold, 2)
+        order = Order.objects.get(order_number=response.data['order_number'])
+        self.assertEqual(order.total_amount, 2000)
+        self.assertEqual(Ticket.objects.filter(order_item__order=order).count(), 2)
+
+    def test_create_order_rejects_when_stock_runs_out(self):
+        self.client.post('/api/orders/create/', self.order_payload(2), format='json')
+        response = self.client.post('/api/orders/create/', self.order_payload(2), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.ticket_type.refresh_from_db()
+        self.assertEqual(self.ticket_type.quantity_sold, 2)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class ExpireHoldsTests(TestCase):
+    def setUp(self):
+        self.event = make_event(make_organizer(), hold_ttl_minutes=10)
+        self.ticket_type = TicketType.objects.create(
+            event=self.event, name='Regular', price=1000, quantity=10
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(make_customer())
+
+    def place_order(self, quantity=2):
+        response = self.client.post('/api/orders/create/', {
+            'event_id': self.event.id,
+            'email': 'customer@example.com',
+            'phone_number': '0712345678',
+            'payment_method': 'mpesa',
+            'items': [{'ticket_type_id': self.ticket_type.id, 'quantity': quantity}],
+        }, format='json')
+        return Order.objects.get(order_number=response.data['order_number'])
+
+    def test_order_creation_records_hold_with_event_ttl(self):
+        order = self.place_order()
+
+        hold = order.holds.get()
+        self.assertEqual(hold.quantity, 2)
+        self.assertEqual(hold.status, 'active')
+        self.assertAlmostEqual(
+            (hold.expires_at - order.created_at).total_seconds(), 600, delta=5
+        )
+
+    def test_expired_pending_orders_release_stock(self):
+        order = self.place_order(3)
+        later = timezone.now() + timedelta(minutes=11)
+
+        totals = expire_holds(now=later)
+
+        self.assertEqual(totals, {'orders': 1, 'tickets': 3})
+        order.refresh_from_db()
+        self.ticket_type.refresh_from_db()
+        self.assertEqual(order.status, 'cancelled')
+        self.assertEqual(self.ticket_type.quantity_sold, 0)
+        self.assertEqual(order.holds.get().status, 'released')
+        self.assertFalse(Ticket.objects.filter(order_item__order=order, status='valid').exists())
+
+    def test_unexpired_paid_and_verifying_orders_are_kept(self):
+        fresh = self.place_order(1)
+        paid = self.place_order(1)
+        verifying = self.place_order(1)
+        Order.objects.filter(pk=paid.pk).update(status='paid')
+        PaymentProof.objects.create(
+            order=verifying, transaction_code='SAB1234XYZ',
+            phone_number='0712345678', amount=1000
+        )
+
+        expire_holds(now=fresh.created_at + timedelta(minutes=5))
+        totals = expire_holds(now=timezone.now() + timedelta(minutes=11))
+
+        self.assertEqual(totals, {'orders': 1, 'tickets': 1})
+        self.ticket_type.refresh_from_db()
+        self.assertEqual(self.ticket_type.quantity_sold, 2)
+        self.assertEqual(paid.holds.get().status, 'converted')
+        self.assertEqual(verifying.holds.get().status, 'active')
+
+    def test_orders_with_payments_under_way_are_kept(self):
+        started = self.place_order(1)
+        completed = self.place_order(1)
+        payment = Payment.objects.create(order=started, payment_method='mpesa', amount=1000)
+        Payment.objects.create(order=completed, payment_method='mpesa', amount=1000, status='completed')
+        # Started just before the hold expired
+        Payment.objects.filter(pk=payment.pk).update(updated_at=timezone.now() + timedelta(minutes=9))
+
+        totals = expire_holds(now=timezone.now() + timedelta(minutes=11))
+        self.assertEqual(totals, {'orders': 0, 'tickets': 0})
+
+        # The gateway never answered
+        totals = expire_holds(now=timezone.now() + timedelta(minutes=20))
+        self.assertEqual(totals, {'orders': 1, 'tickets': 1})
+        self.assertEqual(completed.holds.get().status, 'active')
+
+    def test_cancelled_orders_release_stock_immediately(self):
+        order = self.place_order(2)
+        Order.objects.filter(pk=order.pk).update(status='cancelled')
+
+        totals = expire_holds()
+
+        self.assertEqual(totals, {'orders': 0, 'tickets': 2})
+        self.ticket_type.refresh_from_db()
+        self.assertEqual(self.ticket_type.quantity_sold, 0)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class BulkIssueTests(TestCase):
+    def setUp(self):
+        event = make_event(make_organizer())
+        ticket_type = TicketType.objects.create(event=event, name='Regular', price=100, quantity=500)
+        order = Order.objects.create(
+            user=make_customer(), event=event, total_amount=0,
+            email='customer@example.com', phone_number='0712345678'
+        )
+        self.order_item = OrderItem.objects.create(
+            order=order, ticket_type=ticket_type, quantity=100, price=100
+        )
+
+    def test_issue_inserts_tickets_in_batches(self):
+        # One INSERT, unless the backend caps parameters per statement (SQLite)
+        fields = [field for field in Ticket._meta.concrete_fields if not field.primary_key]
+        per_insert = min(500, connection.ops.bulk_batch_size(fields, [None] * 100))
+        with self.assertNumQueries(math.ceil(100 / per_insert)):
+            tickets = self.order_item.issue_tickets(attendee_email='customer@example.com')
+
+        self.assertEqual(len(tickets), 100)
+        self.assertEqual(len({ticket.ticket_number for ticket in tickets}), 100)
+        self.assertFalse(self.order_item.tickets.exclude(qr_code='').exists())
+
+
+class TicketQRCodeTests(TestCase):
+    def setUp(self):
+        event = make_event(make_organizer())
+        ticket_type = TicketType.objects.create(event=event, name='Regular', price=100, quantity=5)
+        order = Order.objects.create(
+            user=make_customer(), event=event, total_amount=100,
+            email='customer@example.com', phone_number='0712345678'
+        )
+        order_item = OrderItem.objects.create(order=order, ticket_type=ticket_type, quantity=1, price=100)
+        self.ticket = order_item.issue_tickets()[0]
+        self.url = f'/api/orders/tickets/{self.ticket.ticket_number}/qr'
+        self.query = '?token=' + qr_access_token(self.ticket.ticket_number)
+        qr_cache.clear()
+
+    def test_renders_png_and_svg(self):
+        png = self.client.get(self.url + '.png' + self.query)
+        svg = self.client.get(self.url + '.svg' + self.query)
+
+        self.assertEqual(png.status_code, 200)
+        self.assertEqual(png['Content-Type'], 'image/png')
+        self.assertTrue(png.content.startswith(b'\x89PNG'))
+        self.assertIn('max-age=86400', png['Cache-Control'])
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', svg.content)
+
+    def test_repeat_requests_hit_cache_and_validators(self):
+        first = self.client.get(self.url + '.png' + self.query)
+        with patch('orders.qr.render_qr') as render:
+            cached = self.client.get(self.url + '.png' + self.query)
+            not_modified = self.client.get(self.url + '.png' + self.query, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        render.assert_not_called()
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_unknown_ticket_or_format(self):
+        query = '?token=' + qr_access_token('NOPE')
+        self.assertEqual(self.client.get('/api/orders/tickets/NOPE/qr.png' + query).status_code, 404)
+        self.assertEqual(self.client.get(self.url + '.gif' + self.query).status_code, 404)
+
+    def test_requires_access_token(self):
+        self.assertEqual(self.client.get(self.url + '.png').status_code, 404)
+        self.assertEqual(self.client.get(self.url + '.png?token=k1.forged').status_code, 404)
+
+    def test_encodes_signed_payload(self):
+        payload = qr_payload(
+            self.ticket.ticket_number, self.ticket.order_item.order.event_id, self.ticket.order_item.ticket_type_id
+        )
+        with patch('orders.qr.render_qr', return_value=b'png') as render:
+            self.client.get(self.url + '.png' + self.query)
+
+        render.assert_called_once_with(payload, 'png')
+        self.assertEqual(verify_ticket(payload).ticket_number, self.ticket.ticket_number)
+
+    def test_serializer_points_at_renderer(self):
+        api = APIClient()
+        api.force_authenticate(self.ticket.order_item.order.user)
+
+        data = api.get(f'/api/orders/tickets/{self.ticket.ticket_number}/').data
+
+        self.assertTrue(data['qr_code'].endswith(self.url + '.png' + self.query))
+
+
+@override_settings(TICKET_SIGNING_KEYS={'k1': 'old-secret'}, TICKET_SIGNING_KEY_ID='k1')
+class TicketSigningTests(TestCase):
+    def test_round_trip(self):
+        claims = verify_ticket(sign_ticket('ABC-123', 7, 9))
+
+        self.assertEqual(claims, ('ABC-123', 7, 9, 'k1'))
+
+    def test_rejects_tampering_and_foreign_formats(self):
+        payload = sign_ticket('ABC-123', 7, 9)
+        for forged in (
+            payload.replace('.7.', '.8.'),
+            payload.replace('ABC-123', 'ABC-124'),
+            payload[:-2] + ('AA' if payload[-2:] != 'AA' else 'BB'),
+            payload.replace('.k1.', '.k9.'),
+            'TICKETHUB-ABC-123',
+            'garbage',
+        ):
+            with self.assertRaises(InvalidTicketSignature):
+                verify_ticket(forged)
+
+    def test_key_rotation(self):
+        old = sign_ticket('ABC-123', 7, 9)
+
+        with override_settings(TICKET_SIGNING_KEYS={'k2': 'new-secret', 'k1': 'old-secret'}, TICKET_SIGNING_KEY_ID='k2'):
+            new = sign_ticket('ABC-123', 7, 9)
+            self.assertEqual(verify_ticket(old).key_id, 'k1')
+            self.assertEqual(verify_ticket(new).key_id, 'k2')
+
+        with override_settings(TICKET_SIGNING_KEYS={'k2': 'new-secret'}, TICKET_SIGNING_KEY_ID='k2'):
+            with self.assertRaises(InvalidTicketSignature):
+                verify_ticket(old)
+
+    def test_qr_access_token(self):
+        token = qr_access_token('ABC-123')
+
+        self.assertTrue(check_qr_access_token('ABC-123', token))
+        self.assertFalse(check_qr_access_token('ABC-124', token))
+        self.assertFalse(check_qr_access_token('ABC-123', None))
+
+
+class TicketVerifyTests(TestCase):
+    def setUp(self):
+        token = RefreshToken.for_user(make_organizer()).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def verify(self, data):
+        return self.client.post('/api/orders/tickets/verify/', data, format='json')
+
+    def test_verifies_without_queries(self):
+        with self.assertNumQueries(0):
+            response = self.verify({'payload': sign_ticket('ABC-123', 7, 9), 'event_id': 7})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['ticket_number'], 'ABC-123')
+        self.assertTrue(response.data['valid'])
+
+    def test_rejects_forged_or_other_event(self):
+        self.assertEqual(self.verify({'payload': 'TICKETHUB-ABC-123'}).status_code, 400)
+
+        response = self.verify({'payload': sign_ticket('ABC-123', 7, 9), 'event_id': 8})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['valid'])
+
+    def test_requires_authentication(self):
+        self.client.credentials()
+        self.assertEqual(self.verify({'payload': sign_ticket('ABC-123', 7, 9)}).status_code, 401)
+
+
+class QRCodeCacheTests(TestCase):
+    def test_evicts_least_recently_used_past_byte_budget(self):
+        cache = QRCodeCache(max_bytes=10)
+        cache.set('a', b'1234')
+        cache.set('b', b'1234')
+        cache.get('a')
+        cache.set('c', b'1234')
+
+        self.assertEqual(cache.get('a'), b'1234')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.size, 8)
+
+    def test_skips_entries_larger_than_budget(self):
+        cache = QRCodeCache(max_bytes=3)
+        cache.set('a', b'1234')
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.size, 0)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class RenderTicketQRCommandTests(TestCase):
+    def setUp(self):
+        self.event = make_event(make_organizer(), title='Gate Test')
+        ticket_type = TicketType.objects.create(event=self.event, name='Regular', price=100, quantity=50)
+        order = Order.objects.create(
+            user=make_customer(), event=self.event, total_amount=500,
+            email='customer@example.com', phone_number='0712345678'
+        )
+        order_item = OrderItem.objects.create(order=order, ticket_type=ticket_type, quantity=5, price=100)
+        self.tickets = order_item.issue_tickets()
+
+    def test_renders_missing_images_and_resumes(self):
+        self.tickets[0].generate_qr_code()
+        self.tickets[0].save()
+        out = StringIO()
+
+        call_command('render_ticket_qr', event=self.event.slug, workers=2, chunk_size=2, stdout=out)
+
+        self.assertIn('Rendering 4 QR codes', out.getvalue())
+        self.assertFalse(Ticket.objects.filter(qr_code='').exists())
+
+        call_command('render_ticket_qr', event=self.event.slug, workers=2, stdout=out)
+        self.assertIn('Nothing to render', out.getvalue())
+
+
+class OrderNumberTests(TestCase):
+    def test_numbers_are_unique_sorted_and_checksummed(self):
+        generator = TimeOrderedGenerator(node_id=3)
+        numbers = [generator() for _ in range(5000)]
+
+        self.assertEqual(len(set(numbers)), 5000)
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertTrue(all(len(number) == 16 for number in numbers))
+        self.assertTrue(all(is_valid_order_number(number) for number in numbers))
+
+    def test_nodes_never_collide(self):
+        first, second = TimeOrderedGenerator(node_id=1), TimeOrderedGenerator(node_id=2)
+
+        numbers = {first() for _ in range(1000)} | {second() for _ in range(1000)}
+
+        self.assertEqual(len(numbers), 2000)
+
+    def test_checksum_catches_typos(self):
+        number = TimeOrderedGenerator(node_id=1)()
+        typo = number[:5] + ('1' if number[5] != '1' else '2') + number[6:]
+        swapped = number[:5] + number[6] + number[5] + number[7:]
+
+        self.assertFalse(is_valid_order_number(typo))
+        if number[5] != number[6]:
+            self.assertFalse(is_valid_order_number(swapped))
+
+    def test_order_creation_needs_no_lookup(self):
+        event = make_event(make_organizer())
+        user = make_customer()
+        # Lease this process's node id
+        with self.captureOnCommitCallbacks(execute=True):
+            get_order_number_generator()()
+
+        with self.assertNumQueries(1):
+            order = Order.objects.create(
+                user=user, event=event, total_amount=0,
+                email=user.email, phone_number='0712345678'
+            )
+
+        self.assertTrue(is_valid_order_number(order.order_number))
+
+    def test_processes_lease_distinct_node_ids(self):
+        first, second = NodeLease(), NodeLease()
+        node_id = first.get()
+
+        self.assertNotEqual(second.get(), node_id)
+        self.assertEqual(first.get(), node_id)
+        self.assertEqual(
+            OrderNumberNode.objects.filter(leased_until__isnull=False).count(), 2
+        )
+
+        first.release()
+        self.assertEqual(NodeLease().get(), node_id)
+
+    def test_rolled_back_lease_is_replaced(self):
+        lease = NodeLease()
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                node_id = lease.get()
+                raise DatabaseError
+
+        # Another process takes the id the rolled back lease had claimed
+        self.assertEqual(NodeLease().get(), node_id)
+        self.assertNotEqual(lease.get(), node_id)
+
+    def test_expired_lease_is_replaced(self):
+        lease = NodeLease()
+        with self.captureOnCommitCallbacks(execute=True):
+            node_id = lease.get()
+        lease.expires = timezone.now() - timedelta(seconds=1)
+        OrderNumberNode.objects.filter(node_id=node_id).update(leased_until=lease.expires)
+        OrderNumberNode.objects.exclude(node_id=node_id).update(
+            owner='elsewhere', leased_until=timezone.now() + timedelta(hours=1)
+        )
+
+        self.assertEqual(NodeLease().get(), node_id)
+        # The previous holder must not go on using it
+        with self.assertRaises(NodeIdsExhausted):
+            lease.get()
+
+    def test_rolled_back_lease_keeps_committed_expiry(self):
+        lease = NodeLease()
+        with self.captureOnCommitCallbacks(execute=True):
+            node_id = lease.get()
+        # Due for renewal
+        lease.expires = timezone.now()
+        OrderNumberNode.objects.filter(node_id=node_id).update(leased_until=timezone.now() + timedelta(seconds=1))
+        expires = lease.expires
+
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                self.assertEqual(lease.get(), node_id)
+                raise DatabaseError
+
+        self.assertEqual(lease.expires, expires)
+
+    def test_checkout_lease_outlives_failed_checkout(self):
+        event = make_event(make_organizer())
+        ticket_type = TicketType.objects.create(event=event, name='Regular', price=100, quantity=1)
+        user = make_customer()
+        client = APIClient()
+        client.force_authenticate(user)
+        generator = TimeOrderedGenerator()
+        # Sold out between validation and the reservation
+        sold_out = InsufficientInventory(ticket_type, 1)
+
+        with patch('orders.serializers.get_order_number_generator', return_value=generator), \
+                patch('orders.serializers.reserve_tickets', side_effect=sold_out):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post('/api/orders/create/', {
+                    'event_id': event.id, 'email': user.email, 'phone_number': '0712345678',
+                    'payment_method': 'mpesa', 'items': [{'ticket_type_id': ticket_type.id, 'quantity': 1}],
+                }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        node_id = generator._lease.node_id
+        self.assertIsNotNone(node_id)
+        self.assertTrue(OrderNumberNode.objects.filter(node_id=node_id, leased_until__gt=timezone.now()).exists())
+
+    @override_settings(ORDER_NUMBER_GENERATOR='orders.numbering.RandomDigitsGenerator')
+    def test_generator_is_pluggable(self):
+        order_number = Order(user=make_customer()).generate_order_number()
+
+        self.assertRegex(order_number, r'^TH\d{8}$')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.customer = make_customer()
+        event = make_event(make_organizer())
+        ticket_type = TicketType.objects.create(event=event, name='Regular', price=100, quantity=500)
+        for _ in range(15):
+            order = Order.objects.create(
+                user=self.customer, event=event, total_amount=200, status='paid',
+                email=self.customer.email, phone_number='0712345678'
+            )
+            OrderItem.objects.create(order=order, ticket_type=ticket_type, quantity=2, price=100).issue_tickets()
+        # Identical timestamps leave the id as the only tie-breaker
+        created = timezone.now()
+        Order.objects.update(created_at=created)
+        Ticket.objects.update(created_at=created)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def walk(self, url, key):
+        values = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            values += [row[key] for row in response.data['results']]
+            url = response.data['next']
+        return values
+
+    def test_orders(self):
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('order_number', flat=True))
+        self.assertEqual(self.walk('/api/orders/?pagination=cursor', 'order_number'), expected)
+
+    def test_tickets(self):
+        expected = list(Ticket.objects.order_by('-created_at', '-id').values_list('ticket_number', flat=True))
+        self.assertEqual(len(expected), 30)
+        self.assertEqual(self.walk('/api/orders/tickets/?pagination=cursor', 'ticket_number'), expected)
+
+
+class ConditionalOrderDetailTests(TestCase):
+    def setUp(self):
+        self.customer = make_customer()
+        self.order = Order.objects.create(
+            user=self.customer, event=make_event(make_organizer()), total_amount=100,
+            email=self.customer.email, phone_number='0712345678'
+        )
+        self.url = f'/api/orders/{self.order.order_number}/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def test_polling_is_not_modified_until_the_order_changes(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.order.status = 'paid'
+        self.order.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'paid')
+
+    def test_other_sales_leave_the_order_unchanged(self):
+        ticket_type = TicketType.objects.create(event=self.order.event, name='Regular', price=100, quantity=10)
+        item = OrderItem.objects.create(order=self.order, ticket_type=ticket_type, quantity=1, price=100)
+        item.issue_tickets()
+        etag = self.client.get(self.url)['ETag']
+
+        reserve_tickets([(ticket_type, 2)])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Ticket.objects.filter(order_item=item).update(status='cancelled', updated_at=timezone.now())
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_ticket_type_and_organizer_edits_change_the_etag(self):
+        ticket_type = TicketType.objects.create(event=self.order.event, name='Regular', price=100, quantity=10)
+        OrderItem.objects.create(order=self.order, ticket_type=ticket_type, quantity=1, price=100)
+        etag = self.client.get(self.url)['ETag']
+
+        ticket_type.name = 'Early Bird'
+        ticket_type.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['items'][0]['ticket_type']['name'], 'Early Bird')
+
+        organizer = self.order.event.organizer
+        organizer.first_name = 'Renamed'
+        organizer.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Renamed', response.data['event']['organizer_name'])
+
+    def test_other_users_order_is_not_found(self):
+        self.client.force_authenticate(make_customer('other@example.com'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class PaymentCallbackTests(TestCase):
+    def setUp(self):
+        event = make_event(make_organizer())
+        ticket_type = TicketType.objects.create(event=event, name='Regular', price=100, quantity=5)
+        self.order = Order.objects.create(
+            user=make_customer(), event=event, total_amount=200, payment_method='mpesa',
+            email='customer@example.com', phone_number='0712345678'
+        )
+        OrderItem.objects.create(order=self.order, ticket_type=ticket_type, quantity=2, price=100).issue_tickets()
+        self.client = APIClient()
+
+    def callback(self, transaction_id, callback_status, order_number=None):
+        return self.client.post('/api/orders/payment/callback/', {
+            'transaction_id': transaction_id,
+            'order_number': order_number or self.order.order_number,
+            'status': callback_status,
+        }, format='json')
+
+    def test_success_then_retries_are_no_ops(self):
+        response = self.callback('TX1', 'success')
+
+        self.assertEqual(response.data['outcome'], 'applied')
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.transaction_id), ('paid', 'TX1'))
+        self.assertEqual(self.order.payment.status, 'completed')
+
+        # One indexed lookup, no writes
+        with self.assertNumQueries(1):
+            response = self.callback('TX1', 'success')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['duplicate'])
+        self.assertEqual(PaymentCallback.objects.count(), 1)
+
+    def test_late_failure_cannot_undo_payment(self):
+        self.callback('TX1', 'success')
+
+        response = self.callback('TX0', 'failed')
+
+        self.assertEqual(response.data['outcome'], 'ignored')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'paid')
+        self.assertEqual(self.order.payment.status, 'completed')
+        self.assertFalse(self.order.items.get().tickets.filter(status='cancelled').exists())
+
+    def test_failure_cancels_pending_order(self):
+        self.assertEqual(self.callback('TX1', 'failed').data['outcome'], 'applied')
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'cancelled')
+        self.assertEqual(self.order.items.get().tickets.exclude(status='cancelled').count(), 0)
+        # Cancelled is final, but money taken afterwards is flagged for a refund
+        self.assertEqual(self.callback('TX2', 'success').data['outcome'], 'paid_after_cancel')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'cancelled')
+        self.assertEqual(self.order.payment.status, 'completed')
+        self.assertTrue(PaymentCallback.objects.filter(transaction_id='TX2', outcome='paid_after_cancel').exists())
+
+    def test_unknown_order_and_invalid_payload(self):
+        self.assertEqual(self.callback('TX9', 'success', order_number='NOPE').status_code, 404)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.callback('TX9', 'success', order_number='NOPE').status_code, 404)
+
+        response = self.client.post('/api/orders/payment/callback/', {'status': 'success'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PAYMENT_CALLBACK_MODE='queued')
+class PaymentInboxTests(TestCase):
+    def setUp(self):
+        self.event = make_event(make_organizer())
+        self.ticket_type = TicketType.objects.create(event=self.event, name='Regular', price=100, quantity=50)
+        self.customer = make_customer()
+        self.client = APIClient()
+
+    def make_order(self):
+        order = Order.objects.create(
+            user=self.customer, event=self.event, total_amount=100, payment_method='mpesa',
+            email=self.customer.email, phone_number='0712345678'
+        )
+        OrderItem.objects.create(order=order, ticket_type=self.ticket_type, quantity=1, price=100).issue_tickets()
+        return order
+
+    def callback(self, transaction_id, order, callback_status='success'):
+        return self.client.post('/api/orders/payment/callback/', {
+            'transaction_id': transaction_id, 'order_number': order.order_number, 'status': callback_status,
+        }, format='json')
+
+    def test_queued_callbacks_are_applied_by_the_worker(self):
+        order = self.make_order()
+        response = self.callback('TX1', order)
+
+        self.assertEqual(response.status_code, 202)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'pending')
+        self.assertEqual(inbox_metrics()['depth'], 1)
+
+        out = StringIO()
+        call_command('process_payment_inbox', stdout=out)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'paid')
+        self.assertEqual(PaymentInboxEntry.objects.get().outcome, 'applied')
+        self.assertIn('Processed 1 callbacks', out.getvalue())
+        self.assertEqual(inbox_metrics(), {'depth': 0, 'lag_seconds': 0.0, 'failed': 0})
+
+    def test_batch_applies_in_arrival_order(self):
+        paid, failed = self.make_order(), self.make_order()
+        for transaction_id, order, callback_status in [
+            ('TX1', paid, 'success'),
+            ('TX1', paid, 'success'),
+            ('TX0', paid, 'failed'),
+            ('TX2', failed, 'failed'),
+            ('TX3', failed, 'success'),
+        ]:
+            enqueue_callback(transaction_id, order.order_number, callback_status)
+
+        drain()
+
+        paid.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual((paid.status, paid.payment.status), ('paid', 'completed'))
+        self.assertEqual(failed.status, 'cancelled')
+        self.assertEqual(
+            list(PaymentInboxEntry.objects.values_list('outcome', flat=True)),
+            ['applied', 'applied', 'ignored', 'applied', 'paid_after_cancel']
+        )
+        self.assertEqual(PaymentCallback.objects.count(), 4)
+
+    def test_batch_queries_do_not_grow_with_batch_size(self):
+        def queries_for(count):
+            for index in range(count):
+                enqueue_callback(f'TX{count}-{index}', self.make_order().order_number, 'success')
+            with CaptureQueriesContext(connection) as queries:
+                process_batch()
+            return len(queries)
+
+        self.assertEqual(queries_for(2), queries_for(10))
+
+    def test_failing_callback_does_not_block_the_batch(self):
+        good, bad = self.make_order(), self.make_order()
+        enqueue_callback('TX1', good.order_number, 'success')
+        enqueue_callback('BAD', bad.order_number, 'success')
+
+        def fail_on_bad(callbacks):
+            if any(callback.transaction_id == 'BAD' for callback in callbacks):
+                raise ValueError("gateway payload")
+            return process_callbacks(callbacks)
+
+        with patch('orders.inbox.process_callbacks', side_effect=fail_on_bad):
+            totals = drain()
+            self.assertEqual((totals['processed'], totals['failed']), (1, 1))
+            with override_settings(PAYMENT_INBOX_MAX_ATTEMPTS=2):
+                drain()
+
+        entry = PaymentInboxEntry.objects.get(transaction_id='BAD')
+        self.assertEqual((entry.processed_at, entry.attempts), (None, 2))
+        self.assertIn('ValueError', entry.last_error)
+        with override_settings(PAYMENT_INBOX_MAX_ATTEMPTS=2):
+            self.assertEqual(inbox_metrics()['failed'], 1)
+        good.refresh_from_db()
+        self.assertEqual(good.status, 'paid')
+
+    def test_metrics_endpoint_is_staff_only(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/orders/payment/inbox/').status_code, 403)
+
+        self.customer.is_staff = True
+        self.customer.save()
+        enqueue_callback('TX1', 'ANY', 'success')
+        response = self.client.get('/api/orders/payment/inbox/')
+        self.assertEqual(response.data['depth'], 1)
+        self.assertGreaterEqual(response.data['lag_seconds'], 0)
+
+
+class PaymentProofApprovalTests(TestCase):
+    def setUp(self):
+        self.event = make_event(make_organizer())
+        self.ticket_type = TicketType.objects.create(event=self.event, name='Regular', price=100, quantity=50)
+        self.customer = make_customer()
+        self.staff = User.objects.create_superuser(email='finance@example.com', username='finance', password='pass12345')
+
+    def make_proofs(self, count, order_status='pending'):
+        proofs = []
+        for _ in range(count):
+            order = Order.objects.create(
+                user=self.customer, event=self.event, total_amount=100, status=order_status,
+                email=self.customer.email, phone_number='0712345678'
+            )
+            proofs.append(PaymentProof.objects.create(
+                order=order, transaction_code=f'SAB{PaymentProof.objects.count():07d}',
+                phone_number='0712345678', amount=100
+            ))
+        return proofs
+
+    def test_approves_in_constant_queries(self):
+        def queries_for(count):
+            ids = [proof.pk for proof in self.make_proofs(count)]
+            with CaptureQueriesContext(connection) as queries:
+                counts = approve_proofs(ids, verified_by=self.staff)
+            self.assertEqual(counts, {'approved': count, 'orders_paid': count, 'skipped': 0, 'paid_after_cancel': 0})
+            return len(queries)
+
+        self.assertEqual(queries_for(2), queries_for(20))
+        self.assertFalse(Order.objects.exclude(status='paid').exists())
+        order = PaymentProof.objects.select_related('order').first().order
+        self.assertEqual(order.transaction_id, order.payment_proofs.get().transaction_code)
+
+    def test_approves_in_batches(self):
+        proofs = self.make_proofs(5)
+        ids = [proof.pk for proof in proofs] + [999999]
+
+        with patch('orders.proofs.mark_orders_paid', wraps=mark_orders_paid) as marked:
+            counts = approve_proofs(ids, batch_size=2)
+
+        self.assertEqual(counts, {'approved': 5, 'orders_paid': 5, 'skipped': 1, 'paid_after_cancel': 0})
+        self.assertEqual(marked.call_count, 3)
+        self.assertFalse(Order.objects.exclude(status='paid').exists())
+
+        counts = reject_proofs(ids, batch_size=2)
+        self.assertEqual(counts, {'rejected': 0, 'skipped': 6})
+
+    def test_counts_skipped_and_keeps_cancelled_orders(self):
+        pending, done = self.make_proofs(2)
+        cancelled, = self.make_proofs(1, order_status='cancelled')
+        PaymentProof.objects.filter(pk=done.pk).update(status='rejected')
+
+        counts = approve_proofs([pending.pk, done.pk, cancelled.pk, 999999])
+
+        self.assertEqual(counts, {'approved': 2, 'orders_paid': 1, 'skipped': 2, 'paid_after_cancel': 1})
+        cancelled.order.refresh_from_db()
+        self.assertEqual(cancelled.order.status, 'cancelled')
+
+    def test_admin_action(self):
+        proofs = self.make_proofs(3)
+        self.client.force_login(self.staff)
+
+        response = self.client.post('/admin/orders/paymentproof/', {
+            'action': 'approve_payments', '_selected_action': [proof.pk for proof in proofs],
+        }, follow=True)
+
+        self.assertContains(response, '3 payments approved, 3 orders marked paid')
+        self.assertEqual(PaymentProof.objects.filter(status='approved', verified_by=self.staff).count(), 3)
+
+    def test_api_and_command(self):
+        first, second, third = self.make_proofs(3)
+        api = APIClient()
+        api.force_authenticate(self.customer)
+        self.assertEqual(api.post('/api/orders/payment-proofs/approve/', {'ids': [first.pk]}, format='json').status_code, 403)
+
+        api.force_authenticate(self.staff)
+        response = api.post('/api/orders/payment-proofs/approve/', {'ids': [first.pk]}, format='json')
+        self.assertEqual(response.data, {'approved': 1, 'orders_paid': 1, 'skipped': 0, 'paid_after_cancel': 0})
+        response = api.post(
+            '/api/orders/payment-proofs/reject/', {'ids': [first.pk, second.pk], 'reason': 'No such M-Pesa code'},
+            format='json'
+        )
+        self.assertEqual(response.data, {'rejected': 1, 'skipped': 1})
+        response = api.post('/api/orders/payment-proofs/approve/', {'ids': list(range(1, 2002))}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        out = StringIO()
+        call_command('approve_payment_proofs', '--all-pending', verified_by=self.staff.email, stdout=out)
+        self.assertIn('Approved 1 payment proofs, marked 1 orders paid', out.getvalue())
+        third.refresh_from_db()
+        self.assertEqual((third.status, third.verified_by), ('approved', self.staff))
+
+
+@override_settings(PAYMENT_STATUS_POLL_INTERVAL=0.05)
+class PaymentStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        event = make_event(make_organizer())
+        self.customer = make_customer()
+        self.order = Order.objects.create(
+            user=self.customer, event=event, total_amount=100,
+            email=self.customer.email, phone_number='0712345678'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.url = f'/api/orders/{self.order.order_number}/payment-status/'
+
+    def submit_proof(self):
+        return PaymentProof.objects.create(
+            order=self.order, transaction_code='SAB1234567', phone_number='0712345678', amount=100
+        )
+
+    def test_status_and_version(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['status'], 'no_proof')
+        self.assertEqual(response.data['order_status'], 'pending')
+        no_proof = response.data['version']
+
+        proof = self.submit_proof()
+        response = self.client.get(self.url)
+        self.assertEqual(
+            {key: response.data[key] for key in ('status', 'transaction_code', 'order_status')},
+            {'status': 'pending', 'transaction_code': 'SAB1234567', 'order_status': 'pending'}
+        )
+        self.assertNotEqual(response.data['version'], no_proof)
+
+        approve_proofs([proof.pk])
+        response = self.client.get(self.url, {'wait': 5, 'since': response.data['version']})
+        self.assertEqual((response.data['status'], response.data['order_status']), ('approved', 'paid'))
+
+    def test_wait_times_out_with_the_same_status(self):
+        version = self.client.get(self.url).data['version']
+        started = time.monotonic()
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'wait': 0.2, 'since': version})
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(response.data['version'], version)
+
+        for wait in ['soon', 'nan', 'inf', '-inf']:
+            with self.subTest(wait=wait):
+                response = self.client.get(self.url, {'wait': wait, 'since': version})
+                self.assertEqual(response.status_code, 400)
+        with order_status.subscribe(self.order.pk) as token, self.assertRaises(ValueError):
+            order_status.wait(self.order.pk, token, math.nan)
+        other = APIClient()
+        other.force_authenticate(make_customer('other@example.com'))
+        self.assertEqual(other.get(self.url).status_code, 404)
+
+    def test_changes_are_published_on_commit(self):
+        proof = self.submit_proof()
+        with order_status.subscribe(self.order.pk) as token:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                reject_proofs([proof.pk], reason='Unknown code')
+            self.assertIsNone(order_status.wait(self.order.pk, token, 0))
+
+            for callback in callbacks:
+                callback()
+            self.assertIsNotNone(order_status.wait(self.order.pk, token, 0))
+
+    def test_waiter_is_woken_by_publish(self):
+        with order_status.subscribe(self.order.pk) as token:
+            threading.Timer(0.05, order_status.publish, [[self.order.pk]]).start()
+            started = time.monotonic()
+            self.assertIsNotNone(order_status.wait(self.order.pk, token, 5))
+            self.assertLess(time.monotonic() - started, 1)
+        self.assertFalse(order_status._orders)
+
+    def test_waiter_sees_changes_from_other_processes(self):
+        with order_status.subscribe(self.order.pk) as token:
+            # Another process only reaches the shared cache
+            cache.set(CACHE_KEY.format(self.order.pk), 7)
+            self.assertIsNotNone(order_status.wait(self.order.pk, token, 5))
+
+
+class PaymentStatusConnectionTests(TransactionTestCase):
+    def test_waiting_request_releases_its_connection(self):
+        customer = make_customer()
+        order = Order.objects.create(
+            user=customer, event=make_event(make_organizer()), total_amount=100,
+            email=customer.email, phone_number='0712345678'
+        )
+        client = APIClient()
+        client.force_authenticate(customer)
+        url = f'/api/orders/{order.order_number}/payment-status/'
+        version = client.get(url).data['version']
+
+        with patch.object(connection, 'close', wraps=connection.close) as close:
+            response = client.get(url, {'wait': 0.1, 'since': version})
+
+        self.assertEqual(response.data['version'], version)
+        self.assertTrue(close.called)
+
+
+class StatementReconciliationTests(TestCase):
+    HEADER = 'Receipt No.,Completion Time,Details,Transaction Status,Paid In,Withdrawn,Other Party Info\n'
+
+    def setUp(self):
+        event = make_event(make_organizer())
+        customer = make_customer()
+        self.proofs = {}
+        for code, amount, phone in [
+            ('SAB0000001', 1000, '0712345678'),
+            ('SAB0000002', 1000, '0712345678'),
+            ('SAB0000003', 500, '0722000000'),
+            ('SAB0000004', 500, ''),
+            ('SAB0000005', 500, '0733000000'),
+            ('SAB0000006', 500, '0744000000'),
+        ]:
+            order = Order.objects.create(
+                user=customer, event=event, total_amount=amount,
+                email=customer.email, phone_number='0712345678'
+            )
+            self.proofs[code] = PaymentProof.objects.create(
+                order=order, transaction_code=code, phone_number=phone, amount=amount
+            )
+
+    def statement(self, rows):
+        return StringIO(self.HEADER + ''.join(
+            f'{code},2026-10-01 10:00:00,Pay Bill,{state},"{amount}",,{phone}\n'
+            for code, amount, phone, state in rows
+        ))
+
+    def test_matches_are_approved_and_mismatches_reported(self):
+        statement = self.statement([
+            ('QXX0000000', '250.00', '254700000000 - OTHER', 'Completed'),
+            ('SAB0000001', '1,000.00', '254712345678 - JANE DOE', 'Completed'),
+            ('sab0000004', '500.00', '254799999999 - ANYONE', 'Completed'),
+            ('SAB0000002', '900.00', '254712345678 - JANE DOE', 'Completed'),
+            ('SAB0000003', '500.00', '254711111111 - SOMEONE', 'Completed'),
+            ('SAB0000005', '500.00', '254733000000 - JOHN', 'Failed'),
+        ])
+        report = StringIO()
+
+        totals = reconcile_statement(statement, report=report, include_missing=True)
+
+        self.assertEqual(totals, {
+            'rows': 6, 'matched': 2, 'approved': 2, 'orders_paid': 2, 'paid_after_cancel': 0,
+            'exceptions': 3, 'missing': 1,
+        })
+        approved = set(PaymentProof.objects.filter(status='approved').values_list('transaction_code', flat=True))
+        self.assertEqual(approved, {'SAB0000001', 'SAB0000004'})
+        self.assertEqual(Order.objects.get(pk=self.proofs['SAB0000001'].order_id).status, 'paid')
+
+        rows = list(csv.DictReader(StringIO(report.getvalue())))
+        self.assertEqual(
+            [(row['transaction_code'], row['reason']) for row in rows],
+            [
+                ('SAB0000002', 'amount_mismatch'),
+                ('SAB0000003', 'phone_mismatch'),
+                ('SAB0000005', 'not_completed'),
+                ('SAB0000006', 'not_on_statement'),
+            ]
+        )
+
+    def test_later_matching_row_clears_earlier_mismatch(self):
+        statement = self.statement([
+            ('SAB0000001', '1,000.00', '254712345678 - JANE DOE', 'Failed'),
+            ('SAB0000001', '1,000.00', '254712345678 - JANE DOE', 'Completed'),
+            ('SAB0000002', '1,000.00', '254712345678 - JANE DOE', 'Completed'),
+            ('SAB0000002', '1,000.00', '254712345678 - JANE DOE', 'Completed'),
+        ])
+        report = StringIO()
+
+        totals = reconcile_statement(statement, report=report, dry_run=True)
+
+        self.assertEqual((totals['matched'], totals['exceptions'], totals['missing']), (2, 0, 4))
+        self.assertEqual(list(csv.DictReader(StringIO(report.getvalue()))), [])
+
+    def test_index_is_one_query_and_rows_are_streamed(self):
+        def rows():
+            yield self.HEADER
+            for index in range(5000):
+                yield f'QXX{index:07d},2026-10-01 10:00:00,Pay Bill,Completed,100.00,,254700000000\n'
+            yield 'SAB0000006,2026-10-01 10:00:00,Pay Bill,Completed,500.00,,254744000000\n'
+
+        with self.assertNumQueries(1):
+            totals = reconcile_statement(rows(), dry_run=True)
+
+        self.assertEqual((totals['rows'], totals['matched'], totals['approved']), (5001, 1, 0))
+
+    def test_command(self):
+        path = f'{TEST_MEDIA_ROOT}/statement.csv'
+        report_path = f'{TEST_MEDIA_ROOT}/exceptions.csv'
+        with open(path, 'w', encoding='utf-8-sig') as statement:
+            statement.write(self.statement([('SAB0000006', '500.00', '254744000000', 'Completed')]).getvalue())
+        out = StringIO()
+
+        call_command('reconcile_mpesa_statement', path, report=report_path, stdout=out)
+
+        self.assertIn('1 proofs matched, 1 approved', out.getvalue())
+        self.assertEqual(PaymentProof.objects.get(transaction_code='SAB0000006').status, 'approved')
+
+    def test_payments_for_cancelled_orders_are_counted(self):
+        Order.objects.filter(pk=self.proofs['SAB0000006'].order_id).update(status='cancelled')
+        statement = self.statement([('SAB0000006', '500.00', '254744000000', 'Completed')])
+
+        totals = reconcile_statement(statement)
+
+        self.assertEqual((totals['approved'], totals['orders_paid'], totals['paid_after_cancel']), (1, 0, 1))
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class SalesAnalyticsTests(TestCase):
+    def setUp(self):
+        self.organizer = make_organizer()
+        self.event = make_event(self.organizer, slug='analytics-event')
+        self.regular = TicketType.objects.create(event=self.event, name='Regular', price=1000, quantity=100)
+        self.vip = TicketType.objects.create(event=self.event, name='VIP', price=5000, quantity=10)
+        self.customer = make_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def place_order(self, regular=0, vip=0):
+        items = [
+            {'ticket_type_id': ticket_type.id, 'quantity': quantity}
+            for ticket_type, quantity in ((self.regular, regular), (self.vip, vip)) if quantity
+        ]
+        # New orders are rolled up once the checkout has committed
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/orders/create/', {
+                'event_id': self.event.id,
+                'email': self.customer.email,
+                'phone_number': '0712345678',
+                'payment_method': 'mpesa',
+                'items': items,
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Order.objects.get(order_number=response.data['order_number'])
+
+    def report(self, **kwargs):
+        return sales_report(self.event, **kwargs)
+
+    def test_checkout_does_not_lock_rollups(self):
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+            self.client.post('/api/orders/create/', {
+                'event_id': self.event.id,
+                'email': self.customer.email,
+                'phone_number': '0712345678',
+                'payment_method': 'mpesa',
+                'items': [{'ticket_type_id': self.regular.id, 'quantity': 2}],
+            }, format='json')
+        self.assertFalse([query for query in queries if 'rollup' in query['sql']])
+        self.assertEqual(self.report()['totals']['pending_orders'], 0)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.report()['totals']['pending_tickets'], 2)
+
+    def test_rollups_follow_order_status(self):
+        first = self.place_order(regular=2, vip=1)
+        second = self.place_order(regular=1)
+        third = self.place_order(vip=1)
+
+        totals = self.report()['totals']
+        self.assertEqual((totals['pending_tickets'], totals['pending_revenue'], totals['pending_orders']), (5, 13000, 3))
+        self.assertEqual((totals['paid_tickets'], totals['paid_orders']), (0, 0))
+
+        mark_orders_paid({first.pk: 'TXN1', second.pk: 'TXN2'})
+        mark_orders_paid({first.pk: 'TXN1'})
+        cancel_orders([third.pk])
+
+        report = self.report(period=SalesRollup.HOUR)
+        totals = report['totals']
+        self.assertEqual((totals['paid_tickets'], totals['paid_revenue'], totals['paid_orders']), (4, 8000, 2))
+        self.assertEqual((totals['pending_tickets'], totals['pending_revenue'], totals['pending_orders']), (0, 0, 0))
+        self.assertEqual(
+            [(row['name'], row['paid_tickets'], row['paid_revenue']) for row in report['ticket_types']],
+            [('Regular', 3, 3000), ('VIP', 1, 5000)]
+        )
+        self.assertEqual(len(report['series']), 1)
+        self.assertEqual(report['series'][0]['start'], timezone.localtime().replace(minute=0, second=0, microsecond=0))
+
+        # Refunds are made in the admin
+        first.refresh_from_db()
+        first.status = 'refunded'
+        first.save()
+        self.assertEqual(self.report()['totals']['paid_tickets'], 1)
+
+    def test_views_and_conversion(self):
+        order = self.place_order(regular=1)
+        mark_orders_paid({order.pk: 'TXN1'})
+        buffer = ViewCountBuffer()
+        buffer.record(self.event.pk, count=40)
+        buffer.record(999999)
+        buffer.flush()
+
+        totals = self.report()['totals']
+        self.assertEqual((totals['views'], totals['paid_orders'], totals['conversion_rate']), (40, 1, 0.025))
+        self.assertEqual(EventRollup.objects.filter(event=self.event).count(), 2)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        orders = [self.place_order(regular=1, vip=1) for _ in range(3)]
+        mark_orders_paid({orders[0].pk: 'TXN1'})
+        cancel_orders([orders[1].pk])
+        buffer = ViewCountBuffer()
+        buffer.record(self.event.pk, count=10)
+        buffer.flush()
+        expected = self.report(period=SalesRollup.HOUR)
+
+        SalesRollup.objects.all().delete()
+        EventRollup.objects.update(paid_orders=7)
+        self.assertEqual(rebuild_rollups(), 2)
+        self.assertEqual(self.report(period=SalesRollup.HOUR), expected)
+
+        out = StringIO()
+        call_command('rebuild_sales_rollups', event='analytics-event', stdout=out)
+        self.assertIn('Rolled up 2 orders', out.getvalue())
+
+    def test_report_reads_only_rollups(self):
+        for _ in range(3):
+            mark_orders_paid({self.place_order(regular=1, vip=2).pk: 'TXN'})
+        api = APIClient()
+        api.force_authenticate(self.organizer)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api.get('/api/orders/analytics/analytics-event/', {'period': 'hour'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totals']['paid_tickets'], 9)
+        self.assertFalse([q for q in queries if '"orders_order"' in q['sql'] or '"orders_orderitem"' in q['sql']])
+
+        self.assertEqual(api.get('/api/orders/analytics/analytics-event/', {'period': 'week'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/orders/analytics/analytics-event/').status_code, 403)
+
+
+class PlatformRevenueTests(TestCase):
+    def test_reconciliation_totals_paid_orders(self):
+        customer = make_customer()
+        event = make_event(make_organizer())
+        for status, amount in [('paid', 1500), ('paid', 500), ('pending', 700)]:
+            Order.objects.create(
+                user=customer, event=event, total_amount=amount, status=status,
+                email=customer.email, phone_number='0712345678'
+            )
+
+        call_command('refresh_stats', stdout=StringIO())
+        self.assertEqual(PlatformStats.objects.get().gross_revenue, 2000)
+
+
+class CheckInTests(TestCase):
+    def setUp(self):
+        self.organizer = make_organizer()
+        self.event = make_event(self.organizer, slug='concert')
+        self.ticket_type = TicketType.objects.create(event=self.event, name='Regular', price=100, quantity=50)
+        self.customer = make_customer()
+        self.order = Order.objects.create(
+            user=self.customer, event=self.event, total_amount=300, status='paid',
+            email=self.customer.email, phone_number='0712345678'
+        )
+        item = OrderItem.objects.create(order=self.order, ticket_type=self.ticket_type, quantity=3, price=100)
+        self.tickets = [ticket.ticket_number for ticket in item.issue_tickets()]
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def scan(self, ticket_number):
+        return self.client.post('/api/orders/checkin/concert/', {'ticket_number': ticket_number}, format='json')
+
+    def batch(self, scans):
+        return self.client.post('/api/orders/checkin/concert/batch/', {'scans': scans}, format='json')
+
+    def payload(self, ticket_number, event_id=None):
+        return qr_payload(ticket_number, event_id or self.event.pk, self.ticket_type.pk)
+
+    def scan_payload(self, payload):
+        return self.client.post('/api/orders/checkin/concert/', {'payload': payload}, format='json')
+
+    def test_scan_admits_once_and_reports_original_time(self):
+        response = self.scan(self.tickets[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['result'], 'admitted')
+
+        ticket = Ticket.objects.get(ticket_number=self.tickets[0])
+        self.assertEqual((ticket.status, ticket.checked_in), ('used', True))
+
+        response = self.scan(self.tickets[0])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['result'], 'duplicate')
+        self.assertEqual(response.data['checked_in_at'], ticket.checked_in_at)
+
+    def test_admission_is_one_update(self):
+        # Authentication is forced, so: event lookup and the conditional UPDATE
+        with self.assertNumQueries(2):
+            self.scan(self.tickets[0])
+
+    def test_rejections(self):
+        other_event = make_event(self.organizer, slug='other')
+        other_type = TicketType.objects.create(event=other_event, name='Regular', price=100, quantity=5)
+        other_order = Order.objects.create(
+            user=self.customer, event=other_event, total_amount=100,
+            email=self.customer.email, phone_number='0712345678'
+        )
+        other_ticket = OrderItem.objects.create(
+            order=other_order, ticket_type=other_type, quantity=1, price=100
+        ).issue_tickets()[0]
+        Ticket.objects.filter(ticket_number=self.tickets[1]).update(status='cancelled')
+
+        self.assertEqual(self.scan('UNKNOWN').status_code, 404)
+        self.assertEqual(self.scan(other_ticket.ticket_number).data['result'], 'not_found')
+        self.assertEqual(self.scan(self.tickets[1]).data['result'], 'cancelled')
+
+        self.order.status = 'pending'
+        self.order.save()
+        self.assertEqual(self.scan(self.tickets[2]).data['result'], 'not_paid')
+
+    def test_scan_signed_payload(self):
+        response = self.scan_payload(self.payload(self.tickets[0]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['ticket_number'], self.tickets[0])
+        self.assertEqual(self.scan_payload(self.payload(self.tickets[0])).data['result'], 'duplicate')
+
+    def test_forged_and_foreign_payloads_skip_ticket_lookup(self):
+        forged = self.payload(self.tickets[0]).replace(self.tickets[0], self.tickets[1])
+        # Only the event lookup runs
+        with self.assertNumQueries(1):
+            self.assertEqual(self.scan_payload(forged).data['result'], 'invalid_signature')
+        with self.assertNumQueries(1):
+            response = self.scan_payload(self.payload(self.tickets[0], event_id=self.event.pk + 1))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Ticket.objects.filter(status='used').count(), 0)
+
+    def test_unsigned_legacy_payloads(self):
+        self.assertEqual(self.scan_payload(f'TICKETHUB-{self.tickets[0]}').data['result'], 'admitted')
+
+        with override_settings(TICKET_QR_ACCEPT_UNSIGNED=False):
+            self.assertEqual(self.scan_payload(f'TICKETHUB-{self.tickets[1]}').data['result'], 'invalid_signature')
+
+    def test_scan_requires_payload_or_number(self):
+        self.assertEqual(self.client.post('/api/orders/checkin/concert/', {}, format='json').status_code, 400)
+
+    def test_only_the_organizer_can_scan(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.scan(self.tickets[0]).status_code, 403)
+
+    def test_batch_earliest_scan_wins(self):
+        now = timezone.now()
+        scans = [
+            {'ticket_number': self.tickets[0], 'scanned_at': now - timedelta(minutes=5), 'device_id': 'b'},
+            {'ticket_number': self.tickets[0], 'scanned_at': now - timedelta(minutes=9), 'device_id': 'a'},
+            {'ticket_number': self.tickets[1], 'scanned_at': now - timedelta(minutes=1), 'device_id': 'a'},
+            {'ticket_number': 'UNKNOWN', 'device_id': 'a'},
+        ]
+        response = self.batch(scans)
+
+        results = [(row['ticket_number'], row['result']) for row in response.data['results']]
+        self.assertEqual(results, [
+            (self.tickets[0], 'duplicate'),
+            (self.tickets[0], 'admitted'),
+            (self.tickets[1], 'admitted'),
+            ('UNKNOWN', 'not_found'),
+        ])
+        self.assertEqual((response.data['admitted'], response.data['duplicates']), (2, 1))
+        self.assertEqual(response.data['results'][0]['checked_in_at'], now - timedelta(minutes=9))
+        self.assertEqual(
+            Ticket.objects.get(ticket_number=self.tickets[0]).checked_in_at, now - timedelta(minutes=9)
+        )
+
+    def test_batch_backdates_a_later_online_scan(self):
+        self.scan(self.tickets[0])
+        earlier = timezone.now() - timedelta(minutes=10)
+
+        response = self.batch([{'ticket_number': self.tickets[0], 'scanned_at': earlier}])
+
+        self.assertEqual(response.data['results'][0]['result'], 'admitted')
+        self.assertEqual(Ticket.objects.get(ticket_number=self.tickets[0]).checked_in_at, earlier)
+        # Syncing the same scan again changes nothing
+        response = self.batch([{'ticket_number': self.tickets[0], 'scanned_at': earlier}])
+        self.assertEqual(response.data['results'][0]['result'], 'duplicate')
+
+    def test_batch_with_payloads(self):
+        forged = self.payload(self.tickets[1]).replace(self.tickets[1], self.tickets[2])
+        response = self.batch([
+            {'payload': self.payload(self.tickets[0])},
+            {'payload': self.payload(self.tickets[0])},
+            {'payload': forged},
+            {'ticket_number': self.tickets[2]},
+        ])
+
+        results = [row['result'] for row in response.data['results']]
+        self.assertEqual(results, ['admitted', 'duplicate', 'invalid_signature', 'admitted'])
+
+    def test_future_scan_times_are_clamped(self):
+        response = self.batch([{'ticket_number': self.tickets[0], 'scanned_at': timezone.now() + timedelta(days=1)}])
+        self.assertLessEqual(response.data['results'][0]['checked_in_at'], timezone.now())
+
+
+@override_settings(TICKET_MANIFEST_OVERLAP=0, MEDIA_ROOT=TEST_MEDIA_ROOT)
+class CheckInManifestTests(TestCase):
+    def setUp(self):
+        self.organizer = make_organizer()
+        self.event = make_event(self.organizer, slug='concert')
+        self.ticket_type = TicketType.objects.create(event=self.event, name='Regular', price=100, quantity=50)
+        self.customer = make_customer()
+        self.paid = self.make_order('paid', 3)
+        self.pending = self.make_order('pending', 2)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def make_order(self, status, quantity):
+        order = Order.objects.create(
+            user=self.customer, event=self.event, total_amount=100 * quantity, status=status,
+            email=self.customer.email, phone_number='0712345678'
+        )
+        item = OrderItem.objects.create(order=order, ticket_type=self.ticket_type, quantity=quantity, price=100)
+        order.numbers = sorted(ticket.ticket_number for ticket in item.issue_tickets())
+        return order
+
+    def export(self, base_version=None, **kwargs):
+        version, chunks = stream_manifest(self.event, base_version, **kwargs)
+        return version, read_manifest(b''.join(chunks))
+
+    def test_full_manifest_lists_admissible_tickets_sorted(self):
+        Ticket.objects.filter(ticket_number=self.paid.numbers[0]).update(status='used')
+
+        version, (header, records) = self.export()
+
+        self.assertEqual(header, {
+            'version': version, 'base_version': 0, 'event_id': self.event.pk, 'width': 12,
+        })
+        self.assertEqual(records, [(b'+', number) for number in self.paid.numbers])
+
+    def test_delta_lists_changes_since_version(self):
+        base, _ = self.export()
+        cancelled = Ticket.objects.get(ticket_number=self.paid.numbers[0])
+        cancelled.status = 'cancelled'
+        cancelled.save()
+        self.pending.status = 'paid'
+        self.pending.save()
+
+        version, (header, records) = self.export(base)
+
+        self.assertEqual(header['base_version'], base)
+        self.assertGreater(version, base)
+        self.assertEqual(
+            sorted(records),
+            sorted([(b'-', self.paid.numbers[0])] + [(b'+', number) for number in self.pending.numbers])
+        )
+        self.assertEqual(self.export(version)[1][1], [])
+
+    def test_streams_in_chunks(self):
+        _, chunks = stream_manifest(self.event, chunk_size=2)
+        chunks = list(chunks)
+
+        # Header, then two records per chunk
+        self.assertEqual([len(chunk) for chunk in chunks[1:]], [26, 13])
+
+    def test_endpoint(self):
+        response = self.client.get('/api/orders/checkin/concert/manifest/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        header, records = read_manifest(b''.join(response.streaming_content))
+        self.assertEqual(header['version'], int(response['X-Manifest-Version']))
+        self.assertEqual(len(records), 3)
+
+        self.assertEqual(self.client.get('/api/orders/checkin/concert/manifest/?since=x').status_code, 400)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/orders/checkin/concert/manifest/').status_code, 403)
+
+    def test_command_writes_file(self):
+        path = f'{TEST_MEDIA_ROOT}/manifest.bin'
+        out = StringIO()
+
+        call_command('export_checkin_manifest', event='concert', output=path, stdout=out)
+
+        with open(path, 'rb') as manifest:
+            self.assertEqual(len(read_manifest(manifest.read())[1]), 3)
+        self.assertIn('Wrote manifest version', out.getvalue())
+
+
+class CheckInLoadTestCommandTests(TransactionTestCase):
+    def test_reports_throughput(self):
+        out = StringIO()
+        call_command('loadtest_checkin', tickets=60, lanes=4, batch_size=25, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('single scans', output)
+        self.assertIn('60 admitted', output)
+        self.assertIn('60 duplicate', output)
+        self.assertFalse(User.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class AttendeeExportTests(TestCase):
+    def setUp(self):
+        self.organizer = make_organizer()
+        self.event = make_event(self.organizer, slug='festival')
+        self.ticket_type = TicketType.objects.create(event=self.event, name='Regular', price=1500, quantity=50)
+        self.customer = make_customer()
+        self.paid = self.make_order('paid', 3)
+        self.pending = self.make_order('pending', 2)
+        Ticket.objects.filter(pk=self.paid.tickets[0].pk).update(
+            attendee_name='=HYPERLINK("http://example.com")', status='used', checked_in=True,
+            checked_in_at=timezone.now()
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def make_order(self, status, quantity):
+        order = Order.objects.create(
+            user=self.customer, event=self.event, total_amount=1500 * quantity, status=status,
+            email=self.customer.email, phone_number='+254712345678'
+        )
+        item = OrderItem.objects.create(order=order, ticket_type=self.ticket_type, quantity=quantity, price=1500)
+        order.tickets = item.issue_tickets()
+        return order
+
+    def download(self, fmt, **params):
+        response = self.client.get(f'/api/orders/export/festival/attendees.{fmt}', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response, content = self.download('csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="festival-attendees.csv"')
+
+        rows = list(csv.DictReader(StringIO(content.decode())))
+        self.assertEqual(len(rows), 5)
+        used = rows[0]
+        self.assertEqual(used['Ticket number'], self.paid.tickets[0].ticket_number)
+        self.assertEqual(used['Attendee name'], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual((used['Checked in'], used['Ticket status'], used['Order status']), ('yes', 'used', 'paid'))
+        self.assertEqual((used['Buyer phone'], used['Price']), ('+254712345678', '1500.00'))
+        self.assertEqual(rows[-1]['Order status'], 'pending')
+
+        _, content = self.download('csv', order_status='pending')
+        self.assertEqual(len(content.decode().splitlines()), 3)
+
+    def test_xlsx(self):
+        response, content = self.download('xlsx')
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        namespace = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        rows = [
+            [cell.findtext('s:v', namespaces=namespace) or cell.findtext('s:is/s:t', namespaces=namespace)
+             for cell in row.findall('s:c', namespace)]
+            for row in sheet.iterfind('s:sheetData/s:row', namespace)
+        ]
+        self.assertEqual(rows[0], [title for title, _ in COLUMNS])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][0], self.paid.tickets[0].ticket_number)
+        self.assertEqual(rows[1][11], '1500.00')
+
+    def test_streams_in_chunks_before_reading_tickets(self):
+        for fmt in ('csv', 'xlsx'):
+            chunks = stream_attendees(self.event, fmt, chunk_size=2)
+            with self.assertNumQueries(0):
+                self.assertTrue(next(chunks))
+            self.assertTrue(all(chunks))
+
+        chunks = list(stream_attendees(self.event, 'csv', chunk_size=2))
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [1, 2, 2, 1])
+
+    def test_only_the_organizer_may_export(self):
+        self.assertEqual(self.client.get('/api/orders/export/festival/attendees.pdf').status_code, 404)
+        self.assertEqual(
+            self.client.get('/api/orders/export/festival/attendees.csv', {'order_status': 'lost'}).status_code, 400
+        )
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/orders/export/festival/attendees.csv').status_code, 403)
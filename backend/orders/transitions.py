@@ -0,0 +1,107 @@
+"""
+Order and payment status transitions.
+
+Statuses only move forward. Every change is a conditional UPDATE matching
+the statuses it may move from, so a replayed or out-of-order request (a
+gateway retrying a failed callback after the order was paid, two admins
+approving the same proof) changes nothing, and the caller learns from the
+row count whether it won. The orders that move are locked and read first so
+the sales rollups (see orders.analytics) are adjusted for exactly those.
+Callers that hold row locks can decide with allowed() and write in bulk
+instead.
+"""
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
+
+from .analytics import record_transitions
+from .models import Order, Ticket
+from .notifications import notify_status_changed
+
+ORDER_TRANSITIONS = {
+    'pending': {'paid', 'cancelled'},
+    'paid': {'refunded'},
+    'cancelled': set(),
+    'refunded': set(),
+}
+
+PAYMENT_TRANSITIONS = {
+    'pending': {'processing', 'completed', 'failed'},
+    'processing': {'completed', 'failed'},
+    # A failed attempt can be followed by a successful retry
+    'failed': {'processing', 'completed'},
+    'completed': {'refunded'},
+    'refunded': set(),
+}
+
+
+def sources(transitions, target):
+    """Statuses that may move to target"""
+    return [source for source, targets in transitions.items() if target in targets]
+
+
+def allowed(transitions, source, target):
+    return target in transitions.get(source, ())
+
+
+def _lock_movable(order_ids, target):
+    """{order id: status} of the orders among order_ids that may move to target, locked"""
+    return dict(
+        Order.objects.select_for_update().filter(
+            pk__in=list(order_ids),
+            status__in=sources(ORDER_TRANSITIONS, target)
+        ).order_by('pk').values_list('pk', 'status')
+    )
+
+
+def mark_orders_paid(transaction_ids, now=None):
+    """
+    Move pending orders to paid, recording each order's transaction id.
+    transaction_ids maps order id to transaction id. Returns the number of
+    orders that changed.
+    """
+    if not transaction_ids:
+        return 0
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        changes = _lock_movable(transaction_ids, 'paid')
+        if not changes:
+            return 0
+        paid = Order.objects.filter(
+            pk__in=list(changes),
+            status__in=sources(ORDER_TRANSITIONS, 'paid')
+        ).update(
+            status='paid',
+            transaction_id=Case(
+                *[When(pk=order_id, then=Value(transaction_ids[order_id])) for order_id in changes],
+                output_field=CharField()
+            ),
+            paid_at=now,
+            updated_at=now
+        )
+        record_transitions(changes, 'paid')
+    notify_status_changed(changes)
+    return paid
+
+
+def cancel_orders(order_ids, now=None):
+    """
+    Move pending orders to cancelled and cancel their tickets. Returns the
+    number of orders that changed; stock is released by expire_holds.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        changes = _lock_movable(order_ids, 'cancelled')
+        if not changes:
+            return 0
+        cancelled = Order.objects.filter(
+            pk__in=list(changes),
+            status__in=sources(ORDER_TRANSITIONS, 'cancelled')
+        ).update(status='cancelled', updated_at=now)
+        Ticket.objects.filter(
+            order_item__order_id__in=list(changes)
+        ).exclude(status='cancelled').update(status='cancelled', updated_at=now)
+        record_transitions(changes, 'cancelled')
+    notify_status_changed(changes)
+    return cancelled
@@ -5,10 +5,19 @@ from .views import (
     OrderDetailView,
     MyTicketsView,
     TicketDetailView,
+    TicketQRCodeView,
+    TicketVerifyView,
     PaymentCallbackView,
+    PaymentInboxMetricsView,
+    PaymentProofReviewView,
     InitiatePaymentView,
     SubmitPaymentProofView,
     CheckPaymentStatusView,
+    CheckInView,
+    CheckInBatchView,
+    CheckInManifestView,
+    SalesAnalyticsView,
+    AttendeeExportView,
 )
 
 urlpatterns = [
@@ -18,7 +27,22 @@ urlpatterns = [
     
     # Ticket endpoints
     path('tickets/', MyTicketsView.as_view(), name='my_tickets'),
+    path('tickets/verify/', TicketVerifyView.as_view(), name='ticket_verify'),
     path('tickets/<str:ticket_number>/', TicketDetailView.as_view(), name='ticket_detail'),
+    path('tickets/<str:ticket_number>/qr.<str:fmt>', TicketQRCodeView.as_view(), name='ticket_qr'),
+    
+    # Gate check-in (before the order number routes, which match any segment)
+    path('checkin/<slug:event_slug>/', CheckInView.as_view(), name='checkin'),
+    path('checkin/<slug:event_slug>/batch/', CheckInBatchView.as_view(), name='checkin_batch'),
+    path('checkin/<slug:event_slug>/manifest/', CheckInManifestView.as_view(), name='checkin_manifest'),
+    
+    # Organizer sales dashboard
+    path('analytics/<slug:event_slug>/', SalesAnalyticsView.as_view(), name='sales_analytics'),
+    path('export/<slug:event_slug>/attendees.<str:fmt>', AttendeeExportView.as_view(), name='attendee_export'),
+    
+    # Bulk payment proof review (staff)
+    path('payment-proofs/approve/', PaymentProofReviewView.as_view(review='approve'), name='payment_proofs_approve'),
+    path('payment-proofs/reject/', PaymentProofReviewView.as_view(review='reject'), name='payment_proofs_reject'),
     
     # Order detail and payment
     path('<str:order_number>/', OrderDetailView.as_view(), name='order_detail'),
@@ -30,4 +54,5 @@ urlpatterns = [
     
     # Payment callback
     path('payment/callback/', PaymentCallbackView.as_view(), name='payment_callback'),
+    path('payment/inbox/', PaymentInboxMetricsView.as_view(), name='payment_inbox_metrics'),
 ]
\ No newline at end of file
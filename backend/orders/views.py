@@ -1,14 +1,43 @@
+import math
+import time
+
 from rest_framework import generics, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Order, Ticket, Payment
+from django.utils.cache import patch_cache_control
+from backend.conditional import ConditionalRetrieveMixin
+from backend.pagination import OptInKeysetPagination
+from events.models import Event
+from .analytics import sales_report
+from .callbacks import process_callback
+from .inbox import enqueue_callback, inbox_metrics
+from .checkin import ADMITTED, DUPLICATE, NOT_FOUND, check_in, check_in_batch
+from .exports import FORMATS, stream_attendees
+from .manifest import stream_manifest
+from .notifications import order_status
+from .models import Order, Ticket, Payment, PaymentCallback
+from .proofs import approve_proofs, reject_proofs
+from .qr import CONTENT_TYPES, get_qr, qr_etag, qr_payload
+from .signing import InvalidTicketSignature, check_qr_access_token, verify_ticket
 from .serializers import (
     OrderSerializer,
     OrderCreateSerializer,
     TicketSerializer,
-    PaymentSerializer
+    PaymentSerializer,
+    CheckInScanSerializer,
+    CheckInBatchSerializer,
+    TicketVerifySerializer,
+    PaymentCallbackSerializer,
+    PaymentProofReviewSerializer,
+    SalesAnalyticsQuerySerializer
 )
 
 class OrderCreateView(generics.CreateAPIView):
@@ -52,6 +81,7 @@ class OrderListView(generics.ListAPIView):
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptInKeysetPagination
     
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user).select_related(
@@ -59,13 +89,30 @@ class OrderListView(generics.ListAPIView):
         ).prefetch_related('items__ticket_type')
 
 
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(ConditionalRetrieveMixin, generics.RetrieveAPIView):
     """
     API endpoint to retrieve a specific order by order number.
+    Supports conditional GET, so status polling is answered with 304 until
+    the order, its tickets or the embedded event, organizer and ticket type
+    details change. Ticket sales of other orders leave Event.updated_at and
+    TicketType.updated_at alone (see events.counters).
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'order_number'
+    validator_fields = ('pk', 'updated_at', 'event__updated_at', 'event__organizer__updated_at')
+    validator_annotations = {
+        'items_count': Count('items', distinct=True),
+        'tickets_count': Count('items__tickets'),
+        'tickets_updated_at': Max('items__tickets__updated_at'),
+        'ticket_types_updated_at': Max('items__ticket_type__updated_at'),
+    }
+    
+    def get_last_modified(self, row):
+        return max(filter(None, [
+            row['updated_at'], row['event__updated_at'], row['event__organizer__updated_at'],
+            row['tickets_updated_at'], row['ticket_types_updated_at'],
+        ]))
     
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user).select_related(
@@ -79,6 +126,7 @@ class MyTicketsView(generics.ListAPIView):
     """
     serializer_class = TicketSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptInKeysetPagination
     
     def get_queryset(self):
         return Ticket.objects.filter(
@@ -106,55 +154,138 @@ class TicketDetailView(generics.RetrieveAPIView):
         )
 
 
+class TicketQRCodeView(APIView):
+    """
+    API endpoint to render a ticket's QR code as PNG or SVG.
+    Images are rendered on first request, cached in memory and marked
+    cacheable so browsers don't fetch them again.
+    Open to anonymous requests so the image can be used directly in <img> tags,
+    but the image admits its holder, so the URL must carry the ticket's access
+    token (see TicketSerializer.qr_code).
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request, ticket_number, fmt):
+        if fmt not in CONTENT_TYPES:
+            raise Http404
+        if not check_qr_access_token(ticket_number, request.query_params.get('token')):
+            raise Http404
+        ticket = Ticket.objects.filter(ticket_number=ticket_number).values(
+            'order_item__order__event_id', 'order_item__ticket_type_id'
+        ).first()
+        if ticket is None:
+            raise Http404
+        
+        payload = qr_payload(
+            ticket_number, ticket['order_item__order__event_id'], ticket['order_item__ticket_type_id']
+        )
+        etag = qr_etag(payload, fmt)
+        
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(get_qr(payload, fmt), content_type=CONTENT_TYPES[fmt])
+        
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=86400)
+        return response
+
+
+class TicketVerifyView(APIView):
+    """
+    API endpoint for scanners to check a QR payload's signature.
+    Runs no queries: the caller's token is validated without loading the
+    user and the payload is checked against the signing keys. It says nothing
+    about whether the ticket has been used; check-in does that.
+    """
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = TicketVerifySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            claims = verify_ticket(serializer.validated_data['payload'])
+        except InvalidTicketSignature as error:
+            return Response({'valid': False, 'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        event_id = serializer.validated_data.get('event_id')
+        if event_id is not None and event_id != claims.event_id:
+            return Response(
+                {'valid': False, 'detail': "Ticket is for a different event"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({'valid': True, **claims._asdict()})
+
+
 class PaymentCallbackView(APIView):
     """
     Webhook endpoint for payment gateway callbacks.
     This handles M-Pesa, Stripe, or other payment confirmations.
+    Deliveries are idempotent per transaction and status: retries are
+    answered from the first delivery's record without further writes.
+    With PAYMENT_CALLBACK_MODE = 'queued' callbacks are only appended to
+    the inbox and applied by the process_payment_inbox worker.
     """
     permission_classes = []
     
     def post(self, request):
-        transaction_id = request.data.get('transaction_id')
-        order_number = request.data.get('order_number')
-        status_code = request.data.get('status')
+        serializer = PaymentCallbackSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
         
-        try:
-            order = Order.objects.get(order_number=order_number)
-            
-            payment, created = Payment.objects.get_or_create(
-                order=order,
-                defaults={
-                    'payment_method': order.payment_method,
-                    'amount': order.total_amount
-                }
-            )
-            
-            payment.transaction_id = transaction_id
-            payment.raw_response = request.data
-            
-            if status_code == 'success':
-                payment.status = 'completed'
-                order.status = 'paid'
-                order.transaction_id = transaction_id
-                
-                from django.utils import timezone
-                payment.completed_at = timezone.now()
-                order.paid_at = timezone.now()
-            else:
-                payment.status = 'failed'
-                order.status = 'cancelled'
-            
-            payment.save()
-            order.save()
-            
-            return Response({
-                'message': 'Payment status updated successfully'
-            }, status=status.HTTP_200_OK)
+        if getattr(settings, 'PAYMENT_CALLBACK_MODE', 'sync') == 'queued':
+            enqueue_callback(data['transaction_id'], data['order_number'], data['status'], request.data)
+            return Response({'message': 'Payment callback queued'}, status=status.HTTP_202_ACCEPTED)
         
-        except Order.DoesNotExist:
+        outcome, duplicate = process_callback(
+            data['transaction_id'], data['order_number'], data['status'], request.data
+        )
+        
+        if outcome == PaymentCallback.UNKNOWN_ORDER:
             return Response({
                 'error': 'Order not found'
             }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'message': 'Payment status updated successfully',
+            'outcome': outcome,
+            'duplicate': duplicate,
+        }, status=status.HTTP_200_OK)
+
+
+class PaymentInboxMetricsView(APIView):
+    """
+    API endpoint reporting the payment callback inbox's depth and lag,
+    for staff dashboards and alerting.
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(inbox_metrics())
+
+
+class PaymentProofReviewView(APIView):
+    """
+    API endpoint for finance staff to approve or reject many payment
+    proofs at once. Approval also marks the orders paid; the response
+    carries the counts from orders.proofs.
+    """
+    permission_classes = [IsAdminUser]
+    review = None
+    
+    def post(self, request):
+        serializer = PaymentProofReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        
+        if self.review == 'approve':
+            counts = approve_proofs(ids, verified_by=request.user)
+        else:
+            counts = reject_proofs(ids, verified_by=request.user, reason=serializer.validated_data.get('reason', ''))
+        return Response(counts)
 
 
 class InitiatePaymentView(APIView):
@@ -231,29 +362,184 @@ class SubmitPaymentProofView(APIView):
 
 
 class CheckPaymentStatusView(APIView):
-    """Check payment verification status"""
+    """
+    Check payment verification status. With ?wait=<seconds> and the version
+    of the last response as ?since=, the request is held until the order or
+    its payment proof changes, or the wait (at most PAYMENT_STATUS_MAX_WAIT)
+    runs out, and then answers with the current status. The database
+    connection is handed back while the request sleeps, so waiting requests
+    only hold a worker thread (see PAYMENT_STATUS_MAX_WAIT in settings).
+    """
     permission_classes = [IsAuthenticated]
     
-    def get(self, request, order_number):
+    def get_wait(self):
+        try:
+            wait = float(self.request.query_params.get('wait', 0))
+        except ValueError:
+            wait = math.nan
+        if not math.isfinite(wait):
+            raise ValidationError({'wait': 'A number of seconds is required.'})
+        return min(max(wait, 0), settings.PAYMENT_STATUS_MAX_WAIT)
+    
+    def get_status(self, order_number):
         from .models import PaymentProof
         
+        latest_proof = PaymentProof.objects.filter(order=OuterRef('pk')).order_by('-created_at')
+        state = Order.objects.filter(order_number=order_number, user=self.request.user).annotate(
+            proof_id=Subquery(latest_proof.values('id')[:1]),
+            proof_status=Subquery(latest_proof.values('status')[:1]),
+            transaction_code=Subquery(latest_proof.values('transaction_code')[:1]),
+            submitted_at=Subquery(latest_proof.values('created_at')[:1]),
+        ).values('id', 'status', 'proof_id', 'proof_status', 'transaction_code', 'submitted_at').first()
+        if state is None:
+            raise Http404
+        
+        data = {
+            'status': state['proof_status'] or 'no_proof',
+            'order_status': state['status'],
+            'version': f"{state['status']}.{state['proof_id'] or 0}.{state['proof_status'] or ''}",
+        }
+        if state['proof_id']:
+            data['transaction_code'] = state['transaction_code']
+            data['submitted_at'] = state['submitted_at']
+        return state['id'], data
+    
+    def release_connection(self):
+        # Waiting only reads the cache; don't keep a connection (up to
+        # CONN_MAX_AGE) open for every sleeping request. Inside a transaction
+        # (ATOMIC_REQUESTS, tests) the connection has to stay.
+        if not connection.in_atomic_block:
+            connection.close()
+    
+    def get(self, request, order_number):
+        wait = self.get_wait()
+        since = request.query_params.get('since')
         try:
-            order = Order.objects.get(order_number=order_number, user=request.user)
-        except Order.DoesNotExist:
+            order_id, data = self.get_status(order_number)
+        except Http404:
             return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not wait or data['version'] != since:
+            return Response(data)
         
-        payment_proof = order.payment_proofs.first()
-        
-        if not payment_proof:
-            return Response({'status': 'no_proof'})
+        # Subscribe before reading again so no change slips in between
+        deadline = time.monotonic() + wait
+        with order_status.subscribe(order_id) as token:
+            order_id, data = self.get_status(order_number)
+            while data['version'] == since:
+                self.release_connection()
+                token = order_status.wait(order_id, token, deadline - time.monotonic())
+                if token is None:
+                    break
+                order_id, data = self.get_status(order_number)
+        return Response(data)
+
+
+class EventCheckInMixin:
+    """Resolve the event from the URL; only its organizer or staff may scan"""
+    permission_classes = [IsAuthenticated]
+    organizer_only_message = "Only the event organizer can check tickets in"
+    
+    def get_event(self, event_slug):
+        event = get_object_or_404(Event.objects.only('id', 'organizer_id'), slug=event_slug)
+        user = self.request.user
+        if event.organizer_id != user.id and not user.is_staff:
+            raise PermissionDenied(self.organizer_only_message)
+        return event
+
+
+class CheckInView(EventCheckInMixin, APIView):
+    """
+    API endpoint for a door scanner to admit one ticket.
+    Returns 200 when admitted, 409 for a ticket that was already used
+    (with the original checked_in_at) or cannot be admitted, and 404 for
+    tickets that do not belong to the event.
+    """
+    STATUS_CODES = {
+        ADMITTED: status.HTTP_200_OK,
+        NOT_FOUND: status.HTTP_404_NOT_FOUND,
+    }
+    
+    def post(self, request, event_slug):
+        event = self.get_event(event_slug)
+        serializer = CheckInScanSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        # If approved, also check if order status is updated
-        if payment_proof.status == 'approved':
-            order.refresh_from_db()
+        result = check_in(event, serializer.validated_data)
+        return Response(result, status=self.STATUS_CODES.get(result['result'], status.HTTP_409_CONFLICT))
+
+
+class CheckInBatchView(EventCheckInMixin, APIView):
+    """
+    API endpoint for a scanner to upload scans queued while offline.
+    Returns one result per scan in the order they were sent.
+    """
+    def post(self, request, event_slug):
+        event = self.get_event(event_slug)
+        serializer = CheckInBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
+        results = check_in_batch(event, serializer.validated_data['scans'])
         return Response({
-            'status': payment_proof.status,
-            'transaction_code': payment_proof.transaction_code,
-            'submitted_at': payment_proof.created_at,
-            'order_status': order.status,
-        })
\ No newline at end of file
+            'admitted': sum(result['result'] == ADMITTED for result in results),
+            'duplicates': sum(result['result'] == DUPLICATE for result in results),
+            'results': results,
+        })
+
+
+class CheckInManifestView(EventCheckInMixin, APIView):
+    """
+    API endpoint streaming the event's check-in manifest (see
+    orders.manifest) for scanners to preload. Pass ?since=<version> with
+    the version of the manifest held to receive only the changes.
+    """
+    def get(self, request, event_slug):
+        event = self.get_event(event_slug)
+        since = request.query_params.get('since')
+        if since is not None and not since.isdigit():
+            raise ValidationError({'since': "Expected a manifest version"})
+        
+        version, chunks = stream_manifest(event, int(since) if since else None)
+        response = StreamingHttpResponse(chunks, content_type='application/octet-stream')
+        response['X-Manifest-Version'] = str(version)
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+
+
+class SalesAnalyticsView(EventCheckInMixin, APIView):
+    """
+    API endpoint for an organizer's sales dashboard: tickets, revenue and
+    orders by status with conversion from page views, in total, per ticket
+    type and per hour or day (?period=, ?since=, ?until=). Read from the
+    rollups maintained by orders.analytics, never from the orders.
+    """
+    organizer_only_message = "Only the event organizer can view its sales"
+    
+    def get(self, request, event_slug):
+        event = self.get_event(event_slug)
+        serializer = SalesAnalyticsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(sales_report(event, **serializer.validated_data))
+
+
+class AttendeeExportView(EventCheckInMixin, APIView):
+    """
+    API endpoint streaming the event's attendee list as CSV or XLSX, one row
+    per ticket (see orders.exports). ?order_status= limits it to orders in
+    that status.
+    """
+    organizer_only_message = "Only the event organizer can export its attendees"
+    
+    def get(self, request, event_slug, fmt):
+        if fmt not in FORMATS:
+            raise Http404
+        event = self.get_event(event_slug)
+        status_filter = request.query_params.get('order_status')
+        if status_filter and status_filter not in dict(Order.STATUS_CHOICES):
+            raise ValidationError({'order_status': f"Expected one of {', '.join(dict(Order.STATUS_CHOICES))}"})
+        
+        response = StreamingHttpResponse(
+            stream_attendees(event, fmt, status_filter), content_type=FORMATS[fmt]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{event_slug}-attendees.{fmt}"'
+        patch_cache_control(response, private=True, no_store=True)
+        return response
@@ -46,9 +46,6 @@ export default function PaymentProcess() {
 
       setStep(3);
       toast.success('Payment code submitted! Waiting for verification...');
-      
-      // Start polling for status
-      checkPaymentStatus();
     } catch (error) {
       console.error('Submit error:', error);
       toast.error(error.response?.data?.error || 'Failed to submit payment code');
@@ -57,25 +54,40 @@ export default function PaymentProcess() {
     }
   };
 
-  const checkPaymentStatus = async () => {
-    try {
-      const response = await ordersAPI.checkPaymentStatus(orderNumber);
-      setPaymentStatus(response.data.status);
-      
-      if (response.data.status === 'approved') {
-        toast.success('Payment approved! 🎉');
+  // Wait for verification with long polls: the server answers as soon as
+  // the status changes, or after `wait` seconds with the same status
+  useEffect(() => {
+    if (step !== 3) return;
+
+    const controller = new AbortController();
+
+    const watchPaymentStatus = async () => {
+      let version;
+      while (!controller.signal.aborted) {
+        try {
+          const response = await ordersAPI.checkPaymentStatus(
+            orderNumber,
+            { wait: 25, since: version },
+            controller.signal
+          );
+          version = response.data.version;
+          setPaymentStatus(response.data.status);
+
+          if (response.data.status === 'approved') {
+            toast.success('Payment approved! 🎉');
+          }
+          if (response.data.status !== 'pending') return;
+        } catch (error) {
+          if (controller.signal.aborted) return;
+          console.error('Status check error:', error);
+          await new Promise((resolve) => setTimeout(resolve, 5000));
+        }
       }
-    } catch (error) {
-      console.error('Status check error:', error);
-    }
-  };
+    };
 
-  useEffect(() => {
-    if (step === 3 && paymentStatus === 'pending') {
-      const interval = setInterval(checkPaymentStatus, 5000);
-      return () => clearInterval(interval);
-    }
-  }, [step, paymentStatus]);
+    watchPaymentStatus();
+    return () => controller.abort();
+  }, [step, orderNumber]);
 
   return (
     <div className="min-h-screen bg-gray-50 py-8">
@@ -84,5 +84,6 @@ export const ordersAPI = {
   getTicket: (ticketNumber) => api.get(`/orders/tickets/${ticketNumber}/`),
   initiatePayment: (orderNumber, data) => api.post(`/orders/${orderNumber}/pay/`, data),
   submitPaymentProof: (orderNumber, data) => api.post(`/orders/${orderNumber}/submit-payment/`, data),
-  checkPaymentStatus: (orderNumber) => api.get(`/orders/${orderNumber}/payment-status/`),
+  checkPaymentStatus: (orderNumber, params, signal) =>
+    api.get(`/orders/${orderNumber}/payment-status/`, { params, signal }),
 };
\ No newline at end of file